@@ -0,0 +1,158 @@
+"""
+Bytes saved against CPU spent by CompressedField, per codec and level, for a few kinds of payload.
+
+For every payload and codec this reports the firestore storage size of the value stored as a plain Field and as a
+CompressedField (see fsmodels.utils.document_size), and how long encoding (on save) and decoding (on first access
+after a read) take. Nothing here talks to Firestore.
+
+Usage:
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --sizes 4096,262144 --codecs zlib:1,lzma:0
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import platform
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fsmodels.fields import CompressedField  # noqa: E402
+from fsmodels.utils import document_size  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(HERE, 'results', 'bench_compression.json')
+DEFAULT_SIZES = (1024, 65536, 524288)
+DEFAULT_CODECS = ('zlib:1', 'zlib:6', 'zlib:9', 'lzma:0', 'lzma:6')
+
+WORDS = ('order', 'customer', 'shipped', 'pending', 'invoice', 'total', 'item', 'quantity', 'price', 'warehouse',
+         'the', 'a', 'of', 'and', 'to', 'in', 'for', 'with', 'on', 'at')
+
+
+def json_records(size, rng):
+    """
+    List of small dicts with repeated keys, like an embedded table
+    """
+    records, length = [], 2
+    while length < size:
+        record = {'id': rng.randrange(10 ** 9), 'status': rng.choice(WORDS[:4]), 'total': round(rng.random() * 100, 2),
+                  'items': [rng.choice(WORDS[4:10]) for _ in range(rng.randrange(1, 4))]}
+        records.append(record)
+        length += len(json.dumps(record, separators=(',', ':'))) + 1
+    return records
+
+
+def text(size, rng):
+    """
+    Prose-like str
+    """
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+def random_bytes(size, rng):
+    """
+    Incompressible bytes, e.g. an encrypted or already compressed blob
+    """
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+PAYLOADS = {'json': json_records, 'text': text, 'random': random_bytes}
+
+
+def _time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes=DEFAULT_SIZES, payloads=tuple(PAYLOADS), codecs=DEFAULT_CODECS, repeat=3, seed=0):
+    """
+    :return: list of result dicts, one per (payload, size, codec)
+    """
+    results = []
+    for payload in payloads:
+        for size in sizes:
+            value = PAYLOADS[payload](size, random.Random(seed))
+            plain_bytes = document_size({'value': value})
+            for spec in codecs:
+                codec, _, level = spec.partition(':')
+                field = CompressedField(codec=codec, threshold=0, level=int(level) if level else None)
+                stored = field.encode(value)
+                encode = _time(lambda: field.encode(value), repeat)
+                decode = _time(lambda: CompressedField.decode(stored), repeat)
+                stored_bytes = document_size({'value': stored})
+                result = {
+                    'key': f'{payload}/{size}/{spec}',
+                    'payload': payload,
+                    'size': size,
+                    'codec': spec,
+                    'compressed': CompressedField.is_encoded(stored),
+                    'plain_bytes': plain_bytes,
+                    'stored_bytes': stored_bytes,
+                    'saved_percent': (plain_bytes - stored_bytes) / plain_bytes * 100,
+                    'encode_seconds': encode,
+                    'decode_seconds': decode,
+                    'encode_mb_per_second': plain_bytes / encode / 1e6 if encode else None,
+                    'decode_mb_per_second': plain_bytes / decode / 1e6 if decode else None,
+                }
+                results.append(result)
+                print(_format(result), flush=True)
+    return results
+
+
+def _format(result):
+    return (f'{result["key"]:<26} {result["plain_bytes"]:>9,} -> {result["stored_bytes"]:>9,} B '
+            f'{result["saved_percent"]:>6.1f}% saved  encode {result["encode_seconds"] * 1000:>8.2f} ms  '
+            f'decode {result["decode_seconds"] * 1000:>7.2f} ms')
+
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bytes saved against CPU spent by CompressedField.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated payload sizes in bytes (default: %(default)s)')
+    parser.add_argument('--payloads', default=','.join(PAYLOADS),
+                        help='comma separated payload kinds (default: %(default)s)')
+    parser.add_argument('--codecs', default=','.join(DEFAULT_CODECS),
+                        help='comma separated codec:level pairs (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repeats; the best one is kept')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='where to write results (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = run(
+        sizes=[int(size) for size in args.sizes.split(',')],
+        payloads=args.payloads.split(','),
+        codecs=args.codecs.split(','),
+        repeat=args.repeat,
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'environment': _environment(),
+                   'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Query latency of a Mirror with and without Meta.indexes (see fsmodels.index).
+
+Fills an in-memory mirror with `--rows` documents, then times a few typical local queries answered from the indexes
+and, for comparison, by scanning every document. Nothing here talks to Firestore.
+
+Usage:
+
+    python benchmarks/bench_index.py
+    python benchmarks/bench_index.py --rows 1000000 --repeat 20
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import platform
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fsmodels import memory  # noqa: E402
+from fsmodels.models import Model, Field  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(HERE, 'results', 'bench_index.json')
+STATUSES = ('open', 'closed', 'held', 'archived')
+
+
+class Event(Model):
+    tenant_id = Field(required=True)
+    status = Field()
+    created = Field()
+
+    class Meta:
+        indexes = ['tenant_id', ('status', 'created')]
+
+
+QUERIES = {
+    'equality': lambda mirror: mirror.where('tenant_id', '==', 't42'),
+    'order_limit': lambda mirror: mirror.where('status', '==', 'open').order_by('created', 'DESCENDING').limit(20),
+    'range': lambda mirror: mirror.where('status', '==', 'held').where('created', '>=', 1000).where('created', '<',
+                                                                                                     1100),
+}
+
+
+def _fill(rows, seed):
+    rng = random.Random(seed)
+    client = memory.Client()
+    Event.use_client(client)
+    batch_size = 500
+    for start in range(0, rows, batch_size):
+        batch = client.batch()
+        for i in range(start, min(rows, start + batch_size)):
+            batch.set(client.document(f'event/e{i}'), {'id': f'e{i}', 'tenant_id': f't{rng.randrange(10000)}',
+                                                       'status': rng.choice(STATUSES), 'created': i})
+        batch.commit()
+    # opened last, so the documents arrive in one snapshot and the indexes are built in one go
+    mirror = Event.mirror()
+    mirror.wait(timeout=600)
+    return mirror
+
+
+def _time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows=100000, repeat=10, scan_repeat=1, seed=0):
+    """
+    :return: list of result dicts, one per query
+    """
+    start = time.perf_counter()
+    mirror = _fill(rows, seed)
+    print(f'filled {mirror.size:,} documents in {time.perf_counter() - start:.1f} s', flush=True)
+    results = []
+    for name, build in QUERIES.items():
+        query = build(mirror)
+        matches = query.count()
+        indexed = _time(query.get, repeat)
+        indexes, mirror._indexes = mirror._indexes, None
+        scanned = _time(query.get, scan_repeat)
+        mirror._indexes = indexes
+        result = {'query': name, 'rows': rows, 'matches': matches, 'indexed_seconds': indexed,
+                  'scan_seconds': scanned, 'speedup': scanned / indexed if indexed else None}
+        results.append(result)
+        print(f'{name:<12} {matches:>7,} matches  indexed {indexed * 1000:>8.3f} ms  scan {scanned * 1000:>9.1f} ms',
+              flush=True)
+    mirror.close()
+    return results
+
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query latency of a Mirror with and without Meta.indexes.')
+    parser.add_argument('--rows', type=int, default=100000, help='documents in the mirror (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=10, help='timing repeats of indexed queries; the best one is kept')
+    parser.add_argument('--scan-repeat', type=int, default=1, help='timing repeats of scans; the best one is kept')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='where to write results (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = run(rows=args.rows, repeat=args.repeat, scan_repeat=args.scan_repeat)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'environment': _environment(),
+                   'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Microbenchmarks for the CPU hot paths of the model layer: BaseModel.__init__ (and with it _set_fields and
+_set_model_fields), BaseModel.validate (and ModelField.validate for nested models), BaseModel.to_dict and
+BaseModel.from_dict.
+
+Nothing here talks to Firestore, so no credentials or network are required.
+
+Each run is written as JSON to --output. If that file already exists it is kept as ``<output>.previous.json`` and the
+new results are compared against it, so running the suite before and after a change shows the difference.
+
+Usage:
+
+    python benchmarks/bench_models.py
+    python benchmarks/bench_models.py --sizes 1,1000 --shapes narrow,nested --repeat 5
+    python benchmarks/bench_models.py --compare path/to/baseline.json --fail-on-regression 10
+"""
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fsmodels.models import BaseModel, Field, ModelField, IDField  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(HERE, 'results', 'bench_models.json')
+DEFAULT_SIZES = (1, 1000, 100000)
+OPERATIONS = ('construct', 'validate', 'to_dict', 'from_dict')
+
+
+def is_str(value):
+    return value is None or isinstance(value, str), {'detail': 'value must be a str.'}
+
+
+class Narrow(BaseModel):
+    id = IDField()
+    username = Field(required=True, validation=is_str)
+    email = Field(required=True, validation=is_str)
+    age = Field(default=0)
+    created = Field(default=time.time)
+
+
+Wide = type('Wide', (BaseModel,), {
+    **{f'field_{i:03d}': Field(default=i) for i in range(98)},
+    'id': IDField(),
+    'name': Field(required=True, validation=is_str),
+})
+
+
+class Address(BaseModel):
+    street = Field(required=True, validation=is_str)
+    city = Field(required=True, validation=is_str)
+
+
+class Profile(BaseModel):
+    first_name = Field(required=True, validation=is_str)
+    last_name = Field(required=True, validation=is_str)
+    address = ModelField(Address, required=True)
+
+
+class Nested(BaseModel):
+    id = IDField()
+    username = Field(required=True, validation=is_str)
+    profile = ModelField(Profile, required=True)
+
+
+def narrow_kwargs(i):
+    return {'id': str(i), 'username': f'user{i}', 'email': f'user{i}@example.com', 'age': i}
+
+
+def wide_kwargs(i):
+    return {'id': str(i), 'name': f'wide{i}', **{f'field_{j:03d}': i + j for j in range(98)}}
+
+
+def nested_kwargs(i):
+    address = Address(street=f'{i} Main St', city='Springfield')
+    return {'id': str(i), 'username': f'user{i}', 'profile': Profile(first_name='Billy', last_name=f'Mayes{i}',
+                                                                      address=address)}
+
+
+SHAPES = {
+    'narrow': (Narrow, narrow_kwargs),
+    'wide': (Wide, wide_kwargs),
+    'nested': (Nested, nested_kwargs),
+}
+
+
+def _prepare(shape, n):
+    """
+    :return: (model class, list of kwargs, list of instances, list of dicts) used as input by the operations
+    """
+    model, make_kwargs = SHAPES[shape]
+    kwargs = [make_kwargs(i) for i in range(n)]
+    instances = [model(**kw) for kw in kwargs]
+    dicts = [instance.to_dict() for instance in instances]
+    return model, kwargs, instances, dicts
+
+
+def _operation(name, model, kwargs, instances, dicts):
+    """
+    :return: zero-argument callable that runs operation `name` once over every input
+    """
+    if name == 'construct':
+        return lambda: [model(**kw) for kw in kwargs]
+    if name == 'validate':
+        return lambda: [instance.validate() for instance in instances]
+    if name == 'to_dict':
+        return lambda: [instance.to_dict() for instance in instances]
+    if name == 'from_dict':
+        return lambda: [instance.from_dict(d) for instance, d in zip(instances, dicts)]
+    raise ValueError(f'unknown operation {name}')
+
+
+def _time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes=DEFAULT_SIZES, shapes=tuple(SHAPES), operations=OPERATIONS, repeat=3, memory=True):
+    """
+    :return: list of result dicts, one per (shape, size, operation)
+    """
+    results = []
+    for shape in shapes:
+        for n in sizes:
+            model, kwargs, instances, dicts = _prepare(shape, n)
+            for name in operations:
+                func = _operation(name, model, kwargs, instances, dicts)
+                # large inputs are slow enough that one timing is representative
+                seconds = _time(func, repeat if n < 100000 else 1)
+                result = {
+                    'key': f'{shape}/{n}/{name}',
+                    'shape': shape,
+                    'instances': n,
+                    'operation': name,
+                    'seconds': seconds,
+                    'ops_per_second': n / seconds if seconds else None,
+                    'peak_bytes': _peak_memory(func) if memory else None,
+                }
+                results.append(result)
+                print(_format(result), flush=True)
+            del kwargs, instances, dicts
+    return results
+
+
+def _format(result, previous=None):
+    line = f'{result["key"]:<28} {result["ops_per_second"] or 0:>14,.0f} ops/s'
+    if result['peak_bytes'] is not None:
+        line += f' {result["peak_bytes"] / 1024:>12,.0f} KiB peak'
+    if previous is not None:
+        line += f' {_change(result, previous):>+9.1f}%'
+    return line
+
+
+def _change(result, previous):
+    """
+    :return: percentage change in throughput relative to `previous`; negative numbers are regressions
+    """
+    before, after = previous.get('ops_per_second'), result.get('ops_per_second')
+    if not before or not after:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(results, baseline):
+    """
+    Print every benchmark next to its baseline and return the keys that got slower, with their change in percent.
+    """
+    by_key = {result['key']: result for result in baseline.get('results', [])}
+    print(f'\ncompared with baseline from {baseline.get("created", "unknown")}:')
+    changes = {}
+    for result in results:
+        previous = by_key.get(result['key'])
+        if previous is None:
+            continue
+        changes[result['key']] = _change(result, previous)
+        print(_format(result, previous))
+    return changes
+
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks for fsmodels model CPU hot paths.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated instance counts (default: %(default)s)')
+    parser.add_argument('--shapes', default=','.join(SHAPES), help='comma separated model shapes (default: %(default)s)')
+    parser.add_argument('--operations', default=','.join(OPERATIONS),
+                        help='comma separated operations (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repeats; the best one is kept')
+    parser.add_argument('--no-memory', action='store_true', help='skip the (slower) peak memory pass')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='where to write results (default: %(default)s)')
+    parser.add_argument('--compare', default=None,
+                        help='baseline to compare against (default: the previous contents of --output)')
+    parser.add_argument('--fail-on-regression', type=float, default=None, metavar='PERCENT',
+                        help='exit with status 1 if any throughput drops by more than PERCENT')
+    args = parser.parse_args(argv)
+
+    results = run(
+        sizes=[int(size) for size in args.sizes.split(',')],
+        shapes=args.shapes.split(','),
+        operations=args.operations.split(','),
+        repeat=args.repeat,
+        memory=not args.no_memory,
+    )
+
+    baseline_path = args.compare
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    if os.path.exists(args.output):
+        previous_path = os.path.splitext(args.output)[0] + '.previous.json'
+        os.replace(args.output, previous_path)
+        baseline_path = baseline_path or previous_path
+    with open(args.output, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'environment': _environment(),
+                   'results': results}, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            changes = compare(results, json.load(f))
+        if args.fail_on_regression is not None:
+            regressions = {k: v for k, v in changes.items() if v < -args.fail_on_regression}
+            if regressions:
+                print(f'\n{len(regressions)} benchmark(s) regressed by more than {args.fail_on_regression}%')
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
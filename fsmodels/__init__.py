@@ -1 +1,2 @@
-__all__ = ['models', 'common', 'fields', 'utils']
\ No newline at end of file
+__all__ = ['models', 'common', 'fields', 'utils', 'profiling', 'memory', 'loadtest', 'columnar', 'query',
+           'mirror', 'wal', 'executor', 'graph', 'importer', 'index']
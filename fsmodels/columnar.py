@@ -0,0 +1,127 @@
+"""
+Column-at-a-time helpers for working with many records of one model without building a model instance per record.
+
+NumPy is optional. When it is installed, columns that are already NumPy arrays with a non-object dtype are checked
+with vectorized operations.
+"""
+from typing import Dict, Sequence, Tuple, Union
+
+from fsmodels.common import ValidationError
+from fsmodels.fields import Field, ModelField, IDField, _no_validation
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+# marks a record that has no value for a field, so the field default is used (as BaseModel.__init__ does)
+_missing = object()
+
+
+def extract_columns(records: Union[Sequence[dict], Dict[str, Sequence]], names) -> Tuple[int, dict]:
+    """
+    :param records: list of dicts (one per row), or dict of columns (one sequence per field name)
+    :param names: field names to extract
+    :return: (number of rows, dict of field name to column). Values absent from a row are `_missing`; columns absent
+             from a dict of columns are omitted.
+    """
+    if isinstance(records, dict):
+        lengths = {name: len(column) for name, column in records.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValidationError(f'columns must all have the same length, not {lengths}')
+        n = next(iter(lengths.values()), 0)
+        return n, {name: records[name] for name in names if name in records}
+    records = records if isinstance(records, list) else list(records)
+    return len(records), {name: [record.get(name, _missing) for record in records] for name in names}
+
+
+def _with_defaults(field: Field, column):
+    if np is not None and isinstance(column, np.ndarray):
+        return column
+    if any(value is _missing for value in column):
+        return [field.default() if value is _missing else value for value in column]
+    return column
+
+
+def _vectorized_candidates(field: Field, column):
+    """
+    :return: indices of the rows of a typed NumPy column that may fail validation, or None if the column cannot be
+             checked with vectorized operations
+    """
+    if column.dtype.kind == 'O':
+        return None
+    if type(field) is IDField and column.dtype.kind != 'U':
+        # numbers, bytes, dates, ... are never str instances
+        return range(len(column))
+    if not field.required:
+        return ()
+    if column.dtype.kind == 'U':
+        return np.flatnonzero(column == '')
+    if column.dtype.kind == 'S':
+        return np.flatnonzero(column == b'')
+    if column.dtype.kind in 'biuf':
+        return np.flatnonzero(column == 0)
+    return None
+
+
+def _candidates(field: Field, column):
+    """
+    Rows of `column` that have to go through Field.validate. Rows that are left out are known to pass it.
+
+    Only Field and IDField without a custom validation function have a fast path; everything else checks every row.
+    """
+    if type(field) not in (Field, IDField) or field.validation is not _no_validation:
+        return range(len(column))
+    if np is not None and isinstance(column, np.ndarray):
+        candidates = _vectorized_candidates(field, column)
+        if candidates is not None:
+            return candidates
+    required = field.required
+    if type(field) is IDField:
+        return [i for i, value in enumerate(column)
+                if (value is not None and not isinstance(value, str)) or (required and not value)]
+    if required:
+        return [i for i, value in enumerate(column) if not value]
+    return ()
+
+
+def _validate_model_column(field: ModelField, column, errors: dict):
+    # raw records hold ModelField values as dicts (the output of to_dict); those are validated against the related
+    # model column-wise. Anything else goes through ModelField.validate.
+    rows, dicts = [], []
+    for i, value in enumerate(column):
+        if isinstance(value, dict):
+            rows.append(i)
+            dicts.append(value)
+        else:
+            is_valid, error = field.validate(value, raise_error=False)
+            if not is_valid:
+                errors.setdefault(i, {})[field.name] = error
+    if dicts:
+        _, child_errors = field.field_model.validate_many(dicts)
+        for child_row, child_error in child_errors.items():
+            errors.setdefault(rows[child_row], {})[field.name] = child_error
+
+
+def validate_columns(fields: Dict[str, Field], n: int, columns: dict) -> Dict[int, dict]:
+    """
+    :param fields: field name to Field instance
+    :param n: number of rows
+    :param columns: field name to column, see extract_columns
+    :return: row index to {field name: error} for every row with at least one invalid field
+    """
+    errors = {}
+    for name, field in fields.items():
+        column = columns.get(name)
+        if column is None:
+            column = [field.default() for _ in range(n)]
+        else:
+            column = _with_defaults(field, column)
+        if isinstance(field, ModelField):
+            _validate_model_column(field, column, errors)
+            continue
+        for i in _candidates(field, column):
+            is_valid, error = field.validate(column[i], raise_error=False)
+            if not is_valid:
+                errors.setdefault(int(i), {})[name] = error
+    return errors
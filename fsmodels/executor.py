@@ -0,0 +1,182 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, CancelledError, Future
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
+from fsmodels.common import ValidationError
+
+
+class ItemResult:
+    """
+    Outcome of one item of ModelExecutor.map: either the value the operation returned, or the exception it raised.
+    """
+
+    __slots__ = ('index', 'item', 'value', 'error')
+
+    def __init__(self, index: int, item, value=None, error: Optional[BaseException] = None):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def cancelled(self) -> bool:
+        return isinstance(self.error, CancelledError)
+
+    def __repr__(self):
+        outcome = f'value:{self.value!r}' if self.ok else f'error:{self.error!r}'
+        return f'<{self.__class__.__name__} {self.index} {outcome}>'
+
+
+class ModelExecutor:
+    """
+    Bounded thread pool for running many model operations (save, retrieve, delete, ...) at once over the shared
+    firestore client. Usually created with `Model.executor`.
+
+    Results come back in the order of the items, one ItemResult per item; an operation that raises does not stop the
+    others. At most `max_pending` operations are submitted at a time, so mapping over a long (or lazy) iterable does
+    not queue it all up in memory.
+
+    Example:
+
+    .. code-block:: python
+
+        with User.executor(max_workers=16) as executor:
+            for result in executor.save_all(users):
+                if not result.ok:
+                    print(result.item.id, result.error)
+
+            executor.map('retrieve', users, overwrite_local=True)
+    """
+
+    def __init__(self, max_workers: int = 8, max_pending: Optional[int] = None):
+        """
+        :param max_workers: number of threads
+        :param max_pending: operations submitted but not yet yielded at most; defaults to twice max_workers
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1.')
+        self.max_workers = max_workers
+        self.max_pending = max_pending if max_pending is not None else 2 * max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fsmodels')
+        self._cancelled = threading.Event()
+        # futures that have not finished, so that cancel() can reach them
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Run fn(*args, **kwargs) on the pool.
+
+        :return: concurrent.futures.Future of the result
+        """
+        future = self._pool.submit(fn, *args, **kwargs)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future: Future):
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    @staticmethod
+    def _call(operation: Union[str, Callable], item, args, kwargs):
+        if isinstance(operation, str):
+            return getattr(item, operation)(*args, **kwargs)
+        return operation(item, *args, **kwargs)
+
+    @staticmethod
+    def _result(index: int, item, future: Future) -> ItemResult:
+        try:
+            return ItemResult(index, item, value=future.result())
+        # ValidationError derives from BaseException
+        except (CancelledError, ValidationError, Exception) as e:
+            return ItemResult(index, item, error=e)
+
+    def imap(self, operation: Union[str, Callable], items: Iterable, *args, **kwargs) -> Iterator[ItemResult]:
+        """
+        Lazily run `operation` on every item, yielding an ItemResult per item in the order of the items.
+
+        :param operation: name of a method to call on each item (e.g. 'save'), or a callable taking the item
+        :param items: model instances (or anything `operation` accepts)
+        :param args: passed on to every call of `operation`
+        :param kwargs: passed on to every call of `operation`
+        :return: iterator of ItemResult. After cancel(), operations that had not started yield results with a
+                 CancelledError and no further items are taken from `items`.
+        """
+        window = deque()
+        iterator = iter(items)
+        index = 0
+        exhausted = False
+        while True:
+            while not exhausted and not self._cancelled.is_set() and len(window) < self.max_pending:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                window.append((index, item, self.submit(self._call, operation, item, args, kwargs)))
+                index += 1
+            if not window:
+                return
+            yield self._result(*window.popleft())
+
+    def map(self, operation: Union[str, Callable], items: Iterable, *args, **kwargs) -> List[ItemResult]:
+        """
+        Like imap, but waits for every item and returns the list of ItemResults.
+        """
+        return list(self.imap(operation, items, *args, **kwargs))
+
+    def save_all(self, instances: Iterable, **kwargs) -> List[ItemResult]:
+        """
+        :param kwargs: passed on to Model.save
+        :return: list of ItemResult; the value of each is what save returned
+        """
+        return self.map('save', instances, **kwargs)
+
+    def retrieve_all(self, instances: Iterable, **kwargs) -> List[ItemResult]:
+        """
+        :param kwargs: passed on to Model.retrieve
+        :return: list of ItemResult; the value of each is what retrieve returned
+        """
+        return self.map('retrieve', instances, **kwargs)
+
+    def delete_all(self, instances: Iterable) -> List[ItemResult]:
+        """
+        :return: list of ItemResult; the value of each is what delete returned
+        """
+        return self.map('delete', instances)
+
+    def cancel(self):
+        """
+        Stop submitting operations and cancel the ones that have not started. Operations already running finish.
+        """
+        self._cancelled.set()
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            # only succeeds for futures that have not started; those raise CancelledError
+            future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.cancel()
+        self.shutdown()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} max_workers:{self.max_workers} cancelled:{self.cancelled}>'
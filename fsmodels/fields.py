@@ -1,8 +1,17 @@
+import json
+import lzma
+import zlib
 from typing import Optional, Callable, Tuple, Type
 
+from fsmodels import profiling
 from fsmodels.common import ValidationError, _BaseModel
 
 
+def _no_validation(value):
+    # validation used when a Field is not given one; always passes
+    return True, {}
+
+
 class Field:
     """
     Field to be used on a Model
@@ -48,8 +57,7 @@ class Field:
             else:
                 raise ValidationError(f'validation must be a callable, cannot be {validation}')
         else:
-            # always passes if validation is None
-            self.validation = lambda x: (True, {})
+            self.validation = _no_validation
 
     def validate(self, value, raise_error: bool = True) -> (bool, dict):
         """
@@ -81,7 +89,10 @@ class Field:
             else:
                 return False, {'error': message}
 
-        validation_passed, errors = self.validation(value)
+        if profiling.active is None:
+            validation_passed, errors = self.validation(value)
+        else:
+            validation_passed, errors = profiling.timed_call(self, profiling.VALIDATION, self.validation, value)
 
         if raise_error:
             if not validation_passed:
@@ -106,7 +117,9 @@ class Field:
 
             date_created.default() # returns time.time()
         """
-        return self._default(*args, **kwargs)
+        if profiling.active is None:
+            return self._default(*args, **kwargs)
+        return profiling.timed_call(self, profiling.DEFAULT, self._default, *args, **kwargs)
 
     def __repr__(self):
         return f'<{self.__class__.__name__} name:{self.name} required:{self.required} default:{self.default} validation:{self.validation.__name__}>'
@@ -166,3 +179,224 @@ class IDField(Field):
             else:
                 return False, message
         return super(IDField, self).validate(value, raise_error=raise_error)
+
+
+class ModelListField(Field):
+    """
+    To-many relation: any number of children of `model`, stored as documents in a subcollection of the parent
+    document. Accessing the field on an instance returns a fsmodels.query.ChildList, which reads the children lazily,
+    a page at a time, and adds children with batched writes. Model.save and Model.retrieve leave the subcollection
+    alone, however many children it holds.
+
+    The parent must be saved to its top level collection (it needs an id) before its children can be read or added.
+
+    Example:
+
+    .. code-block:: python
+
+        class Customer(Model):
+            name = Field(required=True)
+            orders = ModelListField(Order, page_size=200, order_by='created')
+
+        customer.orders.extend([Order(total=10), Order(total=20)]) # one commit
+        customer.orders.count() # 2
+        for order in customer.orders.where('total', '>', 15):
+            print(order.id)
+    """
+
+    def __init__(self, model: Type[_BaseModel], collection: Optional[str] = None, page_size: int = 100,
+                 order_by: Optional[str] = None, direction: str = 'ASCENDING', **kwargs):
+        """
+        :param model: Model class of the children
+        :param collection: name of the subcollection; defaults to the collection of `model`
+        :param page_size: children fetched per query while iterating
+        :param order_by: field to iterate the children by; defaults to their id
+        :param direction: 'ASCENDING' or 'DESCENDING'
+        :param kwargs: see Field.__init__
+        """
+        self.field_model = model
+        self.field_model_name = model.__name__
+        self._collection = collection
+        self.page_size = page_size
+        self.order_by = order_by
+        self.direction = direction
+        super(ModelListField, self).__init__(**kwargs)
+
+    @property
+    def collection(self) -> str:
+        return self._collection or self.field_model._get_meta()[1]
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        # fsmodels.query depends on this module
+        from fsmodels.query import ChildList
+        orders = ((self.order_by, self.direction),) if self.order_by else ()
+        return ChildList(self.field_model, instance, self.collection, page_size=self.page_size, orders=orders,
+                         default_order=True)
+
+    def __set__(self, instance, value):
+        raise ValidationError(f'{self.model_name} field {self.name} cannot be assigned; use {self.name}.append or '
+                              f'{self.name}.extend.')
+
+
+class _Stored:
+    """
+    Encoded value of a CompressedField as read from firestore, not decoded yet.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+class CompressedField(Field):
+    """
+    Field whose value is compressed before it is saved, for large text, JSON-like payloads (dicts, lists) or bytes.
+    Values whose serialized form is smaller than `threshold` bytes, or that do not get smaller when compressed, are
+    stored as they are.
+
+    Values read from firestore are kept compressed until the attribute is accessed, so retrieving or querying a model
+    without touching the field costs no decompression, and saving it again writes the stored bytes back as they are.
+
+    Example:
+
+    .. code-block:: python
+
+        class Report(Model):
+            title = Field(required=True)
+            body = CompressedField(codec='lzma', threshold=4096)
+
+        report = Report(title='Q3', body={'rows': [...]})
+        report.clean() # {'title': 'Q3', 'body': b'FSZ1xj...', 'id': None}, as it is saved
+        report.body # {'rows': [...]}
+        report.to_dict() # {'title': 'Q3', 'body': {'rows': [...]}, 'id': None}
+    """
+    # prefix of every encoded value; followed by one byte for the codec and one for the kind of value. Values that
+    # start with MAGIC themselves are always encoded (see encode), so stored bytes with this prefix were written by
+    # the field and are never mistaken for plain bytes.
+    MAGIC = b'FSZ1'
+    CODECS = {
+        'zlib': (b'z', zlib.compress, zlib.decompress),
+        'lzma': (b'x', lzma.compress, lzma.decompress),
+    }
+    # codec byte of values that only carry the header: bytes starting with MAGIC that are small or do not compress
+    _UNCOMPRESSED = b'-'
+    _STR, _BYTES, _JSON = b's', b'b', b'j'
+
+    def __init__(self, codec: str = 'zlib', threshold: int = 1024, level: Optional[int] = None, **kwargs):
+        """
+        :param codec: 'zlib' or 'lzma'
+        :param threshold: values smaller than this many bytes (serialized) are stored uncompressed
+        :param level: compression level of the codec (zlib: 0-9, lzma: preset 0-9); defaults to the codec default
+        :param kwargs: see Field.__init__
+        """
+        if codec not in self.CODECS:
+            raise ValidationError(f'codec must be one of {", ".join(self.CODECS)}, cannot be {codec}')
+        self.codec = codec
+        self.threshold = threshold
+        self.level = level
+        super(CompressedField, self).__init__(**kwargs)
+
+    def _compress(self, payload: bytes) -> bytes:
+        _, compress, _ = self.CODECS[self.codec]
+        if self.level is None:
+            return compress(payload)
+        if self.codec == 'lzma':
+            return compress(payload, preset=self.level)
+        return compress(payload, self.level)
+
+    def encode(self, value):
+        """
+        :param value: str, bytes, or anything json.dumps accepts
+        :return: the value as it is stored in firestore: compressed bytes, or the value itself if it is small or
+                 does not compress
+        """
+        if value is None:
+            return None
+        if isinstance(value, str):
+            kind, payload = self._STR, value.encode('utf-8')
+        elif isinstance(value, (bytes, bytearray)):
+            kind, payload = self._BYTES, bytes(value)
+        else:
+            try:
+                kind, payload = self._JSON, json.dumps(value, separators=(',', ':')).encode('utf-8')
+            except (TypeError, ValueError) as e:
+                raise ValidationError(f'{self.model_name} value of {self.name} cannot be compressed: {e}')
+        # bytes that look encoded keep a header, so decode returns them unchanged
+        reserved = kind == self._BYTES and self.is_encoded(payload)
+        if len(payload) < self.threshold:
+            return self.MAGIC + self._UNCOMPRESSED + kind + payload if reserved else value
+        compressed = self._compress(payload)
+        header = self.MAGIC + self.CODECS[self.codec][0] + kind
+        if len(header) + len(compressed) >= len(payload):
+            return self.MAGIC + self._UNCOMPRESSED + kind + payload if reserved else value
+        return header + compressed
+
+    @classmethod
+    def is_encoded(cls, stored) -> bool:
+        return isinstance(stored, bytes) and stored[:len(cls.MAGIC)] == cls.MAGIC
+
+    @classmethod
+    def decode(cls, stored, name: str = 'CompressedField'):
+        """
+        :param stored: value as stored in firestore
+        :param name: what to call the field in errors
+        :return: the original value; values that were stored uncompressed are returned as they are
+        """
+        if not cls.is_encoded(stored):
+            return stored
+        offset = len(cls.MAGIC)
+        codec, kind, compressed = stored[offset:offset + 1], stored[offset + 1:offset + 2], stored[offset + 2:]
+        if codec == cls._UNCOMPRESSED:
+            payload = compressed
+        else:
+            decompress = next((entry[2] for entry in cls.CODECS.values() if entry[0] == codec), None)
+            if decompress is None:
+                raise ValueError(f'{name} value has an unknown codec {codec!r}')
+            try:
+                payload = decompress(compressed)
+            except (zlib.error, lzma.LZMAError) as e:
+                raise ValueError(f'{name} value cannot be decompressed: {e}')
+        if kind == cls._STR:
+            return payload.decode('utf-8')
+        if kind == cls._BYTES:
+            return payload
+        if kind == cls._JSON:
+            return json.loads(payload.decode('utf-8'))
+        raise ValueError(f'{name} value has an unknown kind {kind!r}')
+
+    def load(self, instance, stored):
+        """
+        Set the value of this field on `instance` to `stored`, a value read from firestore. Encoded values are decoded
+        on first access.
+        """
+        instance.__dict__[self.name] = _Stored(stored) if self.is_encoded(stored) else stored
+
+    def pending(self, instance) -> bool:
+        """
+        :return: whether the value on `instance` was read from firestore compressed and has not been accessed yet
+        """
+        return isinstance(instance.__dict__.get(self.name), _Stored)
+
+    def stored(self, instance):
+        """
+        :return: the value of this field on `instance` as it is stored in firestore; a value that was read from
+                 firestore and never accessed is returned without decompressing and compressing it again
+        """
+        value = instance.__dict__.get(self.name)
+        if isinstance(value, _Stored):
+            return value.data
+        return self.encode(value)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.name)
+        if isinstance(value, _Stored):
+            value = instance.__dict__[self.name] = self.decode(value.data, f'{self.model_name} field {self.name}')
+        return value
+
+    def __set__(self, instance, value):
+        # assigned values are plain values, even bytes that start with MAGIC; see load for values from firestore
+        instance.__dict__[self.name] = value
@@ -0,0 +1,200 @@
+"""
+Saving graphs of models linked by ModelFields.
+
+Model.save writes one level of ModelField children and serializes anything below them into the child document.
+save_graph instead gives every model in the graph its own document, at any depth: a child is stored in the
+subcollection of its parent, a grandchild in the subcollection of that child, and so on. The graph is walked
+without recursion, every model instance is validated and serialized once however often it is referenced, and the
+writes are committed in batches of up to 500, so the number of RPCs grows with the number of batches rather than the
+number of models.
+
+Because children live in the subcollection of their parent, an instance referenced by several parents is still
+stored once under each of them; references that lead to the same document (the same instance listed twice, or two
+instances with the same id under the same parent) are written once.
+
+Example:
+
+.. code-block:: python
+
+    user = User(username='bmayes', profile=Profile(first_name='Billy', address=Address(city='Boston')))
+    user.save_graph() # users/<id>, users/<id>/profile/<id> and users/<id>/profile/<id>/address/<id>
+
+    save_graph(users) # many graphs in as few commits as possible
+"""
+import logging
+from typing import Iterable, List, Optional
+
+from fsmodels import wal as _wal
+from fsmodels.wal import MAX_BATCH_WRITES
+from fsmodels.common import ValidationError
+from fsmodels.fields import Field, _no_validation
+from fsmodels.utils import auto_id
+
+# firestore limit on the depth of subcollections
+MAX_DEPTH = 100
+
+
+def _validate(instance):
+    """
+    Validate the fields of `instance` without descending into its ModelField children, which are validated when
+    the walk reaches them.
+    """
+    error_map = {}
+    for field_name, field in instance._fields.items():
+        if field_name in instance._compressed_fields and field.validation is _no_validation and field.pending(instance):
+            continue
+        is_valid, error = field.validate(getattr(instance, field_name), raise_error=False)
+        if not is_valid:
+            error_map[field_name] = error
+    for field_name, field in instance._model_fields.items():
+        value = getattr(instance, field_name)
+        if value is not None and not isinstance(value, field.field_model):
+            error_map[field_name] = {'error': f'{field_name} field failed validation. {value} is '
+                                              f'{value.__class__.__name__}, must be {field.field_model_name}'}
+            continue
+        # required and custom validation only; the child itself is validated on its own
+        is_valid, error = Field.validate(field, value, raise_error=False)
+        if not is_valid:
+            error_map[field_name] = error
+    if error_map:
+        raise ValidationError({instance.__class__.__name__: error_map})
+
+
+def _data(instance) -> dict:
+    """
+    :return: the document data of `instance`, without its ModelFields
+    """
+    data = {
+        field_name: field_value.to_dict() if hasattr(field_value, 'to_dict') else field_value
+        for field_name, field_value in ((name, getattr(instance, name)) for name in instance._field_names
+                                        if name not in instance._compressed_fields)
+    }
+    data.update((name, field.stored(instance)) for name, field in instance._compressed_fields.items())
+    return data
+
+
+def plan(instances: Iterable, patch: bool = True, collection_path: Optional[str] = None, validate: bool = True) \
+        -> List[tuple]:
+    """
+    Work out the writes that save the graphs reachable from `instances`, without reading from firestore. Models
+    without an id get one.
+
+    :param instances: top level Model instances
+    :param patch: replace the top level fields of existing documents and keep their other fields, like
+                  Model.save(patch=True), instead of overwriting them
+    :param collection_path: path of the collection to save `instances` to; defaults to the collection of each
+                            instance's model
+    :param validate: validate every model; pass False for models that were already validated (e.g. with
+                     validate_many)
+    :return: list of (op, document path, data) tuples, one per document, children before their parents; op is
+             'merge' or 'set' (see fsmodels.wal.add_write)
+    :raises ValidationError: if a model is invalid, refers back to itself, or is nested deeper than firestore allows
+    """
+    op = _wal.MERGE if patch else _wal.SET
+    documents = {}  # id(instance) -> document data, so shared instances are serialized once
+    writes = {}  # document path -> (depth, instance, data)
+    # (instance, collection path, depth, ids of the ancestors of instance)
+    stack = [(instance, collection_path or instance._get_meta()[1], 0, ()) for instance in reversed(list(instances))]
+    while stack:
+        instance, collection_path, depth, ancestors = stack.pop()
+        if depth >= MAX_DEPTH:
+            raise ValidationError(f'{instance.__class__.__name__} is nested more than {MAX_DEPTH} levels deep.')
+        key = id(instance)
+        if key not in documents:
+            if validate:
+                _validate(instance)
+            data = _data(instance)
+            if not instance.id:
+                instance.id = auto_id()
+            data['id'] = instance.id
+            instance._check_document_size(data)
+            documents[key] = data
+        data = documents[key]
+        path = f'{collection_path}/{instance.id}'
+
+        previous = writes.get(path)
+        if previous is not None:
+            if previous[1] is instance:
+                continue
+            if previous[2] != data:
+                logging.warning(f'Two different {instance.__class__.__name__} instances are saved to {path}; '
+                                f'the fields of the last one win.')
+            data = {**previous[2], **data}
+        writes[path] = (depth, instance, data)
+
+        ancestors = ancestors + (key,)
+        for field_name in instance._model_field_names:
+            child = getattr(instance, field_name)
+            if child is None:
+                continue
+            if id(child) in ancestors:
+                raise ValidationError(f'{instance.__class__.__name__} field {field_name} refers back to an instance '
+                                      f'that contains it.')
+            stack.append((child, f'{path}/{child._get_meta()[1]}', depth + 1, ancestors))
+
+    # deepest first: once a document exists, everything below it has been written too
+    ordered = sorted(writes.items(), key=lambda item: -item[1][0])
+    return [(op, path, data) for path, (_, _, data) in ordered]
+
+
+def commit(client, writes: List[tuple], batch_size: int = MAX_BATCH_WRITES,
+           update_times: Optional[dict] = None) -> int:
+    """
+    Commit `writes` (from plan) in order, `batch_size` writes per batch.
+
+    :param update_times: if given, filled with the update time of each written document path
+    :return: number of commits
+    """
+    if not 0 < batch_size <= MAX_BATCH_WRITES:
+        raise ValueError(f'batch_size must be between 1 and {MAX_BATCH_WRITES}.')
+    commits = 0
+    for start in range(0, len(writes), batch_size):
+        batch = client.batch()
+        chunk = writes[start:start + batch_size]
+        for op, path, data in chunk:
+            _wal.add_write(batch, client.document(path), op, data)
+        results = batch.commit()
+        if update_times is not None:
+            update_times.update((path, result.update_time) for (_, path, _), result in zip(chunk, results))
+        commits += 1
+    return commits
+
+
+def save_graph(instances: Iterable, patch: bool = True, batch_size: int = MAX_BATCH_WRITES,
+               client=None) -> dict:
+    """
+    Save every model reachable from `instances` through ModelFields, each as its own document. See Model.save_graph.
+
+    :param instances: top level Model instances
+    :param patch: replace the top level fields of existing documents and keep their other fields, like
+                  Model.save(patch=True), instead of overwriting them
+    :param batch_size: writes per commit, at most 500
+    :param client: defaults to the client of the first instance
+    :return: dict with the ids of `instances`, the number of documents written and the number of commits. With a
+             write-ahead log (see Model.use_wal), the writes are appended to the log as one record and its sequence
+             number is included instead of the number of commits.
+    """
+    instances = list(instances)
+    if not instances:
+        return {'ids': [], 'writes': 0, 'commits': 0}
+    writes = plan(instances, patch=patch)
+    result = {'ids': [instance.id for instance in instances], 'writes': len(writes)}
+    log = instances[0]._wal
+    if log is not None and client is None:
+        result['sequence'] = log.append(writes)
+        return result
+    client = client if client is not None else instances[0]._get_client()
+    if client is None:
+        raise ValidationError('Cannot save graph; there is no firestore client. Set GOOGLE_APPLICATION_CREDENTIALS '
+                              'or call Model.use_client.')
+    update_times = {}
+    result['commits'] = commit(client, writes, batch_size, update_times)
+    if instances[0]._mirrors:
+        # imported here; fsmodels.mirror imports fsmodels.query, which imports this module
+        from fsmodels import mirror
+        by_path = {path: data for _, path, data in writes}
+        for instance in instances:
+            path = f'{instance._get_meta()[1]}/{instance.id}'
+            mirror.written(instance.__class__, instance.id, by_path[path], merge=patch,
+                           update_time=update_times.get(path))
+    return result
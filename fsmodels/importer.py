@@ -0,0 +1,419 @@
+"""
+Streaming import of NDJSON or CSV files into the collection of a Model.
+
+The file is read a chunk of rows at a time, so memory use does not depend on its size. Each chunk is parsed,
+validated with validate_many and turned into writes on a pool of workers; the writes are committed in batches by a
+second pool. At most `max_pending` chunks and `max_pending` batches are in flight at once, so reading waits for
+firestore instead of piling rows up in memory.
+
+Rows that fail to parse or validate are written to a rejects file (one JSON line per row, with its byte offset and
+the errors) instead of stopping the import. After every committed batch, the byte offset up to which every row is
+either in firestore or in the rejects file is saved to a checkpoint file; running the same import again continues
+from there. Rows without an id get one derived from the file and their byte offset, so rows written again after a
+crash overwrite themselves instead of being duplicated. The file is identified by its absolute path and a hash of its
+first bytes (or by the `namespace` given), recorded in the checkpoint, so files with the same name in different
+directories, or a new file at the same path, get ids of their own.
+
+Example:
+
+.. code-block:: python
+
+    from fsmodels.importer import Importer
+
+    result = Importer(User, 'users.ndjson', workers=8).run()
+    # {'imported': 1999870, 'rejected': 130, 'offset': 734003200, 'complete': True, ...}
+
+From the command line:
+
+.. code-block:: bash
+
+    fsmodels-import myapp.models:User users.csv --workers 8 --processes --convert age=int
+"""
+import io
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import logging
+import argparse
+import importlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Callable, Dict, Iterator, List, Tuple
+
+from fsmodels import graph
+from fsmodels.common import ValidationError
+
+FORMATS = ('ndjson', 'csv')
+
+
+def to_bool(value) -> bool:
+    """
+    Converter for CSV columns holding booleans: 1/true/yes/y/t (in any case) are True, anything else False.
+    """
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+
+# names accepted by --convert; module level functions, so that they can be sent to worker processes
+CONVERTERS = {
+    'int': int,
+    'float': float,
+    'str': str,
+    'bool': to_bool,
+    'json': json.loads,
+}
+
+
+def _format_of(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    raise ValueError(f'Cannot tell the format of {path}; pass format="ndjson" or format="csv".')
+
+
+def _source(path: str) -> str:
+    """
+    :return: what the ids of rows without one are derived from: the absolute path of the file and a hash of its first
+             64 KiB, which stays the same when rows are appended to the file
+    """
+    with open(path, 'rb') as f:
+        head = f.read(65536)
+    return f'{os.path.realpath(path)}:{hashlib.sha1(head).hexdigest()}'
+
+
+def _row_id(source: str, offset: int) -> str:
+    # stable across runs, so that rows replayed after a crash overwrite themselves
+    return hashlib.sha1(f'{source}:{offset}'.encode('utf-8')).hexdigest()[:20]
+
+
+def _rows(f, fmt: str) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    :param f: file opened in binary mode, positioned at the first row to read
+    :return: iterator of (start offset, end offset, raw bytes) of every non-empty row
+    """
+    start = f.tell()
+    pending = b''
+    while True:
+        line = f.readline()
+        if not line:
+            if pending.strip():
+                yield start, f.tell(), pending
+            return
+        pending += line
+        # a quoted CSV field may contain newlines; the row ends once every quote is closed
+        if fmt == 'csv' and pending.count(b'"') % 2:
+            continue
+        if pending.strip():
+            yield start, f.tell(), pending
+        pending = b''
+        start = f.tell()
+
+
+def _parse(raw: bytes, fmt: str, header: Optional[List[str]]) -> dict:
+    text = raw.decode('utf-8')
+    if fmt == 'ndjson':
+        record = json.loads(text)
+        if not isinstance(record, dict):
+            raise ValueError(f'expected a JSON object, got {type(record).__name__}')
+        return record
+    values = next(csv.reader(io.StringIO(text)))
+    if len(values) != len(header):
+        raise ValueError(f'expected {len(header)} columns, got {len(values)}')
+    # empty cells are missing values, so that the field default applies
+    return {name: value for name, value in zip(header, values) if value != ''}
+
+
+def _process_chunk(model, fmt: str, header: Optional[List[str]], converters: Dict[str, Callable], id_field: str,
+                   source: str, collection: str, patch: bool, chunk: List[Tuple[int, int, bytes]]) -> List[tuple]:
+    """
+    Parse, validate and plan the writes of one chunk of rows. Runs on a worker (thread or process).
+
+    :return: list of (start offset, end offset, writes or None, errors or None, raw bytes), one per row, in order
+    """
+    outcomes, records, positions = [], [], []
+    for start, end, raw in chunk:
+        try:
+            record = _parse(raw, fmt, header)
+            for field_name, convert in converters.items():
+                if field_name in record:
+                    record[field_name] = convert(record[field_name])
+        except Exception as e:
+            outcomes.append((start, end, None, {'error': f'{e.__class__.__name__}: {e}'}, raw))
+            continue
+        record['id'] = str(record[id_field]) if record.get(id_field) not in (None, '') else _row_id(source, start)
+        positions.append(len(outcomes))
+        outcomes.append((start, end, None, None, raw))
+        records.append(record)
+
+    _, error_map = model.validate_many(records)
+    for index, (record, position) in enumerate(zip(records, positions)):
+        start, end, _, _, raw = outcomes[position]
+        if index in error_map:
+            outcomes[position] = (start, end, None, error_map[index], raw)
+            continue
+        try:
+            # trusted: the record was just validated
+            writes = graph.plan([model._hydrate(record)], patch=patch, collection_path=collection, validate=False)
+        except ValidationError as e:
+            # e.g. a document over the firestore size limit
+            outcomes[position] = (start, end, None, {'error': str(e.args[0] if e.args else e)}, raw)
+            continue
+        outcomes[position] = (start, end, writes, None, raw)
+    return outcomes
+
+
+class Importer:
+    """
+    Streams an NDJSON or CSV file into the collection of a Model. See the module documentation.
+    """
+
+    def __init__(self, model, path: str, format: Optional[str] = None, checkpoint: Optional[str] = None,
+                 rejects: Optional[str] = None, workers: int = 4, processes: bool = False, writers: int = 4,
+                 chunk_size: int = 1000, batch_size: int = graph.MAX_BATCH_WRITES, max_pending: Optional[int] = None,
+                 converters: Optional[Dict[str, Callable]] = None, id_field: str = 'id', patch: bool = False,
+                 client=None, retries: int = 3, retry_delay: float = 1.0, namespace: Optional[str] = None):
+        """
+        :param model: Model class of the rows
+        :param path: NDJSON (one JSON object per line) or CSV (with a header row) file
+        :param format: 'ndjson' or 'csv'; defaults to the one the file extension suggests
+        :param checkpoint: checkpoint file; defaults to `path` + '.checkpoint'
+        :param rejects: rejects file; defaults to `path` + '.rejects'
+        :param workers: workers that parse and validate chunks
+        :param processes: use processes instead of threads for the workers. The model and converters must be
+                          importable (picklable).
+        :param writers: threads that commit batches
+        :param chunk_size: rows per chunk handed to a worker
+        :param batch_size: rows per committed batch, at most 500; a batch holding more than 500 writes (rows with
+                           ModelField children) is committed in several commits
+        :param max_pending: chunks and batches in flight at most; defaults to twice the workers
+        :param converters: field name to a callable applied to the raw value, e.g. {'age': int}; CSV values are str
+        :param id_field: column holding the document id
+        :param patch: merge rows into existing documents instead of overwriting them
+        :param client: defaults to the client of `model`
+        :param retries: times a failed commit is retried before the import stops
+        :param retry_delay: seconds before the first retry; doubles after each one
+        :param namespace: what the ids of rows without one are derived from, together with their byte offset; pass
+                          the same namespace to import a file again (e.g. after moving it) onto the same documents.
+                          Defaults to the absolute path of the file and a hash of its first 64 KiB.
+        """
+        if not 0 < batch_size <= graph.MAX_BATCH_WRITES:
+            raise ValueError(f'batch_size must be between 1 and {graph.MAX_BATCH_WRITES}.')
+        self.model = model
+        self.path = path
+        self.format = format or _format_of(path)
+        if self.format not in FORMATS:
+            raise ValueError(f'format must be one of {", ".join(FORMATS)}, cannot be {self.format}')
+        self.checkpoint_path = checkpoint or path + '.checkpoint'
+        self.rejects_path = rejects or path + '.rejects'
+        self.workers = workers
+        self.processes = processes
+        self.writers = writers
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_pending = max_pending if max_pending is not None else 2 * workers
+        self.converters = dict(converters or {})
+        self.id_field = id_field
+        self.patch = patch
+        self.client = client
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.namespace = namespace
+        self.commits = 0
+
+    def checkpoint(self) -> dict:
+        """
+        :return: the saved progress of the import: byte offset reached, size of the rejects file, rows imported, rows
+                 rejected and the source of generated ids (see namespace). All zero (and None) before the first
+                 checkpoint.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return {'offset': 0, 'rejects_offset': 0, 'imported': 0, 'rejected': 0, 'source': None}
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, state: dict):
+        with open(self.checkpoint_path + '.tmp', 'w') as f:
+            json.dump({**state, 'time': time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+
+    def _commit(self, client, writes: List[tuple]) -> int:
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                return graph.commit(client, writes)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logging.warning(f'Import commit failed ({e}); retrying in {delay} seconds.')
+                time.sleep(delay)
+                delay *= 2
+
+    def _chunks(self, f) -> Iterator[list]:
+        chunk = []
+        for row in _rows(f, self.format):
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self) -> dict:
+        """
+        Import the file, continuing from the checkpoint if there is one.
+
+        :return: dict with the rows imported and rejected (in total, including earlier runs), the byte offset
+                 reached, whether the whole file was imported, the commits and the seconds this run took
+        """
+        began = time.time()
+        client = self.client if self.client is not None else self.model._get_client()
+        if client is None:
+            raise ValidationError(f'Cannot import into {self.model.__name__}; there is no firestore client. Set '
+                                  f'GOOGLE_APPLICATION_CREDENTIALS or call Model.use_client.')
+        state = self.checkpoint()
+        _, collection = self.model._get_meta()
+        # a resumed import keeps generating the ids it started with
+        source = self.namespace or state.get('source') or _source(self.path)
+        size = os.path.getsize(self.path)
+
+        pool_class = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+        rejects_mode = 'r+b' if state['rejects_offset'] else 'wb'
+        with open(self.path, 'rb') as f, open(self.rejects_path, rejects_mode) as rejects, \
+                pool_class(max_workers=self.workers) as parsers, \
+                ThreadPoolExecutor(max_workers=self.writers) as writers:
+            # rejects of rows after the checkpoint are written again
+            rejects.truncate(state['rejects_offset'])
+            rejects.seek(state['rejects_offset'])
+            header = None
+            if self.format == 'csv':
+                header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+            f.seek(max(state['offset'], f.tell()))
+
+            parsing, writing = deque(), deque()
+            chunks = self._chunks(f)
+            batch, batch_rows = [], 0
+            offset, imported, rejected = state['offset'], state['imported'], state['rejected']
+
+            def finish_write():
+                nonlocal state
+                future, checkpoint = writing.popleft()
+                self.commits += future.result()
+                rejects.flush()
+                state = checkpoint
+                self._save_checkpoint(state)
+
+            def write(final: bool = False):
+                nonlocal batch, batch_rows, imported, offset
+                if not batch_rows and not final:
+                    return
+                if final:
+                    # every row has been read; blank lines at the end included
+                    offset = size
+                imported += batch_rows
+                checkpoint = {'offset': offset, 'rejects_offset': rejects.tell(), 'imported': imported,
+                              'rejected': rejected, 'source': source}
+                while len(writing) >= self.max_pending:
+                    finish_write()
+                writing.append((writers.submit(self._commit, client, batch), checkpoint))
+                batch, batch_rows = [], 0
+
+            while True:
+                while len(parsing) < self.max_pending:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    parsing.append(parsers.submit(_process_chunk, self.model, self.format, header, self.converters,
+                                                  self.id_field, source, collection, self.patch, chunk))
+                if not parsing:
+                    break
+                for start, end, writes, errors, raw in parsing.popleft().result():
+                    offset = end
+                    if errors is not None:
+                        rejected += 1
+                        rejects.write(json.dumps({'offset': start, 'row': raw.decode('utf-8', 'replace'),
+                                                  'errors': errors}, default=str).encode('utf-8') + b'\n')
+                        continue
+                    batch.extend(writes)
+                    batch_rows += 1
+                    if batch_rows >= self.batch_size:
+                        write()
+            write(final=True)
+            while writing:
+                finish_write()
+
+        seconds = time.time() - began
+        return {
+            'imported': state['imported'],
+            'rejected': state['rejected'],
+            'offset': state['offset'],
+            'complete': state['offset'] >= size,
+            'commits': self.commits,
+            'seconds': seconds,
+            'rejects': self.rejects_path,
+        }
+
+
+def _load_model(spec: str):
+    module_name, _, class_name = spec.partition(':')
+    if not class_name:
+        raise ValueError(f'Model must be given as module:ClassName, not {spec}')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _parse_converters(values: List[str]) -> Dict[str, Callable]:
+    converters = {}
+    for value in values:
+        field_name, _, name = value.partition('=')
+        if name not in CONVERTERS:
+            raise argparse.ArgumentTypeError(f'unknown converter {name}; use one of {", ".join(CONVERTERS)}')
+        converters[field_name] = CONVERTERS[name]
+    return converters
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='fsmodels-import',
+                                     description='Stream an NDJSON or CSV file into the collection of a Model.')
+    parser.add_argument('model', help='Model class as module:ClassName, e.g. myapp.models:User')
+    parser.add_argument('path', help='file to import')
+    parser.add_argument('--format', choices=FORMATS, default=None, help='default: from the file extension')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file (default: PATH.checkpoint)')
+    parser.add_argument('--rejects', default=None, help='rejects file (default: PATH.rejects)')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and import the whole file')
+    parser.add_argument('--workers', type=int, default=4, help='parse and validate workers (default: %(default)s)')
+    parser.add_argument('--processes', action='store_true', help='use processes instead of threads for the workers')
+    parser.add_argument('--writers', type=int, default=4, help='threads committing batches (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='rows per worker chunk (default: %(default)s)')
+    parser.add_argument('--batch-size', type=int, default=graph.MAX_BATCH_WRITES,
+                        help='rows per commit (default: %(default)s)')
+    parser.add_argument('--convert', action='append', default=[], metavar='FIELD=TYPE',
+                        help=f'convert a column, TYPE one of {", ".join(CONVERTERS)}; may be repeated')
+    parser.add_argument('--id-field', default='id', help='column holding the document id (default: %(default)s)')
+    parser.add_argument('--patch', action='store_true', help='merge into existing documents instead of overwriting')
+    parser.add_argument('--namespace', default=None,
+                        help='what ids of rows without one are derived from (default: the path and a hash of the file)')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.getcwd())
+    importer = Importer(
+        _load_model(args.model), args.path, format=args.format, checkpoint=args.checkpoint, rejects=args.rejects,
+        workers=args.workers, processes=args.processes, writers=args.writers, chunk_size=args.chunk_size,
+        batch_size=args.batch_size, converters=_parse_converters(args.convert), id_field=args.id_field,
+        patch=args.patch, namespace=args.namespace,
+    )
+    if args.restart and os.path.exists(importer.checkpoint_path):
+        os.remove(importer.checkpoint_path)
+    result = importer.run()
+    print(json.dumps(result, indent=2))
+    return 0 if result['complete'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
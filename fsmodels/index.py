@@ -0,0 +1,235 @@
+"""
+In-process secondary indexes over documents held in memory (see fsmodels.mirror), declared on a Model with
+`Meta.indexes`. Every entry is one field or a tuple of fields, and gets two indexes:
+
+- a hash index, for queries with an equality filter on each of its fields (or an 'in' filter on a one-field index);
+- a sorted index, for queries with equality filters on its leading fields followed by a range filter and/or ordering
+  on the next field.
+
+Index keys use the firestore ordering of values (fsmodels.memory.order_key), so numbers, strings, None etc. sort the
+way firestore sorts them. Indexes only narrow down the candidates of a query; every candidate is still checked against
+all the filters, so a query gives the same results with or without them.
+
+Example:
+
+.. code-block:: python
+
+    class Event(Model):
+        tenant_id = Field(required=True)
+        status = Field()
+        created = Field(default=time.time)
+
+        class Meta:
+            indexes = ['tenant_id', ('status', 'created')]
+
+    events = Event.mirror()
+    events.where('tenant_id', '==', 't1').get() # hash index
+    events.where('status', '==', 'open').order_by('created', 'DESCENDING').limit(10).get() # sorted index
+"""
+import bisect
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from fsmodels.common import ValidationError
+from fsmodels.memory import OTHER, field_value, order_key
+
+RANGE_OPERATORS = ('<', '<=', '>', '>=')
+# greater than every order_key, whose first element is the type class of the value
+_HIGHEST = (OTHER + 1,)
+
+
+def _key(data: dict, fields: Sequence[str]) -> tuple:
+    return tuple(order_key(field_value(data, field_path)) for field_path in fields)
+
+
+class HashIndex:
+    """
+    Document ids by the values of `fields`; answers equality filters on all of them.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+        self._buckets = {}
+
+    def add(self, id_: str, data: dict):
+        self._buckets.setdefault(_key(data, self.fields), set()).add(id_)
+
+    def remove(self, id_: str, data: dict):
+        key = _key(data, self.fields)
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.discard(id_)
+            if not bucket:
+                del self._buckets[key]
+
+    def clear(self):
+        self._buckets = {}
+
+    def lookup(self, values: Sequence) -> set:
+        """
+        :param values: one value per field
+        :return: ids of the documents with those values (do not modify)
+        """
+        return self._buckets.get(tuple(order_key(value) for value in values), set())
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+
+class SortedIndex:
+    """
+    (key, id) pairs sorted by the values of `fields`; answers equality filters on leading fields followed by a range
+    and/or order on the next one.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+        self._entries = []
+
+    def add(self, id_: str, data: dict):
+        bisect.insort(self._entries, (_key(data, self.fields), id_))
+
+    def remove(self, id_: str, data: dict):
+        entry = (_key(data, self.fields), id_)
+        position = bisect.bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def rebuild(self, documents: Dict[str, dict]):
+        self._entries = sorted((_key(data, self.fields), id_) for id_, data in documents.items())
+
+    def clear(self):
+        self._entries = []
+
+    def bounds(self, prefix: Sequence, ranges: Sequence[Tuple[str, object]] = ()) -> Tuple[int, int]:
+        """
+        :param prefix: values of the leading fields
+        :param ranges: (operator, value) filters on the field after the prefix
+        :return: (start, stop) positions of the matching entries
+        """
+        prefix = tuple(order_key(value) for value in prefix)
+        low, high = (prefix,), (prefix + (_HIGHEST,),)
+        for op_string, value in ranges:
+            key = order_key(value)
+            # range filters only match values of the same type
+            if op_string in ('<', '<='):
+                low = max(low, (prefix + ((key[0],),),))
+                high = min(high, (prefix + (key,),) if op_string == '<' else (prefix + (key, _HIGHEST),))
+            else:
+                low = max(low, (prefix + (key,),) if op_string == '>=' else (prefix + (key, _HIGHEST),))
+                high = min(high, (prefix + ((key[0] + 1,),),))
+        start = bisect.bisect_left(self._entries, low)
+        return start, max(start, bisect.bisect_left(self._entries, high))
+
+    def ids(self, start: int, stop: int, descending: bool = False) -> Iterable[str]:
+        positions = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+        entries = self._entries
+        return (entries[position][1] for position in positions)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class IndexSet:
+    """
+    The indexes declared by a Model's Meta.indexes, over one set of documents, and the planner that picks one for a
+    query.
+    """
+
+    def __init__(self, declared: Iterable[Sequence[str]]):
+        self.hash_indexes = [HashIndex(fields) for fields in declared]
+        self.sorted_indexes = [SortedIndex(fields) for fields in declared]
+
+    @classmethod
+    def for_model(cls, model) -> Optional['IndexSet']:
+        """
+        :return: IndexSet for the indexes declared in model.Meta.indexes, or None if it declares none
+        :raises ValidationError: if an index names a field the model does not declare
+        """
+        declared = []
+        for entry in getattr(model.Meta, 'indexes', None) or ():
+            fields = (entry,) if isinstance(entry, str) else tuple(entry)
+            for field_path in fields:
+                if field_path.split('.')[0] not in model._class_fields():
+                    raise ValidationError(f'{model.__name__} Meta.indexes names {field_path}, which is not a field.')
+            declared.append(fields)
+        return cls(declared) if declared else None
+
+    def add(self, id_: str, data: dict):
+        for index in self.hash_indexes + self.sorted_indexes:
+            index.add(id_, data)
+
+    def remove(self, id_: str, data: dict):
+        for index in self.hash_indexes + self.sorted_indexes:
+            index.remove(id_, data)
+
+    def rebuild(self, documents: Dict[str, dict]):
+        """
+        Index `documents` from scratch; faster than adding them one at a time.
+        """
+        for index in self.hash_indexes:
+            index.clear()
+            for id_, data in documents.items():
+                index.add(id_, data)
+        for index in self.sorted_indexes:
+            index.rebuild(documents)
+
+    def select(self, filters: Sequence[tuple], orders: Sequence[tuple] = (), limit: Optional[int] = None) \
+            -> Optional[Tuple[Iterable[str], bool]]:
+        """
+        Pick the index that narrows the query down the most.
+
+        :param filters: (field path, operator, value) tuples
+        :param orders: (field path, direction) tuples
+        :param limit: the query limit; an index that returns documents in query order can stop early
+        :return: (candidate ids, whether they are in query order), or None if no index applies
+        """
+        equal, ranges, any_of = {}, {}, {}
+        for field_path, op_string, value in filters:
+            if op_string == '==':
+                equal.setdefault(field_path, value)
+            elif op_string in RANGE_OPERATORS:
+                ranges.setdefault(field_path, []).append((op_string, value))
+            elif op_string == 'in' and isinstance(value, (list, tuple)):
+                any_of.setdefault(field_path, value)
+
+        best, best_cost = None, None
+        for index in self.hash_indexes:
+            if all(field_path in equal for field_path in index.fields):
+                ids = index.lookup([equal[field_path] for field_path in index.fields])
+            elif len(index.fields) == 1 and index.fields[0] in any_of:
+                ids = set().union(*(index.lookup([value]) for value in any_of[index.fields[0]]))
+            else:
+                continue
+            if best_cost is None or len(ids) < best_cost:
+                best, best_cost = (ids, not orders), len(ids)
+
+        for index in self.sorted_indexes:
+            prefix = []
+            for field_path in index.fields:
+                if field_path not in equal:
+                    break
+                prefix.append(equal[field_path])
+            rest = index.fields[len(prefix):]
+            range_filters = ranges.get(rest[0], []) if rest else []
+            ordered = self._in_index_order(orders, rest)
+            if not prefix and not range_filters and not (ordered and orders):
+                continue
+            start, stop = index.bounds(prefix, range_filters)
+            cost = stop - start
+            if ordered and orders and limit is not None:
+                # reading stops once `limit` matches are found
+                cost = min(cost, limit)
+            if best_cost is None or cost < best_cost:
+                descending = bool(orders) and orders[0][1].upper().startswith('DESC')
+                best, best_cost = (index.ids(start, stop, descending), ordered), cost
+        return best
+
+    @staticmethod
+    def _in_index_order(orders: Sequence[tuple], fields: Sequence[str]) -> bool:
+        """
+        Whether entries that share the equality prefix come out in `orders` order when read from the index.
+        """
+        if len(orders) > len(fields):
+            return False
+        directions = {direction.upper().startswith('DESC') for _, direction in orders}
+        return len(directions) <= 1 and all(field_path == fields[i] for i, (field_path, _) in enumerate(orders))
@@ -0,0 +1,305 @@
+"""
+Load test for Model.save, Model.retrieve and Model.delete against fsmodels.memory.Client, which adds a configurable
+latency, jitter and error rate to every RPC. The report shows p50/p95/p99 latency, throughput and the number of RPCs
+each logical operation costs, so changes that remove round trips can be measured before they are deployed.
+
+Usage:
+
+    fsmodels-loadtest --operations 2000 --concurrency 16 --latency 0.02 --jitter 0.005
+    fsmodels-loadtest --mix save=1,retrieve=3 --mode processes --concurrency 4 --json
+    python -m fsmodels.loadtest --help
+"""
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from fsmodels import memory
+from fsmodels.models import Model
+from fsmodels.fields import Field, ModelField
+
+OPERATIONS = ('save', 'retrieve', 'delete')
+MODES = ('threads', 'processes', 'asyncio')
+
+
+class LoadProfile(Model):
+    first_name = Field(required=True)
+    last_name = Field(required=True)
+
+
+class LoadUser(Model):
+    username = Field(required=True)
+    email = Field(required=True)
+    created = Field(default=time.time)
+    profile = ModelField(LoadProfile)
+
+
+class _Config:
+    """
+    Options of a load test run; plain attributes so it can be sent to worker processes.
+    """
+
+    def __init__(self, operations: int = 1000, mix: Optional[dict] = None, concurrency: int = 8,
+                 mode: str = 'threads', latency: float = 0.005, jitter: float = 0.0, error_rate: float = 0.0,
+                 preload: int = 100, children: bool = True, seed: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}, not {mode}')
+        self.operations = operations
+        self.mix = mix or {'save': 4, 'retrieve': 5, 'delete': 1}
+        self.concurrency = concurrency
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.preload = preload
+        self.children = children
+        self.seed = seed
+
+
+class _Worker:
+    """
+    Issues operations against one client and remembers the ids of the documents it saved, so that retrieve and delete
+    have something to act on.
+    """
+
+    def __init__(self, client: memory.Client, config: _Config, seed: Optional[int]):
+        self.client = client
+        self.config = config
+        self.random = random.Random(seed)
+        self.ids = []
+        self.lock = threading.Lock()
+
+    def new_user(self, id_: Optional[str] = None) -> LoadUser:
+        n = self.random.randrange(10 ** 9)
+        profile = LoadProfile(first_name='Billy', last_name=f'Mayes{n}') if self.config.children else None
+        kwargs = {'username': f'user{n}', 'email': f'user{n}@example.com', 'profile': profile}
+        if id_ is not None:
+            kwargs['id'] = id_
+        return LoadUser(**kwargs)
+
+    def preload(self, n: int):
+        """
+        Save n documents with injected latency and errors switched off.
+        """
+        latency, jitter, error_rate = self.client.latency, self.client.jitter, self.client.error_rate
+        self.client.latency, self.client.jitter, self.client.error_rate = 0.0, 0.0, 0.0
+        try:
+            for _ in range(n):
+                user = self.new_user()
+                user.save()
+                self.ids.append(user.id)
+        finally:
+            self.client.latency, self.client.jitter, self.client.error_rate = latency, jitter, error_rate
+
+    def choose(self) -> Tuple[str, Optional[str]]:
+        names, weights = zip(*self.config.mix.items())
+        with self.lock:
+            name = self.random.choices(names, weights)[0]
+            if name != 'save' and not self.ids:
+                name = 'save'
+            id_ = None
+            if name == 'retrieve':
+                id_ = self.random.choice(self.ids)
+            elif name == 'delete':
+                id_ = self.ids.pop(self.random.randrange(len(self.ids)))
+        return name, id_
+
+    def run_one(self):
+        """
+        Run one randomly chosen operation in the calling thread.
+
+        :return: (operation name, seconds, rpcs, error name or None)
+        """
+        name, id_ = self.choose()
+        rpcs_before = self.client.thread_rpc_count()
+        error = None
+        start = time.perf_counter()
+        try:
+            if name == 'save':
+                user = self.new_user()
+                user.save()
+                with self.lock:
+                    self.ids.append(user.id)
+            elif name == 'retrieve':
+                LoadUser(id=id_).retrieve()
+            else:
+                LoadUser(id=id_).delete()
+        except Exception as e:
+            error = e.__class__.__name__
+        elapsed = time.perf_counter() - start
+        return name, elapsed, self.client.thread_rpc_count() - rpcs_before, error
+
+
+def _client(config: _Config, seed: Optional[int]) -> memory.Client:
+    client = memory.Client(latency=config.latency, jitter=config.jitter, error_rate=config.error_rate, seed=seed)
+    Model.use_client(client)
+    return client
+
+
+def _run_threads(worker: _Worker, operations: int, concurrency: int):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda _: worker.run_one(), range(operations)))
+
+
+def _run_asyncio(worker: _Worker, operations: int, concurrency: int):
+    # Model I/O is synchronous, so each task hands its operation to an executor thread and awaits it.
+    async def main():
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            async def task():
+                async with semaphore:
+                    return await loop.run_in_executor(pool, worker.run_one)
+            return await asyncio.gather(*(task() for _ in range(operations)))
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def _run_process(config: _Config, operations: int, seed: Optional[int]):
+    # runs in a worker process; each process has its own backend and its own preloaded documents
+    client = _client(config, seed)
+    worker = _Worker(client, config, seed)
+    worker.preload(max(1, config.preload // config.concurrency))
+    return [worker.run_one() for _ in range(operations)]
+
+
+def run(config: _Config) -> dict:
+    """
+    Run a load test and return its report. See `main` for the meaning of the options.
+    """
+    if config.mode == 'processes':
+        per_process = [config.operations // config.concurrency] * config.concurrency
+        for i in range(config.operations % config.concurrency):
+            per_process[i] += 1
+        seeds = [None if config.seed is None else config.seed + i for i in range(config.concurrency)]
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=config.concurrency) as pool:
+            samples = [sample for samples in pool.map(_run_process, [config] * config.concurrency, per_process, seeds)
+                       for sample in samples]
+    else:
+        previous_client = Model._client
+        try:
+            client = _client(config, config.seed)
+            worker = _Worker(client, config, config.seed)
+            worker.preload(config.preload)
+            start = time.perf_counter()
+            if config.mode == 'threads':
+                samples = _run_threads(worker, config.operations, config.concurrency)
+            else:
+                samples = _run_asyncio(worker, config.operations, config.concurrency)
+        finally:
+            Model.use_client(previous_client)
+    return report(samples, time.perf_counter() - start, config)
+
+
+def percentile(sorted_values, p: float) -> float:
+    """
+    :param sorted_values: values in ascending order
+    :param p: percentile between 0 and 100
+    :return: nearest-rank percentile, 0.0 for no values
+    """
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(p / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def _summarize(samples, wall_seconds: float) -> dict:
+    latencies = sorted(sample[1] for sample in samples)
+    errors = {}
+    for sample in samples:
+        if sample[3] is not None:
+            errors[sample[3]] = errors.get(sample[3], 0) + 1
+    return {
+        'operations': len(samples),
+        'errors': errors,
+        'throughput': len(samples) / wall_seconds if wall_seconds else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        'rpcs_per_operation': sum(sample[2] for sample in samples) / len(samples) if samples else 0.0,
+    }
+
+
+def report(samples, wall_seconds: float, config: _Config) -> dict:
+    """
+    :param samples: (operation name, seconds, rpcs, error name or None) tuples
+    :param wall_seconds: duration of the whole run
+    :return: summary of all operations and of each operation type
+    """
+    return {
+        'config': dict(vars(config)),
+        'wall_seconds': wall_seconds,
+        'total': _summarize(samples, wall_seconds),
+        'by_operation': {name: _summarize([sample for sample in samples if sample[0] == name], wall_seconds)
+                         for name in OPERATIONS if any(sample[0] == name for sample in samples)},
+    }
+
+
+def format_report(result: dict) -> str:
+    config = result['config']
+    lines = [
+        f'{config["operations"]} operations, {config["mode"]} x{config["concurrency"]}, '
+        f'latency {config["latency"] * 1000:.1f}ms +/- {config["jitter"] * 1000:.1f}ms, '
+        f'error rate {config["error_rate"]:.2%}, {result["wall_seconds"]:.2f}s',
+        f'{"operation":<10} {"count":>7} {"errors":>7} {"ops/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+        f'{"rpcs/op":>8}',
+    ]
+    rows = list(result['by_operation'].items()) + [('total', result['total'])]
+    for name, summary in rows:
+        lines.append(f'{name:<10} {summary["operations"]:>7} {sum(summary["errors"].values()):>7} '
+                     f'{summary["throughput"]:>9.1f} {summary["p50_ms"]:>8.2f} {summary["p95_ms"]:>8.2f} '
+                     f'{summary["p99_ms"]:>8.2f} {summary["rpcs_per_operation"]:>8.2f}')
+    return '\n'.join(lines)
+
+
+def _parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f'unknown operation {name}; choose from {", ".join(OPERATIONS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='fsmodels-loadtest',
+        description='Drive Model.save/retrieve/delete through a latency-injecting in-memory firestore stand-in.')
+    parser.add_argument('--operations', type=int, default=1000, help='number of logical operations (default: %(default)s)')
+    parser.add_argument('--mix', type=_parse_mix, default=None,
+                        help='weighted operation mix, e.g. save=4,retrieve=5,delete=1 (the default)')
+    parser.add_argument('--concurrency', type=int, default=8, help='threads, processes or tasks (default: %(default)s)')
+    parser.add_argument('--mode', choices=MODES, default='threads', help='how to scale (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds per RPC (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- seconds per RPC (default: %(default)s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability an RPC fails (default: %(default)s)')
+    parser.add_argument('--preload', type=int, default=100, help='documents saved before the run (default: %(default)s)')
+    parser.add_argument('--no-children', action='store_true', help='save users without a ModelField child')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for a repeatable operation mix')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    result = run(_Config(
+        operations=args.operations, mix=args.mix, concurrency=args.concurrency, mode=args.mode,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, preload=args.preload,
+        children=not args.no_children, seed=args.seed,
+    ))
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
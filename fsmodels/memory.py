@@ -0,0 +1,888 @@
+"""
+In-process stand-in for ``google.cloud.firestore.Client``.
+
+Implements the part of the Firestore client API that fsmodels uses, keeps every document in memory, and can inject
+per-RPC latency, jitter and errors. Use it to run Model code without credentials or network, and to measure how many
+round trips a model operation costs.
+
+Example:
+
+.. code-block:: python
+
+    from fsmodels import memory
+    from fsmodels.models import Model
+
+    client = memory.Client(latency=0.01, jitter=0.002)
+    Model.use_client(client)
+
+    user = User(username='bmayes', password='password')
+    user.save()
+    client.rpc_count # 2; one read to check whether the document exists and one write
+"""
+import copy
+import time
+import datetime
+import random
+import queue
+import logging
+import threading
+from enum import Enum
+from typing import Optional, Iterable, Callable, List, Sequence, Union
+
+from fsmodels.utils import auto_id
+
+try:
+    from google.api_core.exceptions import NotFound, ServiceUnavailable
+except ImportError:  # pragma: no cover - depends on the environment
+    class NotFound(Exception):
+        pass
+
+    class ServiceUnavailable(Exception):
+        pass
+
+
+def _join(*parts) -> str:
+    return '/'.join(part for part in parts if part)
+
+
+def _get_path(data: dict, field_path: str):
+    """
+    :raises KeyError: if any part of the dotted `field_path` is missing
+    """
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict):
+            raise KeyError(field_path)
+        value = value[part]
+    return value
+
+
+def field_value(data: dict, field_path: str):
+    """
+    :return: value at the dotted `field_path` of `data`, or None if it is missing
+    """
+    try:
+        return _get_path(data, field_path)
+    except KeyError:
+        return None
+
+
+def _path_key(path: str) -> tuple:
+    # firestore orders document names segment by segment
+    return tuple(path.split('/'))
+
+
+def _set_path(data: dict, field_path: str, value):
+    parts = field_path.split('.')
+    for part in parts[:-1]:
+        child = data.get(part)
+        if not isinstance(child, dict):
+            child = data[part] = {}
+        data = child
+    data[parts[-1]] = value
+
+
+# firestore orders values of different types by type first, in this order; values of other types sort last
+NULL, BOOLEAN, NUMBER, TIMESTAMP, STRING, BYTES, REFERENCE, GEOPOINT, ARRAY, MAP, OTHER = range(11)
+
+
+def _type_class(value) -> int:
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return BOOLEAN
+    if isinstance(value, (int, float)):
+        return NUMBER
+    if isinstance(value, datetime.datetime):
+        return TIMESTAMP
+    if isinstance(value, str):
+        return STRING
+    if isinstance(value, bytes):
+        return BYTES
+    if isinstance(value, (list, tuple)):
+        return ARRAY
+    if isinstance(value, dict):
+        return MAP
+    # DocumentReference and GeoPoint of this module or of google.cloud.firestore
+    if hasattr(value, 'path') and hasattr(value, 'collection'):
+        return REFERENCE
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        return GEOPOINT
+    return OTHER
+
+
+def order_key(value):
+    """
+    :return: key that sorts values the way firestore orders them: by type, then by value. Naive datetimes are taken
+             to be UTC, arrays compare element by element and maps by their sorted keys, then values.
+    """
+    type_class = _type_class(value)
+    if type_class == NULL:
+        return NULL, 0
+    if type_class == TIMESTAMP:
+        return type_class, value if value.tzinfo is not None else value.replace(tzinfo=datetime.timezone.utc)
+    if type_class == REFERENCE:
+        return type_class, _path_key(value.path)
+    if type_class == GEOPOINT:
+        return type_class, (value.latitude, value.longitude)
+    if type_class == ARRAY:
+        return type_class, tuple(order_key(item) for item in value)
+    if type_class == MAP:
+        return type_class, tuple((key, order_key(item)) for key, item in sorted(value.items()))
+    if type_class == OTHER:
+        return type_class, repr(value)
+    return type_class, value
+
+
+def _equal(a, b) -> bool:
+    # firestore only compares values of the same type; True is not 1, and neither is {'a': True} {'a': 1}
+    type_class = _type_class(a)
+    if type_class != _type_class(b):
+        return False
+    if type_class in (BOOLEAN, NUMBER, STRING, BYTES, OTHER):
+        return a == b
+    return order_key(a) == order_key(b)
+
+
+def _compare(compare):
+    def compare_same_type(a, b):
+        return _type_class(a) == _type_class(b) and compare(order_key(a), order_key(b))
+    return compare_same_type
+
+
+OPERATORS = {
+    '==': _equal,
+    '!=': lambda a, b: not _equal(a, b),
+    '<': _compare(lambda a, b: a < b),
+    '<=': _compare(lambda a, b: a <= b),
+    '>': _compare(lambda a, b: a > b),
+    '>=': _compare(lambda a, b: a >= b),
+    'in': lambda a, b: any(_equal(a, item) for item in b),
+    'not-in': lambda a, b: not any(_equal(a, item) for item in b),
+    'array_contains': lambda a, b: isinstance(a, list) and any(_equal(item, b) for item in a),
+    'array_contains_any': lambda a, b: isinstance(a, list) and any(_equal(item, other) for item in a for other in b),
+}
+
+
+def matches(data: dict, filters) -> bool:
+    """
+    :param data: document data
+    :param filters: (field path, operator, value) tuples, see OPERATORS
+    :return: whether the document matches every filter, as a firestore query would decide
+    """
+    for field_path, op_string, value in filters:
+        try:
+            field_value = _get_path(data, field_path)
+        except KeyError:
+            return False
+        try:
+            if not OPERATORS[op_string](field_value, value):
+                return False
+        except TypeError:
+            # values that cannot be compared, e.g. two maps
+            return False
+    return True
+
+
+def _merge(target: dict, source: dict):
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+class DocumentSnapshot:
+    """
+    Parallels google.cloud.firestore.DocumentSnapshot
+    """
+
+    def __init__(self, reference: 'DocumentReference', data: Optional[dict], read_time: float):
+        self.reference = reference
+        self._data = data
+        self.read_time = read_time
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str):
+        """
+        :raises KeyError: if the field does not exist in the document
+        """
+        if self._data is None:
+            raise KeyError(field_path)
+        return copy.deepcopy(_get_path(self._data, field_path))
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.reference.path}>'
+
+
+class DocumentReference:
+    """
+    Parallels google.cloud.firestore.DocumentReference
+    """
+
+    def __init__(self, client: 'Client', path: str):
+        self._client = client
+        self.path = path
+        self._path = tuple(path.split('/'))
+
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    @property
+    def parent(self) -> 'CollectionReference':
+        return CollectionReference(self._client, '/'.join(self._path[:-1]))
+
+    def collection(self, collection_id: str) -> 'CollectionReference':
+        return CollectionReference(self._client, _join(self.path, collection_id))
+
+    def collections(self) -> Iterable['CollectionReference']:
+        self._client._rpc('collections')
+        names = self._client._store.subcollection_names(self.path)
+        return [self.collection(name) for name in names]
+
+    def get(self, field_paths=None) -> DocumentSnapshot:
+        self._client._rpc('get')
+        self._client._read()
+        return self._client._snapshot(self)
+
+    def set(self, document_data: dict, merge: Union[bool, Sequence[str]] = False):
+        self._client._rpc('set')
+        return self._client._store.write(self.path, 'set', document_data, merge=merge)
+
+    def update(self, field_updates: dict):
+        self._client._rpc('update')
+        return self._client._store.write(self.path, 'update', field_updates)
+
+    def delete(self):
+        self._client._rpc('delete')
+        return self._client._store.write(self.path, 'delete')
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other._client is self._client and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.path}>'
+
+
+class Query:
+    """
+    Parallels google.cloud.firestore.Query. Supports where, order_by, limit, offset and start_after.
+    """
+    def __init__(self, client: 'Client', collection_path: str, all_descendants: bool = False, filters=(),
+                 orders=(), limit: Optional[int] = None, offset: int = 0, start_after=None):
+        self._client = client
+        self._collection_path = collection_path
+        self._all_descendants = all_descendants
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._start_after = start_after
+
+    def _copy(self, **kwargs) -> 'Query':
+        options = {
+            'all_descendants': self._all_descendants,
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit': self._limit,
+            'offset': self._offset,
+            'start_after': self._start_after,
+        }
+        options.update(kwargs)
+        return Query(self._client, self._collection_path, **options)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in OPERATORS:
+            raise ValueError(f'Operator {op_string} is not supported.')
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING'):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int):
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int):
+        return self._copy(offset=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start_after=document_fields_or_snapshot)
+
+    @staticmethod
+    def _sort_key(field_path: str):
+        def key(item):
+            try:
+                return order_key(_get_path(item[1], field_path))
+            except KeyError:
+                return order_key(None)
+        return key
+
+    def _documents(self):
+        """
+        :return: list of (path, data) of matching documents in query order. data is not copied.
+        """
+        store = self._client._store
+        if self._all_descendants:
+            items = store.collection_group_items(self._collection_path)
+        else:
+            items = store.collection_items(self._collection_path)
+        items = [(path, data) for path, data in items if matches(data, self._filters)]
+        # like firestore, ties are ordered by document path, in the direction of the last order_by
+        items.sort(key=lambda item: _path_key(item[0]), reverse=self._descending()[-1])
+        for (field_path, _), descending in zip(reversed(self._orders), reversed(self._descending()[:-1])):
+            items.sort(key=self._sort_key(field_path), reverse=descending)
+        if self._start_after is not None:
+            items = self._after(items)
+        items = items[self._offset:]
+        if self._limit is not None:
+            items = items[:self._limit]
+        return items
+
+    def _descending(self) -> List[bool]:
+        """
+        :return: whether each order_by is descending, followed by the direction of the implicit order by path
+        """
+        descending = [direction.upper().startswith('DESC') for _, direction in self._orders]
+        return descending + [descending[-1] if descending else False]
+
+    def _after(self, items):
+        """
+        Items after the cursor. Like firestore, a snapshot cursor is positioned by its values of the order_by fields
+        and its path, so it works whether or not the document is still among the results; a dict cursor by its values
+        of the order_by fields only.
+        """
+        cursor = self._start_after
+        keys = [self._sort_key(field_path) for field_path, _ in self._orders]
+        descending = self._descending()
+        if isinstance(cursor, DocumentSnapshot):
+            target = [key((None, cursor.to_dict() or {})) for key in keys] + [_path_key(cursor.reference.path)]
+        else:
+            # dict of field values, compared against the order_by fields
+            target, descending = [key((None, cursor)) for key in keys], descending[:-1]
+
+        def after(item) -> bool:
+            values = [key(item) for key in keys] + [_path_key(item[0])]
+            for value, target_value, reverse in zip(values, target, descending):
+                if value != target_value:
+                    return (value > target_value) != reverse
+            return False
+
+        return [item for item in items if after(item)]
+
+    def count(self, alias: Optional[str] = None) -> 'AggregationQuery':
+        return AggregationQuery(self).count(alias)
+
+    def sum(self, field_ref: str, alias: Optional[str] = None) -> 'AggregationQuery':
+        return AggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref: str, alias: Optional[str] = None) -> 'AggregationQuery':
+        return AggregationQuery(self).avg(field_ref, alias)
+
+    def on_snapshot(self, callback: Callable) -> 'Watch':
+        """
+        Call `callback(docs, changes, read_time)` from a background thread with the current results, then again
+        after every write that changes them, as google.cloud.firestore.Query.on_snapshot does.
+
+        :return: Watch; call unsubscribe() to stop listening
+        """
+        return self._client._listen(self, callback)
+
+    def stream(self, transaction=None):
+        self._client._rpc('query')
+        read_time = time.time()
+        for path, data in self._documents():
+            self._client._read()
+            yield DocumentSnapshot(DocumentReference(self._client, path), copy.deepcopy(data), read_time)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    """
+    Parallels google.cloud.firestore.CollectionReference
+    """
+
+    def __init__(self, client: 'Client', path: str):
+        super(CollectionReference, self).__init__(client, path)
+        self.path = path
+        self._path = tuple(path.split('/'))
+
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    @property
+    def parent(self) -> Optional[DocumentReference]:
+        if len(self._path) == 1:
+            return None
+        return DocumentReference(self._client, '/'.join(self._path[:-1]))
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self._client, _join(self.path, document_id or auto_id()))
+
+    def add(self, document_data: dict, document_id: Optional[str] = None):
+        document_ref = self.document(document_id)
+        return document_ref.set(document_data).update_time, document_ref
+
+    def list_documents(self, page_size: Optional[int] = None) -> Iterable[DocumentReference]:
+        self._client._rpc('list_documents')
+        return [DocumentReference(self._client, path) for path, _ in self._client._store.collection_items(self.path)]
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.path}>'
+
+
+class AggregationResult:
+    """
+    Parallels google.cloud.firestore_v1.aggregation.AggregationResult
+    """
+
+    def __init__(self, alias: str, value, read_time: Optional[float] = None):
+        self.alias = alias
+        self.value = value
+        self.read_time = read_time
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} alias={self.alias}, value={self.value}>'
+
+
+class AggregationQuery:
+    """
+    Parallels google.cloud.firestore.AggregationQuery: count, sum and avg over the results of a query, computed
+    by a single RPC. As in firestore, sum and avg ignore values that are not numbers, and avg is None without any.
+    """
+
+    def __init__(self, nested_query: Query):
+        self._nested_query = nested_query
+        self._aggregations = []
+
+    def _add(self, kind: str, field_ref: Optional[str], alias: Optional[str]) -> 'AggregationQuery':
+        alias = alias or f'field_{len(self._aggregations) + 1}'
+        self._aggregations.append((kind, field_ref, alias))
+        return self
+
+    def count(self, alias: Optional[str] = None) -> 'AggregationQuery':
+        return self._add('count', None, alias)
+
+    def sum(self, field_ref: str, alias: Optional[str] = None) -> 'AggregationQuery':
+        return self._add('sum', field_ref, alias)
+
+    def avg(self, field_ref: str, alias: Optional[str] = None) -> 'AggregationQuery':
+        return self._add('avg', field_ref, alias)
+
+    @staticmethod
+    def _numbers(items, field_ref: str):
+        for _, data in items:
+            value = field_value(data, field_ref)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield value
+
+    def get(self, transaction=None):
+        """
+        :return: [[AggregationResult, ...]]; one result per aggregation, in the order they were added
+        """
+        client = self._nested_query._client
+        client._rpc('aggregation')
+        read_time = time.time()
+        with client._store.lock:
+            items = self._nested_query._documents()
+            results = []
+            for kind, field_ref, alias in self._aggregations:
+                if kind == 'count':
+                    value = len(items)
+                else:
+                    numbers = list(self._numbers(items, field_ref))
+                    if kind == 'sum':
+                        value = sum(numbers)
+                    else:
+                        value = sum(numbers) / len(numbers) if numbers else None
+                results.append(AggregationResult(alias, value, read_time))
+        return [results]
+
+    def stream(self, transaction=None):
+        yield from self.get(transaction)
+
+
+class ChangeType(Enum):
+    """
+    Parallels google.cloud.firestore_v1.watch.ChangeType
+    """
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    """
+    Parallels google.cloud.firestore_v1.watch.DocumentChange
+    """
+
+    def __init__(self, type: ChangeType, document: DocumentSnapshot, old_index: int, new_index: int):
+        self.type = type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+
+class Watch:
+    """
+    A snapshot listener registered with Query.on_snapshot. Keeps the last results delivered to its callback so that
+    the next delivery only reports what changed.
+    """
+
+    def __init__(self, client: 'Client', query: Query, callback: Callable):
+        self._client = client
+        self._query = query
+        self._callback = callback
+        self._closed = False
+        # path -> data of the documents currently in the results; data is a private copy that is never mutated
+        self._state = {}
+        self._order = []
+
+    def _affected_by(self, paths) -> bool:
+        query = self._query
+        for path in paths:
+            collection_path = path.rsplit('/', 1)[0]
+            if query._all_descendants:
+                if collection_path.rsplit('/', 1)[-1] == query._collection_path:
+                    return True
+            elif collection_path == query._collection_path:
+                return True
+        return False
+
+    def _changes(self, changed_paths, read_time: float):
+        """
+        Compare the query results with the last delivered results. Must be called with the store lock held.
+
+        :return: (docs, changes) to deliver, or None if nothing changed
+        """
+        items = self._query._documents()
+        order = [path for path, _ in items]
+        old_index = {path: i for i, path in enumerate(self._order)}
+        state, changes = {}, []
+        for new_index, (path, data) in enumerate(items):
+            previous = self._state.get(path)
+            if previous is None:
+                state[path] = copy.deepcopy(data)
+                change_type, index = ChangeType.ADDED, -1
+            elif path in changed_paths and data != previous:
+                state[path] = copy.deepcopy(data)
+                change_type, index = ChangeType.MODIFIED, old_index[path]
+            else:
+                state[path] = previous
+                continue
+            snapshot = DocumentSnapshot(DocumentReference(self._client, path), state[path], read_time)
+            changes.append(DocumentChange(change_type, snapshot, index, new_index))
+        for path, data in self._state.items():
+            if path not in state:
+                snapshot = DocumentSnapshot(DocumentReference(self._client, path), data, read_time)
+                changes.append(DocumentChange(ChangeType.REMOVED, snapshot, old_index[path], -1))
+        first = not self._order and not self._state and changed_paths is None
+        self._state, self._order = state, order
+        if not changes and not first:
+            return None
+        docs = [DocumentSnapshot(DocumentReference(self._client, path), state[path], read_time) for path in order]
+        return docs, changes
+
+    def unsubscribe(self):
+        self._closed = True
+        self._client._store.unlisten(self)
+
+    close = unsubscribe
+
+
+class WriteBatch:
+    """
+    Parallels google.cloud.firestore.WriteBatch; all writes are applied by a single RPC on commit.
+    """
+
+    def __init__(self, client: 'Client'):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference: DocumentReference, document_data: dict, merge: Union[bool, Sequence[str]] = False):
+        self._writes.append((reference.path, 'set', copy.deepcopy(document_data), merge))
+
+    def update(self, reference: DocumentReference, field_updates: dict):
+        self._writes.append((reference.path, 'update', copy.deepcopy(field_updates), False))
+
+    def delete(self, reference: DocumentReference):
+        self._writes.append((reference.path, 'delete', None, False))
+
+    def commit(self):
+        self._client._rpc('commit')
+        results = self._client._store.write_many(self._writes)
+        self._writes = []
+        return results
+
+    def __len__(self):
+        return len(self._writes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+
+class WriteResult:
+    def __init__(self, update_time: float):
+        self.update_time = update_time
+
+
+class _Store:
+    """
+    Documents keyed by path, plus the indexes needed to list collections and subcollections. Shared by every reference
+    created from the same Client.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # document path -> data
+        self.documents = {}
+        # collection path -> {document id: None}; dicts keep insertion order
+        self.collections = {}
+        self.watches = []
+        # called with (watch, docs, changes, read_time) for every change in the results of a watch
+        self.notify = None
+
+    def read(self, path: str) -> Optional[dict]:
+        return self.documents.get(path)
+
+    def collection_items(self, collection_path: str):
+        with self.lock:
+            ids = list(self.collections.get(collection_path, ()))
+            return [(_join(collection_path, i), self.documents[_join(collection_path, i)]) for i in ids]
+
+    def collection_group_items(self, collection_id: str):
+        with self.lock:
+            paths = [path for path in self.collections if path.rsplit('/', 1)[-1] == collection_id]
+        items = []
+        for path in paths:
+            items.extend(self.collection_items(path))
+        return items
+
+    def subcollection_names(self, document_path: str):
+        prefix = document_path + '/'
+        with self.lock:
+            return [path[len(prefix):] for path, ids in self.collections.items()
+                    if ids and path.startswith(prefix) and '/' not in path[len(prefix):]]
+
+    def write(self, path: str, op: str, data: Optional[dict] = None, merge: Union[bool, Sequence[str]] = False) \
+            -> WriteResult:
+        return self.write_many([(path, op, copy.deepcopy(data), merge)])[0]
+
+    def write_many(self, writes) -> list:
+        """
+        Apply (path, op, data, merge) writes atomically. Data must already be a private copy.
+
+        :raises NotFound: if an update targets a missing document; no write is applied in that case
+        """
+        with self.lock:
+            for path, op, _, _ in writes:
+                if op == 'update' and path not in self.documents:
+                    raise NotFound(f'No document to update: {path}')
+            # like a firestore commit, every write gets the commit time, and snapshots read from then on include them
+            commit_time = time.time()
+            results = []
+            for path, op, data, merge in writes:
+                self._apply(path, op, data, merge)
+                results.append(WriteResult(commit_time))
+            if self.watches:
+                self._notify_watches({path for path, _, _, _ in writes}, commit_time)
+            return results
+
+    def listen(self, watch: Watch, read_time: float):
+        with self.lock:
+            self.watches.append(watch)
+            self.notify(watch, *watch._changes(None, read_time), read_time)
+
+    def unlisten(self, watch: Watch):
+        with self.lock:
+            if watch in self.watches:
+                self.watches.remove(watch)
+
+    def _notify_watches(self, changed_paths, read_time: float):
+        for watch in self.watches:
+            if watch._affected_by(changed_paths):
+                delivery = watch._changes(changed_paths, read_time)
+                if delivery is not None:
+                    self.notify(watch, *delivery, read_time)
+
+    def _apply(self, path: str, op: str, data: Optional[dict], merge: Union[bool, Sequence[str]]):
+        collection_path, document_id = path.rsplit('/', 1)
+        if op == 'delete':
+            self.documents.pop(path, None)
+            self.collections.get(collection_path, {}).pop(document_id, None)
+            return
+        existing = self.documents.get(path)
+        if op == 'update':
+            for field_path, value in data.items():
+                _set_path(existing, field_path, value)
+        elif isinstance(merge, (list, tuple)):
+            # like firestore, only the listed field paths are written, each replacing the value it had
+            target = existing if existing is not None else {}
+            for field_path in merge:
+                _set_path(target, field_path, _get_path(data, field_path))
+            if existing is None:
+                self.documents[path] = target
+                self.collections.setdefault(collection_path, {})[document_id] = None
+        elif merge and existing is not None:
+            _merge(existing, data)
+        else:
+            self.documents[path] = data
+            self.collections.setdefault(collection_path, {})[document_id] = None
+
+
+class Client:
+    """
+    Parallels google.cloud.firestore.Client, backed by memory.
+
+    Every method that would be a network round trip against Firestore counts as one RPC: it is counted in
+    `rpc_counts` and is delayed by `latency` +/- `jitter` seconds. With probability `error_rate`, the RPC raises
+    ServiceUnavailable instead.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        :param latency: seconds each RPC takes
+        :param jitter: maximum seconds added to or removed from `latency`, uniformly distributed
+        :param error_rate: probability between 0 and 1 that an RPC fails
+        :param seed: seed for the jitter and error random number generator
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._store = _Store()
+        self._store.notify = self._enqueue_snapshot
+        self._snapshots = queue.Queue()
+        self._dispatcher = None
+        self._counts_lock = threading.Lock()
+        self._local = threading.local()
+        self.rpc_counts = {}
+        # documents returned by get, get_all and queries, which is what firestore bills reads for
+        self.documents_read = 0
+
+    @property
+    def rpc_count(self) -> int:
+        """
+        Total number of RPCs issued through this client, from all threads
+        """
+        return sum(self.rpc_counts.values())
+
+    def thread_rpc_count(self) -> int:
+        """
+        Number of RPCs issued through this client by the calling thread
+        """
+        return getattr(self._local, 'count', 0)
+
+    def reset_rpc_counts(self):
+        with self._counts_lock:
+            self.rpc_counts = {}
+            self.documents_read = 0
+
+    def _read(self, count: int = 1):
+        with self._counts_lock:
+            self.documents_read += count
+
+    def _rpc(self, name: str):
+        with self._counts_lock:
+            self.rpc_counts[name] = self.rpc_counts.get(name, 0) + 1
+            delay = self.latency
+            if self.jitter:
+                delay = max(0.0, delay + self._random.uniform(-self.jitter, self.jitter))
+            fail = self.error_rate and self._random.random() < self.error_rate
+        self._local.count = getattr(self._local, 'count', 0) + 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ServiceUnavailable(f'Injected error in {name}.')
+
+    def _listen(self, query: Query, callback: Callable) -> Watch:
+        watch = Watch(self, query, callback)
+        with self._counts_lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name='fsmodels-memory-listener',
+                                                    daemon=True)
+                self._dispatcher.start()
+        self._store.listen(watch, time.time())
+        return watch
+
+    def _enqueue_snapshot(self, watch: Watch, docs, changes, read_time: float):
+        self._snapshots.put((watch, docs, changes, read_time))
+
+    def _dispatch(self):
+        # delivers snapshots in the order the writes happened, like the single stream of a firestore listener
+        while True:
+            watch, docs, changes, read_time = self._snapshots.get()
+            try:
+                if self.latency:
+                    time.sleep(self.latency)
+                if not watch._closed:
+                    watch._callback(docs, changes, read_time)
+            except Exception:
+                logging.exception('Exception in snapshot listener callback.')
+            finally:
+                self._snapshots.task_done()
+
+    def flush(self):
+        """
+        Block until every pending snapshot has been delivered to its listener.
+        """
+        self._snapshots.join()
+
+    def _snapshot(self, reference: DocumentReference) -> DocumentSnapshot:
+        with self._store.lock:
+            data = copy.deepcopy(self._store.read(reference.path))
+        return DocumentSnapshot(reference, data, time.time())
+
+    def collection(self, *collection_path: str) -> CollectionReference:
+        return CollectionReference(self, _join(*collection_path))
+
+    def document(self, *document_path: str) -> DocumentReference:
+        return DocumentReference(self, _join(*document_path))
+
+    def collection_group(self, collection_id: str) -> Query:
+        """
+        Query over every collection named `collection_id`, at any depth
+        """
+        return Query(self, collection_id, all_descendants=True)
+
+    def collections(self) -> Iterable[CollectionReference]:
+        self._rpc('collections')
+        with self._store.lock:
+            paths = [path for path, ids in self._store.collections.items() if ids and '/' not in path]
+        return [self.collection(path) for path in paths]
+
+    def get_all(self, references: Iterable[DocumentReference], field_paths=None, transaction=None):
+        """
+        Fetch many documents with one RPC. Yields a snapshot per reference; missing documents do not exist.
+        """
+        references = list(references)
+        self._rpc('get_all')
+        self._read(len(references))
+        for reference in references:
+            yield self._snapshot(reference)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
@@ -0,0 +1,336 @@
+import copy
+import time
+import logging
+import threading
+from typing import Optional, List
+
+from fsmodels import memory
+from fsmodels.common import _BaseModel
+from fsmodels.index import IndexSet
+from fsmodels.query import QuerySet, _check_field
+
+
+def _seconds(read_time) -> float:
+    # google.cloud.firestore passes a datetime (and returns a protobuf Timestamp from delete); fsmodels.memory passes
+    # time.time()
+    if hasattr(read_time, 'timestamp'):
+        return read_time.timestamp()
+    if hasattr(read_time, 'nanos'):
+        return read_time.seconds + read_time.nanos / 1e9
+    return float(read_time)
+
+
+class Mirror:
+    """
+    In-process copy of the documents of a Model collection (or of a query on it), kept current by a firestore
+    snapshot listener. Reads are served from memory without any RPC. Usually created with `Model.mirror`.
+
+    Example:
+
+    .. code-block:: python
+
+        tiers = PricingTier.mirror()
+        tiers.wait(timeout=5) # until the first snapshot has arrived
+
+        tiers.retrieve('gold') # {'id': 'gold', 'price': 10, ...}; no RPC
+        tiers.where('price', '<', 20).get() # [<PricingTier>, ...]; no RPC
+        tiers.metrics() # {'ready': True, 'size': 3, 'lag': 0.012, 'updates': 1, ...}
+
+    Fields listed in the model's Meta.indexes are indexed (see fsmodels.index), and where/order_by queries on them
+    are answered from the indexes instead of by scanning every document.
+    """
+
+    def __init__(self, model, query: Optional[QuerySet] = None):
+        """
+        :param model: Model subclass to mirror
+        :param query: only mirror the documents matching this query (from `model.objects`)
+        """
+        self.model = model
+        self.query = query if query is not None else model.objects
+        self._documents = {}
+        self._indexes = IndexSet.for_model(model)
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._updates = 0
+        self._lag = None
+        self._last_update = None
+        # read time of the last snapshot, and update time of the write-throughs that are newer than it, by id
+        self._read_time = None
+        self._write_times = {}
+        self._watch = self.query._firestore_query().on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            seconds = _seconds(read_time)
+            if self._write_times:
+                # a snapshot read before a write-through was committed would take its document back in time
+                write_times = self._write_times
+                changes = [change for change in changes if write_times.get(change.document.id, seconds) <= seconds]
+                self._write_times = {id_: time_ for id_, time_ in write_times.items() if time_ > seconds}
+            if self._indexes is not None and len(changes) > max(1000, len(self._documents)):
+                # e.g. the first snapshot; sorting once beats inserting one document at a time
+                for change in changes:
+                    if change.type.name == 'REMOVED':
+                        self._documents.pop(change.document.id, None)
+                    else:
+                        self._documents[change.document.id] = change.document.to_dict()
+                self._indexes.rebuild(self._documents)
+            else:
+                for change in changes:
+                    self._apply(change.document.id,
+                                None if change.type.name == 'REMOVED' else change.document.to_dict())
+            self._updates += 1
+            self._last_update = time.time()
+            self._read_time = max(seconds, self._read_time or seconds)
+            self._lag = max(0.0, self._last_update - seconds)
+        self._ready.set()
+
+    def _apply(self, id_: str, data: Optional[dict]):
+        """
+        Store `data` as the document `id_`, or remove the document if `data` is None. Must be called with the lock held.
+        """
+        previous = self._documents.pop(id_, None)
+        if previous is not None and self._indexes is not None:
+            self._indexes.remove(id_, previous)
+        if data is not None:
+            self._documents[id_] = data
+            if self._indexes is not None:
+                self._indexes.add(id_, data)
+
+    def _written(self, id_: str, data: Optional[dict], merge: bool = False, update_time=None):
+        """
+        Apply a write made through the model layer right away, instead of waiting for the snapshot listener to
+        deliver it. Mirrors of a query with a limit or offset cannot tell locally whether the document belongs in
+        them, and wait for the listener.
+
+        Snapshots read before `update_time` are older than the write and leave the document alone, so reads do not go
+        back in time when the listener catches up. Without an update time, the next snapshot wins.
+
+        :param data: the data written, or None for a delete
+        :param merge: whether `data` replaced only its own top level fields of the existing document (see
+                      fsmodels.wal.add_write) instead of the whole document
+        :param update_time: commit time of the write, as returned by firestore
+        """
+        if self.query._limit is not None or self.query._offset:
+            return
+        with self._lock:
+            if update_time is not None:
+                seconds = _seconds(update_time)
+                if self._read_time is not None and seconds <= self._read_time:
+                    # the listener has delivered this write, or something newer, already
+                    return
+                self._write_times[id_] = max(seconds, self._write_times.get(id_, seconds))
+            if data is not None and merge and id_ in self._documents:
+                # like the update that made the write, top level fields are replaced
+                data = {**self._documents[id_], **data}
+            if data is not None and not memory.matches(data, self.query._filters):
+                data = None
+            self._apply(id_, data)
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the first snapshot has been received
+        """
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the first snapshot has been received.
+
+        :param timeout: seconds to wait at most
+        :return: whether the mirror is ready
+        """
+        return self._ready.wait(timeout)
+
+    @property
+    def size(self) -> int:
+        return len(self._documents)
+
+    @property
+    def lag(self) -> Optional[float]:
+        """
+        Seconds between the read time of the last snapshot and the moment it was applied to the mirror
+        """
+        return self._lag
+
+    def metrics(self) -> dict:
+        return {
+            'ready': self.ready,
+            'size': self.size,
+            'lag': self.lag,
+            'updates': self._updates,
+            'last_update': self._last_update,
+        }
+
+    def retrieve(self, id_: str) -> dict:
+        """
+        Parallels Model.retrieve: the record with id `id_`, or {} if the mirror does not have it.
+        """
+        with self._lock:
+            document = self._documents.get(str(id_))
+            # a copy, so the caller cannot change the mirror (or its indexes) through nested values
+            return copy.deepcopy(document) if document is not None else {}
+
+    def get(self, id_: str) -> Optional[_BaseModel]:
+        """
+        :return: model instance of the record with id `id_`, or None if the mirror does not have it
+        """
+        document = self.retrieve(id_)
+        if not document:
+            return None
+        return self.model._from_dict(str(id_), document)
+
+    def _items(self):
+        with self._lock:
+            return list(self._documents.items())
+
+    def _indexed_items(self, filters, orders, limit: Optional[int]):
+        """
+        :return: (list of (id, data) matching `filters`, whether it is in query order), or None if no index applies
+        """
+        if self._indexes is None:
+            return None
+        with self._lock:
+            selected = self._indexes.select(filters, orders, limit)
+            if selected is None:
+                return None
+            ids, ordered = selected
+            items = []
+            for id_ in ids:
+                data = self._documents.get(id_)
+                if data is not None and memory.matches(data, filters):
+                    items.append((id_, data))
+                    if ordered and limit is not None and len(items) >= limit:
+                        break
+            return items, ordered
+
+    def where(self, field_path: str, op_string: str, value) -> 'LocalQuerySet':
+        return LocalQuerySet(self).where(field_path, op_string, value)
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'LocalQuerySet':
+        return LocalQuerySet(self).order_by(field_path, direction)
+
+    def all(self) -> 'LocalQuerySet':
+        return LocalQuerySet(self)
+
+    def close(self):
+        """
+        Stop listening. The mirror keeps its last contents but no longer changes.
+        """
+        self._watch.unsubscribe()
+        self.model._mirrors.pop(self._key(self.model, self.query), None)
+
+    @staticmethod
+    def _key(model, query: QuerySet):
+        # repr, because filter values such as the list of an 'in' filter are not hashable
+        return model, repr((query._filters, query._orders, query._limit, query._offset))
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.model.__name__} size:{self.size} ready:{self.ready}>'
+
+
+class LocalQuerySet:
+    """
+    Query over the contents of a Mirror; parallels QuerySet, but is answered from memory.
+    """
+
+    def __init__(self, mirror: Mirror, filters=(), orders=(), limit: Optional[int] = None):
+        self.mirror = mirror
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+
+    def _copy(self, **kwargs) -> 'LocalQuerySet':
+        options = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit}
+        options.update(kwargs)
+        return LocalQuerySet(self.mirror, **options)
+
+    def where(self, field_path: str, op_string: str, value) -> 'LocalQuerySet':
+        _check_field(self.mirror.model, field_path)
+        if op_string not in memory.OPERATORS:
+            raise ValueError(f'Operator {op_string} is not supported.')
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'LocalQuerySet':
+        _check_field(self.mirror.model, field_path)
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'LocalQuerySet':
+        return self._copy(limit=count)
+
+    def _results(self):
+        """
+        :return: list of (id, data) of the matching documents in query order
+        """
+        indexed = self.mirror._indexed_items(self._filters, self._orders, self._limit)
+        if indexed is not None and indexed[1]:
+            items = indexed[0]
+            return items if self._limit is None else items[:self._limit]
+        if indexed is not None:
+            items = indexed[0]
+        else:
+            items = [(id_, data) for id_, data in self.mirror._items() if memory.matches(data, self._filters)]
+        for field_path, direction in reversed(self._orders):
+            items.sort(key=lambda item: memory.order_key(memory.field_value(item[1], field_path)),
+                       reverse=direction.upper().startswith('DESC'))
+        return items if self._limit is None else items[:self._limit]
+
+    def stream(self):
+        for id_, data in self._results():
+            yield self.mirror.model._from_dict(id_, copy.deepcopy(data))
+
+    def __iter__(self):
+        return self.stream()
+
+    def get(self) -> List[_BaseModel]:
+        return list(self.stream())
+
+    def count(self) -> int:
+        return len(self._results())
+
+    def _numbers(self, field_path: str):
+        _check_field(self.mirror.model, field_path)
+        values = (memory.field_value(data, field_path) for _, data in self._results())
+        return [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+    def sum(self, field_path: str):
+        return sum(self._numbers(field_path))
+
+    def avg(self, field_path: str) -> Optional[float]:
+        numbers = self._numbers(field_path)
+        return sum(numbers) / len(numbers) if numbers else None
+
+
+_lock = threading.Lock()
+
+
+def written(model, id_: str, data: Optional[dict], merge: bool = False, update_time=None):
+    """
+    Apply a save (or, with data None, a delete) of the document `id_` of `model` to the open mirrors of `model`.
+    See Mirror._written.
+    """
+    mirrors = [open_mirror for open_mirror in list(model._mirrors.values()) if open_mirror.model is model]
+    if mirrors and data is not None:
+        # the caller keeps its own copy
+        data = copy.deepcopy(data)
+    for open_mirror in mirrors:
+        open_mirror._written(str(id_), data, merge, update_time)
+
+
+def mirror(model, query: Optional[QuerySet] = None) -> Mirror:
+    """
+    Return the open mirror of `model` for `query`, starting one if there is none. See Model.mirror.
+    """
+    query = query if query is not None else model.objects
+    key = Mirror._key(model, query)
+    with _lock:
+        existing = model._mirrors.get(key)
+        if existing is None:
+            logging.debug(f'Starting mirror of {model.__name__}.')
+            existing = model._mirrors[key] = Mirror(model, query)
+        return existing
+
@@ -1,16 +1,60 @@
 import os
+import copy
 import inspect
-from typing import Optional
+import logging
+import threading
+from typing import Optional, Sequence, Dict, Union
 
 from fsmodels.common import _BaseModel, ValidationError
-from fsmodels.fields import Field, ModelField, IDField
-from . utils import snake_case, skip_if
+from fsmodels.fields import Field, ModelField, ModelListField, IDField, CompressedField, _no_validation
+from fsmodels.profiling import FieldProfiler
+from fsmodels import memory, columnar
+from fsmodels.query import Manager, DocumentSet, QuerySet
+from fsmodels import mirror as _mirror
+from fsmodels import wal as _wal
+from fsmodels import graph as _graph
+from fsmodels.executor import ModelExecutor
+from . utils import snake_case, auto_id, document_size, MAX_DOCUMENT_BYTES
 
 # whether we will should try to connect to firestore
 CAN_CONNECT = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS', False)
 
+# guards the creation of the shared firestore client in Model._get_client
+_client_lock = threading.Lock()
 
-class BaseModel(_BaseModel):
+# fraction of MAX_DOCUMENT_BYTES above which Model.clean logs a warning
+DOCUMENT_SIZE_WARNING = 0.9
+
+
+class _FieldBinder(type):
+    """
+    Metaclass of BaseModel. Fields assigned to (or removed from) a model class after it was created, e.g. a model that
+    refers to itself with `Node.child = ModelField(Node)`, are bound to the class and to its subclasses right away, as
+    if they had been declared in the class body.
+    """
+
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        if isinstance(value, Field) and (value.name != name or value.model_name != cls.__name__) \
+                or not isinstance(value, Field) and cls._is_field_name(name):
+            cls._rebind_fields()
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        if cls._is_field_name(name):
+            cls._rebind_fields()
+
+    def _is_field_name(cls, name: str) -> bool:
+        return name in cls.__dict__.get('_fields', ()) or name in cls.__dict__.get('_model_fields', ()) \
+            or name in cls.__dict__.get('_list_fields', ())
+
+    def _rebind_fields(cls):
+        cls._bind_fields()
+        for subclass in cls.__subclasses__():
+            _FieldBinder._rebind_fields(subclass)
+
+
+class BaseModel(_BaseModel, metaclass=_FieldBinder):
     """
 
     Example:
@@ -25,20 +69,65 @@ class BaseModel(_BaseModel):
     """
     id = IDField()
 
+    # field name -> Field, per class; filled in by __init_subclass__
+    _fields = {}
+    _model_fields = {}
+    _compressed_fields = {}
+    _list_fields = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._bind_fields()
+
+    @classmethod
+    def _bind_fields(cls):
+        """
+        Bind the Field instances of a BaseModel subclass to it. Every subclass gets its own copy of the fields it
+        inherits, with `name` and `model_name` set once here, so instances never have to write to a Field (which is
+        shared by all instances and threads). Called when the class is created, and again when a field is assigned
+        to the class (or one of its bases) later.
+        """
+        # copies of inherited fields made by an earlier binding; the base class may have changed them since
+        for field_attr_name in cls.__dict__.get('_inherited_fields', ()):
+            if field_attr_name in cls.__dict__:
+                type.__delattr__(cls, field_attr_name)
+        fields, model_fields, list_fields, inherited = {}, {}, {}, set()
+        for field_attr_name in dir(cls):
+            attr = inspect.getattr_static(cls, field_attr_name)
+            if not isinstance(attr, Field):
+                continue
+            if field_attr_name not in cls.__dict__ or attr.name != field_attr_name or attr.model_name != cls.__name__:
+                if field_attr_name not in cls.__dict__:
+                    inherited.add(field_attr_name)
+                attr = copy.copy(attr)
+                attr.name = field_attr_name
+                attr.model_name = cls.__name__
+                setattr(cls, field_attr_name, attr)
+            if isinstance(attr, ModelField):
+                model_fields[field_attr_name] = attr
+            elif isinstance(attr, ModelListField):
+                # children live in a subcollection of their own; not part of the record
+                list_fields[field_attr_name] = attr
+            else:
+                fields[field_attr_name] = attr
+        cls._inherited_fields = frozenset(inherited)
+        cls._fields = fields
+        cls._model_fields = model_fields
+        cls._list_fields = list_fields
+        # written to firestore in their stored (compressed) form; see BaseModel.to_dict
+        cls._compressed_fields = {name: field for name, field in fields.items() if isinstance(field, CompressedField)}
+        # frozenset will always return set items in the same order regardless of the order
+        # that they are added. This results in hash-safe sets
+        cls._field_names = frozenset(fields)
+        cls._model_field_names = frozenset(model_fields)
+
     def _get_fields(self) -> frozenset:
         """
         Used to keep track of all Field instances defined on a subclass of BaseModel.
 
         :return: hashable set (frozenset) of all fields defined on the BaseModel subclass
         """
-        field_attr_names = []
-        for field_attr_name in dir(self):
-            attr = inspect.getattr_static(self, field_attr_name)
-            if not isinstance(attr, ModelField) and isinstance(attr, Field):
-                field_attr_names.append(field_attr_name)
-        # frozenset will always return set items in the same order regardless of the order
-        # that they are added. This results in hash-safe sets
-        return frozenset(field_attr_names)
+        return self._field_names
 
     def _get_model_fields(self) -> frozenset:
         """
@@ -46,40 +135,30 @@ class BaseModel(_BaseModel):
 
         :return: hashable set (frozenset) of all ModelFields defined on the BaseModel subclass
         """
-        field_attr_names = []
-        for field_attr_name in dir(self):
-            attr = inspect.getattr_static(self, field_attr_name)
-            if isinstance(attr, ModelField):
-                field_attr_names.append(field_attr_name)
-        # frozenset will always return set items in the same order regardless of the order
-        # that they are added. This results in hash-safe sets
-        return frozenset(field_attr_names)
+        return self._model_field_names
+
+    @classmethod
+    def _class_fields(cls) -> Dict[str, Field]:
+        """
+        Like _get_fields and _get_model_fields combined, but returns the Field instances.
+
+        :return: dict of field name to the Field (or ModelField) instance defined on the class
+        """
+        return {**cls._fields, **cls._model_fields}
 
     def _set_fields(self, _validate_on_init, kwargs):
-        self._field_names = self._get_fields()
-        for field_name in self._field_names:
-            field = getattr(self, field_name)
-            field.model_name = self.__class__.__name__
-            field.name = field_name
-            field_value = kwargs.get(field_name, field.default())
+        for field_name, field in self._fields.items():
+            field_value = kwargs[field_name] if field_name in kwargs else field.default()
             # replaces the original field with the corresponding value
             setattr(self, field_name, field_value)
-            # actually `Field` instance becomes hidden
-            setattr(self, f'_{field_name}', field)
             if _validate_on_init:
                 field.validate(field_value, raise_error=kwargs.get('raise_error', True))
 
     def _set_model_fields(self, _validate_on_init, kwargs):
-        self._model_field_names = self._get_model_fields()
-        for field_name in self._model_field_names:
-            field = getattr(self, field_name)
-            field.model_name = self.__class__.__name__
-            field.name = field_name
-            field_value = kwargs.get(field_name, field.default())
+        for field_name, field in self._model_fields.items():
+            field_value = kwargs[field_name] if field_name in kwargs else field.default()
             # replaces the original field with the corresponding value
             setattr(self, field_name, field_value)
-            # actually `Field` instance becomes hidden
-            setattr(self, f'_{field_name}', field)
             if _validate_on_init:
                 field.validate(field_value, raise_error=kwargs.get('raise_error', True))
 
@@ -97,6 +176,24 @@ class BaseModel(_BaseModel):
         self._set_fields(_validate_on_init, kwargs)
         self._set_model_fields(_validate_on_init, kwargs)
 
+    @classmethod
+    def profile(cls, budget: Optional[float] = None) -> FieldProfiler:
+        """
+        Profiler that records the time spent in the validation and default callables of this model's fields only.
+
+        :param budget: seconds a single validation call may take before a warning is logged
+        :return: FieldProfiler; use it as a context manager or call enable()/disable()
+
+        Example:
+
+        .. code-block:: python
+
+            with User.profile(budget=0.001) as profiler:
+                User(username='bmayes', _validate_on_init=True)
+            print(profiler.report())
+        """
+        return FieldProfiler(budget=budget, models=[cls.__name__])
+
     @property
     def is_valid(self):
         return self.validate(raise_error=False)[0]
@@ -120,9 +217,11 @@ class BaseModel(_BaseModel):
             user.validate(raise_error=False) # returns (False, description_of_errors<dict>) because username is required
         """
         error_map = {}
-        for field_name in self._field_names.union(self._model_field_names):
-            # The `Field` version of the field is now private
-            field_obj = getattr(self, f'_{field_name}')
+        for field_name, field_obj in self._class_fields().items():
+            if field_name in self._compressed_fields and field_obj.validation is _no_validation \
+                    and field_obj.pending(self):
+                # a non-empty value from firestore passes; no need to decompress it
+                continue
             field_value = getattr(self, field_name)
             is_valid, validation_error = field_obj.validate(field_value, raise_error)
             if not is_valid:
@@ -133,6 +232,42 @@ class BaseModel(_BaseModel):
             raise ValidationError(error_map)
         return not model_invalid, error_map
 
+    @classmethod
+    def validate_many(cls, records: Union[Sequence[dict], Dict[str, Sequence]], raise_error: bool = False) \
+            -> (bool, dict):
+        """
+        Validate many records at once without creating a model instance per record. Each record is validated the way
+        `cls(**record).validate()` would validate it: missing values get the field default, and unknown keys are
+        ignored. ModelField values may be model instances or dicts; dicts are validated against the related model.
+
+        Fields without a custom validation function are checked a column at a time, with NumPy when the records are a
+        dict of NumPy arrays.
+
+        :param records: list of dicts (one per record), or dict of columns (field name to list or NumPy array)
+        :param raise_error: whether or not to raise a ValidationError if any record is invalid
+        :return (bool, dict): whether all records are valid, and a dict of record index to the errors of that record
+
+        Example:
+
+        .. code-block:: python
+
+            class User(BaseModel):
+                username = Field(required=True)
+                email = Field(required=True)
+
+            User.validate_many([{'username': 'bmayes', 'email': 'b@example.com'}, {'username': 'jdoe'}])
+            # returns (False, {1: {'email': {'error': 'User field email is required but received no default and no value.'}}})
+
+            User.validate_many({'username': ['bmayes', 'jdoe'], 'email': ['b@example.com', 'j@example.com']})
+            # returns (True, {})
+        """
+        fields = cls._class_fields()
+        n, columns = columnar.extract_columns(records, fields)
+        error_map = columnar.validate_columns(fields, n, columns)
+        if raise_error and error_map:
+            raise ValidationError(error_map)
+        return not error_map, error_map
+
     def to_dict(self) -> dict:
         """
         Determines all Field instances defined on the Model and returns a dictionary with field names as keys and
@@ -151,10 +286,29 @@ class BaseModel(_BaseModel):
         :return:
         """
         field_tuple = tuple((field_name, getattr(self, field_name)) for field_name in self._field_names.union(self._model_field_names))
-        return {
+        record = {
             field_name: field_value.to_dict() if hasattr(field_value, 'to_dict') else field_value
             for field_name, field_value in field_tuple
         }
+        return record
+
+    def _stored_dict(self) -> dict:
+        """
+        Like to_dict, but with CompressedField values (here and in ModelField children) in the compressed form that is
+        written to firestore.
+        """
+        record = {
+            field_name: field_value._stored_dict() if isinstance(field_value, BaseModel) else field_value
+            for field_name, field_value in ((name, getattr(self, name)) for name in self._model_field_names)
+        }
+        record.update(
+            (field_name, field_value.to_dict() if hasattr(field_value, 'to_dict') else field_value)
+            for field_name, field_value in ((name, getattr(self, name)) for name in self._field_names
+                                            if name not in self._compressed_fields)
+        )
+        for field_name, field in self._compressed_fields.items():
+            record[field_name] = field.stored(self)
+        return record
 
     def from_dict(self, dict_obj: dict):
         # TODO: Sanity check. Should we discard unused keys or should we raise errors?
@@ -184,6 +338,15 @@ class BaseModel(_BaseModel):
         for field_name, _ in field_tuple:
             setattr(self, field_name, dict_obj.get(field_name, None))
 
+    def _load(self, document_dict: dict):
+        """
+        Like from_dict, for a document as it is stored in firestore: CompressedField values stay compressed until
+        they are accessed.
+        """
+        self.from_dict(document_dict)
+        for field_name, field in self._compressed_fields.items():
+            field.load(self, document_dict.get(field_name))
+
 
 class Model(BaseModel):
     # TODO: implement relational firestore logic, add to __doc__
@@ -225,30 +388,217 @@ class Model(BaseModel):
         # it's okay if there's no Meta
         pass
 
+    # see Model.use_client
+    _client = None
+
+    # User.objects.where(...) queries the collection of User; see fsmodels.query.QuerySet
+    objects = Manager()
+
+    # open mirrors of every Model subclass; see Model.mirror
+    _mirrors = {}
+
+    # see Model.use_wal
+    _wal = None
+
     def __init__(self, **kwargs):
         super(Model, self).__init__(**kwargs)
         self._set_meta()
         self._connect_client()
 
     def _set_meta(self):
-        self._meta_fields = [field for field in dir(self.Meta) if not field.startswith('__')]
-        if 'model_name' in self._meta_fields:
-            self._model_name = self.Meta.model_name
+        self._model_name, self._collection = self._get_meta()
+
+    @classmethod
+    def _get_meta(cls) -> (str, str):
+        """
+        :return: (model name, collection name) from Meta, falling back to the snake_case class name
+        """
+        # worked out once per class; looked up in cls.__dict__ so subclasses do not reuse the meta of their parent
+        meta = cls.__dict__.get('_meta')
+        if meta is None:
+            meta = cls._meta = cls._read_meta()
+        return meta
+
+    @classmethod
+    def _read_meta(cls) -> (str, str):
+        meta_fields = [field for field in dir(cls.Meta) if not field.startswith('__')]
+        if 'model_name' in meta_fields:
+            model_name = cls.Meta.model_name
         else:
-            self._model_name = snake_case(self.__class__.__name__)
-        if 'collection' in self._meta_fields:
-            self._collection = self.Meta.collection
+            model_name = snake_case(cls.__name__)
+        if 'collection' in meta_fields:
+            collection = cls.Meta.collection
         else:
-            self._collection = self._model_name
+            collection = model_name
+        return model_name, collection
+
+    @classmethod
+    def use_client(cls, client):
+        """
+        Use `client` for every instance of cls and its subclasses instead of connecting to firestore with the
+        credentials from the environment. Pass None to go back to the default.
+
+        :param client: google.cloud.firestore.Client, or fsmodels.memory.Client to run without firestore
+
+        Example:
+
+        .. code-block:: python
+
+            from fsmodels import memory
+
+            Model.use_client(memory.Client()) # all models
+            User.use_client(memory.Client(latency=0.01)) # only User and its subclasses
+        """
+        cls._client = client
+
+    @classmethod
+    def use_wal(cls, log: Optional['_wal.WriteAheadLog']):
+        """
+        Make save and delete of cls and its subclasses append to a local write-ahead log and return immediately,
+        instead of writing to firestore. Run a fsmodels.wal.Replayer to drain the log to firestore. Pass None to
+        write to firestore directly again.
+
+        :param log: fsmodels.wal.WriteAheadLog
+
+        Example:
+
+        .. code-block:: python
+
+            from fsmodels.wal import WriteAheadLog, Replayer
+
+            log = WriteAheadLog('/var/lib/myapp/wal', fsync='interval')
+            User.use_wal(log)
+            Replayer(log, User._get_client()).start()
+
+            User(username='bmayes').save() # {'id': '...', 'result': None, 'sequence': 1}
+        """
+        cls._wal = log
+
+    @classmethod
+    def _get_client(cls):
+        """
+        :return: the client set by use_client, otherwise a google.cloud.firestore.Client shared by all models,
+                 created on first use. None if there is no client and no credentials to connect with.
+        """
+        if cls._client is None and CAN_CONNECT:
+            with _client_lock:
+                # another thread may have created it while we waited
+                if Model._client is None:
+                    from google.cloud import firestore
+                    Model._client = firestore.Client()
+        return cls._client
 
-    @skip_if(not CAN_CONNECT, 'Most methods on Model will not work.')
     def _connect_client(self):
-        from google.cloud import firestore
-        db = firestore.Client()
-        self.firestore = firestore
+        db = self._get_client()
+        if db is None:
+            logging.warning('Skipping _connect_client: Most methods on Model will not work.')
+            return
+        if isinstance(db, memory.Client):
+            self.firestore = memory
+        else:
+            from google.cloud import firestore
+            self.firestore = firestore
         self.db = db
         self.collection = db.collection(self._collection)
 
+    @classmethod
+    def _from_snapshot(cls, snapshot) -> 'Model':
+        """
+        :param snapshot: firestore DocumentSnapshot of a document in the collection of cls
+        :return: instance of cls with field values from the snapshot (ModelField values are not fetched)
+        """
+        return cls._from_dict(snapshot.id, snapshot.to_dict())
+
+    @classmethod
+    def _from_dict(cls, id_: str, document_dict: dict) -> 'Model':
+        instance = cls()
+        instance._load(document_dict)
+        instance.id = id_
+        return instance
+
+    @classmethod
+    def _hydrate(cls, record: dict) -> 'Model':
+        """
+        Trusted construction for records that were already validated (e.g. with validate_many): no validation and no
+        client setup per instance. Missing fields get their default, and dict values of ModelFields are hydrated as
+        the related model. The instance is meant for fsmodels.graph; it has no collection reference to save with.
+
+        :param record: dict of field name to value
+        :return: instance of cls
+        """
+        instance = cls.__new__(cls)
+        for field_name, field in cls._fields.items():
+            setattr(instance, field_name, record[field_name] if field_name in record else field.default())
+        for field_name, field in cls._model_fields.items():
+            value = record[field_name] if field_name in record else field.default()
+            if isinstance(value, dict):
+                value = field.field_model._hydrate(value)
+            setattr(instance, field_name, value)
+        instance._model_name, instance._collection = cls._get_meta()
+        return instance
+
+    @classmethod
+    def retrieve_many(cls, ids) -> DocumentSet:
+        """
+        Fetch the documents with the given ids using a single RPC. Nothing is fetched until the result is iterated or
+        converted with to_columns.
+
+        :param ids: ids of the documents to fetch
+        :return: DocumentSet; iterate it for model instances (missing documents are skipped), or call to_columns
+
+        Example:
+
+        .. code-block:: python
+
+            users = User.retrieve_many(['a1', 'b2'])
+            [user.username for user in users] # ['bmayes', 'jdoe']
+            users.to_columns(['id', 'username']) # {'id': ['a1', 'b2'], 'username': ['bmayes', 'jdoe']}
+        """
+        return DocumentSet(cls, ids)
+
+    @classmethod
+    def mirror(cls, query: Optional[QuerySet] = None) -> '_mirror.Mirror':
+        """
+        Keep an always-current copy of the collection (or of the documents matching `query`) in memory, maintained
+        by a snapshot listener. Calling mirror again with the same query returns the same Mirror while it is open.
+
+        :param query: QuerySet from cls.objects; defaults to the whole collection
+        :return: Mirror; retrieve, get and where on it are answered from memory without any RPC
+
+        Example:
+
+        .. code-block:: python
+
+            tiers = PricingTier.mirror()
+            tiers.wait(timeout=5)
+            tiers.retrieve('gold') # {'id': 'gold', 'price': 10}
+
+            configs = TenantConfig.mirror(TenantConfig.objects.where('active', '==', True))
+            configs.where('region', '==', 'eu').get()
+        """
+        return _mirror.mirror(cls, query)
+
+    @classmethod
+    def executor(cls, max_workers: int = 8, max_pending: Optional[int] = None) -> ModelExecutor:
+        """
+        Thread pool for running save, retrieve, delete (or any callable) on many instances at once. Every thread uses
+        the client of cls, which is created before the pool starts.
+
+        :param max_workers: number of threads
+        :param max_pending: operations in flight at most; defaults to twice max_workers
+        :return: ModelExecutor; use it as a context manager or call shutdown()
+
+        Example:
+
+        .. code-block:: python
+
+            with User.executor(max_workers=16) as executor:
+                results = executor.save_all(users) # one ItemResult per user, in order
+                failed = [result.item for result in results if not result.ok]
+        """
+        cls._get_client()
+        return ModelExecutor(max_workers=max_workers, max_pending=max_pending)
+
     @staticmethod
     def _document_exists(document) -> bool:
         return bool(document.to_dict())
@@ -256,10 +606,60 @@ class Model(BaseModel):
     def clean(self) -> dict:
         # TODO revisit clean to do more than just validate
         """
+        Validate the record and return it as it will be written to firestore. Logs a warning if the document is close
+        to the firestore size limit (see DOCUMENT_SIZE_WARNING), and raises a ValidationError if it is over the limit,
+        rather than letting the write fail.
+
         :return:
         """
         self.validate()
-        return self.to_dict()
+        record = self._stored_dict()
+        self._check_document_size({key: value for key, value in record.items() if key not in self._model_field_names})
+        return record
+
+    def _check_document_size(self, data: dict) -> int:
+        """
+        :param data: the document data of the record, without its ModelFields (which are saved as documents of their
+                     own)
+        :return: size of the document in bytes
+        """
+        # the id may not be known yet; generated ids are 20 characters
+        size = document_size(data, f'{self._get_meta()[1]}/{self.id or "x" * 20}')
+        if size > MAX_DOCUMENT_BYTES:
+            raise ValidationError(f'{self.__class__.__name__} document {self.id} is {size} bytes; firestore documents '
+                                  f'are limited to {MAX_DOCUMENT_BYTES} bytes. Consider a CompressedField.')
+        if size > MAX_DOCUMENT_BYTES * DOCUMENT_SIZE_WARNING:
+            logging.warning(f'{self.__class__.__name__} document {self.id} is {size} bytes, close to the firestore '
+                            f'limit of {MAX_DOCUMENT_BYTES} bytes.')
+        return size
+
+    def _write_plan(self, patch: bool = True, additional_fields: Optional[dict] = None) -> list:
+        """
+        The writes that save makes, worked out without reading from firestore: ids that are missing are generated
+        locally, and patching uses merge writes (which replace top level fields like update, but create the document
+        if it does not exist) instead of checking whether the document exists first.
+
+        :return: list of (op, document path, data) tuples; op is 'set' or 'merge'. The record itself comes last.
+        """
+        record = self.clean()
+        if not record.get('id', False):
+            self.id = record['id'] = auto_id()
+        document_path = f'{self._collection}/{self.id}'
+        op = _wal.MERGE if patch else _wal.SET
+        writes = []
+        for model_field_name in self._model_field_names:
+            model_field_value = getattr(self, model_field_name)
+            # prevent model fields from being saved as something other than a subcollection
+            record.pop(model_field_name)
+            if model_field_value is not None:
+                if not model_field_value.id:
+                    model_field_value.id = auto_id()
+                writes.append((op, f'{document_path}/{model_field_value._collection}/{model_field_value.id}',
+                               model_field_value._stored_dict()))
+        if additional_fields:
+            record.update(additional_fields)
+        writes.append((op, document_path, record))
+        return writes
 
     def save(self, patch: bool = True, additional_fields: Optional[dict] = None, is_child: bool = False) -> dict:
         """
@@ -271,8 +671,13 @@ class Model(BaseModel):
         :param additional_fields: dictionary of any additional fields to be saved on the firestore record that are
                                     not defined explicitly on the model
         :param is_child: whether or not the record being saved is a child of another record
-        :return: dictionary with id and the result of the write operation from firestore
+        :return: dictionary with id and the result of the write operation from firestore. With a write-ahead log
+                 (see use_wal), the result is None and the sequence number of the log record is included instead.
         """
+        if self._wal is not None:
+            sequence = self._wal.append(self._write_plan(patch, additional_fields))
+            return {'id': self.id, 'result': None, 'sequence': sequence}
+
         record = self.clean()
 
         # after this if/else branch, we know for sure that self.id will refer to an id in firestore
@@ -288,9 +693,7 @@ class Model(BaseModel):
             # it prevents us from having to fetch it as an attribute during usage
             record['id'] = self.id
 
-        for model_field_instance_name in self._get_model_fields():
-            model_field_name = model_field_instance_name[1:]  # remove single leading underscore
-            model_field_instance = getattr(self, model_field_instance_name)
+        for model_field_name in self._model_field_names:
             model_field_value = getattr(self, model_field_name)
             # prevent model fields from being saved as something other than a subcollection
             record.pop(model_field_name)
@@ -303,16 +706,16 @@ class Model(BaseModel):
                 if model_field_value.id:
                     if patch and not new_record:
                         document_ref.collection(subcollection_name).document(model_field_value.id)\
-                            .update(model_field_value.to_dict())
+                            .update(model_field_value._stored_dict())
                     else:
                         document_ref.collection(subcollection_name).document(model_field_value.id) \
-                            .set(model_field_value.to_dict())
+                            .set(model_field_value._stored_dict())
                 else:
                     new_document = document_ref.collection(subcollection_name).document()
                     # we like to have the ID available on the record;
                     # it prevents us from having to fetch it as an attribute during usage
                     model_field_value.id = new_document.id
-                    document_ref.collection(subcollection_name).document().set(model_field_value.to_dict())
+                    new_document.set(model_field_value._stored_dict())
 
         if additional_fields:
             record.update(additional_fields)
@@ -326,8 +729,35 @@ class Model(BaseModel):
             res = document_ref.set(record)
             self.id = document_ref.id
 
+        if self._mirrors:
+            _mirror.written(self.__class__, self.id, record, merge=not new_record and patch,
+                            update_time=getattr(res, 'update_time', None))
         return {'id': self.id, 'result': res}
 
+    def save_graph(self, patch: bool = True, batch_size: int = _graph.MAX_BATCH_WRITES) -> dict:
+        """
+        Save the record and every model below it, at any depth, each as its own document: children in the
+        subcollection of their parent, grandchildren in the subcollection of the child, and so on (save only writes
+        one level of children). Every model is validated and serialized once, and the writes are committed in
+        batches, deepest documents first. Use fsmodels.graph.save_graph to save many records in the same batches.
+
+        :param patch: replace the fields of existing firestore records that are defined on the instances and keep
+                      their other fields, like save(patch=True), instead of overwriting the records
+        :param batch_size: writes per commit, at most 500
+        :return: dict with the id, the number of documents written and the number of commits (or, with a
+                 write-ahead log, the sequence number of the log record)
+
+        Example:
+
+        .. code-block:: python
+
+            user = User(username='bmayes', profile=Profile(first_name='Billy', address=Address(city='Boston')))
+            user.save_graph() # {'id': '...', 'writes': 3, 'commits': 1}
+        """
+        result = _graph.save_graph([self], patch=patch, batch_size=batch_size)
+        result['id'] = result.pop('ids')[0]
+        return result
+
     def retrieve(self, overwrite_local: bool = False) -> dict:
         """
         Retrieve the record corresponding to the id defined on the instance. If overwrite_local is True, the instance
@@ -344,8 +774,12 @@ class Model(BaseModel):
         if document_dict is None:
             return {}
         full_subcollection = {}
+        # ModelListField children are read through the field, a page at a time
+        list_collections = {field.collection for field in self._list_fields.values()}
         for subcollection in document_ref.collections():
             subcollection_name = subcollection._path[-1]
+            if subcollection_name in list_collections:
+                continue
             subcollection_document_list = []
             full_subcollection[subcollection_name] = subcollection_document_list
             for subcollection_document_ref in subcollection.list_documents():
@@ -356,15 +790,14 @@ class Model(BaseModel):
         document_dict.update(full_subcollection)
 
         if overwrite_local:
-            # use from_dict on self, and then use from_dict on each of the related model fields
-            self.from_dict(document_dict)
-            for related_model_field_name in self._get_model_fields():
-                related_model_name = related_model_field_name[1:]  # remove leading underscore
+            # use _load on self, and then use _load on each of the related model fields
+            self._load(document_dict)
+            for related_model_name, related_model_field in self._model_fields.items():
                 related_model = getattr(self, related_model_name)
                 # if there is not an instance of the related model, we want to create one!
                 if related_model is None:
-                    related_model = getattr(self, related_model_field_name).field_model()
-                related_model.from_dict(document_dict.get(related_model_name, {}))
+                    related_model = related_model_field.field_model()
+                related_model._load(document_dict.get(related_model_name, {}))
                 setattr(self, related_model_name, related_model)
         return document_dict
 
@@ -378,5 +811,13 @@ class Model(BaseModel):
         id_as_str = None if self.id is None else str(self.id)  # just to be sure that id is a str
         if not id_as_str:
             raise ValidationError(f'Cannot call delete for {self._collection} document; no id specified.')
+        if self._wal is not None:
+            sequence = self._wal.append([(_wal.DELETE, f'{self._collection}/{id_as_str}', None)])
+            return {'result': None, 'sequence': sequence}
         document_ref = self.collection.document(str(id_as_str))
-        return {'result': document_ref.delete()}
+        result = {'result': document_ref.delete()}
+        if self._mirrors:
+            # firestore returns the commit time of a delete; fsmodels.memory returns a WriteResult
+            _mirror.written(self.__class__, id_as_str, None,
+                            update_time=getattr(result['result'], 'update_time', result['result']))
+        return result
@@ -0,0 +1,165 @@
+import time
+import logging
+import threading
+from typing import Optional, Iterable, List
+
+# the profiler currently collecting timings. Field.validate and Field.default check this on every call, so it is kept
+# as a plain module attribute (and is None unless profiling has been switched on).
+active = None
+
+VALIDATION = 'validation'
+DEFAULT = 'default'
+
+
+class FieldStats:
+    """
+    Call count, total and max time spent in one user-supplied callable (validation or default) of one field.
+    """
+    __slots__ = ('model_name', 'field_name', 'kind', 'calls', 'total', 'max')
+
+    def __init__(self, model_name: str, field_name: str, kind: str):
+        self.model_name = model_name
+        self.field_name = field_name
+        self.kind = kind
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'model_name': self.model_name,
+            'field_name': self.field_name,
+            'kind': self.kind,
+            'calls': self.calls,
+            'total': self.total,
+            'max': self.max,
+            'mean': self.mean,
+        }
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.model_name}.{self.field_name} {self.kind} calls:{self.calls} ' \
+               f'total:{self.total:.6f} max:{self.max:.6f}>'
+
+
+class FieldProfiler:
+    """
+    Records how long the `validation` and `default` callables of every Field take, per model class. Profiling is
+    opt-in: nothing is recorded (and Field behaves exactly as usual) until a profiler is enabled.
+
+    Example:
+
+    .. code-block:: python
+
+        with FieldProfiler(budget=0.005) as profiler:
+            for row in rows:
+                User(**row).validate()
+
+        print(profiler.report()) # slowest fields first
+        profiler.slowest(3) # [<FieldStats User.email validation calls:... >, ...]
+
+    """
+
+    def __init__(self, budget: Optional[float] = None, models: Optional[Iterable[str]] = None):
+        """
+        :param budget: seconds a single validation call may take before a warning is logged. None disables warnings.
+        :param models: names of the model classes to record. None records every model.
+        """
+        self.budget = budget
+        self.models = None if models is None else frozenset(models)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def enable(self) -> 'FieldProfiler':
+        """
+        Start recording. The previously active profiler (if any) is restored by disable.
+        """
+        global active
+        if active is not self:
+            self._previous = active
+            active = self
+        return self
+
+    def disable(self):
+        global active
+        if active is self:
+            active = self._previous
+            self._previous = None
+
+    def __enter__(self) -> 'FieldProfiler':
+        return self.enable()
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def record(self, model_name: str, field_name: str, kind: str, elapsed: float):
+        """
+        Add a single timed call. Called by Field; there should be no need to call this directly.
+        """
+        if self.models is not None and model_name not in self.models:
+            return
+        key = (model_name, field_name, kind)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = FieldStats(model_name, field_name, kind)
+            stats.calls += 1
+            stats.total += elapsed
+            if elapsed > stats.max:
+                stats.max = elapsed
+        if self.budget is not None and kind == VALIDATION and elapsed > self.budget:
+            logging.warning(f'{model_name} validation of {field_name} took {elapsed:.6f}s, '
+                            f'over the budget of {self.budget:.6f}s.')
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def stats(self, model_name: Optional[str] = None) -> List[FieldStats]:
+        """
+        :param model_name: only return stats of this model class
+        :return: recorded stats, in no particular order
+        """
+        with self._lock:
+            stats = list(self._stats.values())
+        if model_name is not None:
+            stats = [s for s in stats if s.model_name == model_name]
+        return stats
+
+    def slowest(self, n: Optional[int] = 10, kind: Optional[str] = None, by: str = 'total') -> List[FieldStats]:
+        """
+        :param n: number of entries to return. None returns all of them.
+        :param kind: 'validation' or 'default' to only include one kind of callable
+        :param by: 'total', 'max' or 'mean'
+        :return: stats sorted from slowest to fastest
+        """
+        stats = [s for s in self.stats() if kind is None or s.kind == kind]
+        stats.sort(key=lambda s: getattr(s, by), reverse=True)
+        return stats if n is None else stats[:n]
+
+    def report(self, n: Optional[int] = 10, by: str = 'total') -> str:
+        """
+        :return: human readable table of the slowest fields
+        """
+        lines = [f'{"model":<24} {"field":<24} {"kind":<10} {"calls":>9} {"total(s)":>11} {"max(s)":>11} {"mean(s)":>11}']
+        for s in self.slowest(n, by=by):
+            lines.append(f'{s.model_name:<24} {s.field_name:<24} {s.kind:<10} {s.calls:>9} '
+                         f'{s.total:>11.6f} {s.max:>11.6f} {s.mean:>11.6f}')
+        return '\n'.join(lines)
+
+
+def timed_call(field, kind: str, func, *args, **kwargs):
+    """
+    Call `func` and record the elapsed time against `field` on the active profiler.
+    """
+    profiler = active
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if profiler is not None:
+            profiler.record(field.model_name, field.name, kind, time.perf_counter() - start)
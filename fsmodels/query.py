@@ -0,0 +1,500 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Iterable, Iterator, List, Sequence
+
+from fsmodels import columnar, graph
+from fsmodels.common import ValidationError, _BaseModel
+from fsmodels.fields import ModelField, CompressedField
+
+# concurrent subcollection queries of DocumentStream.to_columns(flatten=True)
+CHILD_READ_WORKERS = 16
+
+
+def _check_field(model, field_path: str):
+    """
+    :raises ValidationError: if the first part of `field_path` is not a Field declared on `model`
+    """
+    if field_path.split('.')[0] not in model._class_fields():
+        raise ValidationError(f'{model.__name__} has no field {field_path}.')
+
+
+class DocumentStream:
+    """
+    Documents of one Model class coming from firestore. Iterating yields model instances; to_columns builds columns
+    straight from the document snapshots instead.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def _client(self):
+        client = self.model._get_client()
+        if client is None:
+            _, collection = self.model._get_meta()
+            raise ValidationError(f'Cannot read {collection}; there is no firestore client. Set '
+                                  f'GOOGLE_APPLICATION_CREDENTIALS or call Model.use_client.')
+        return client
+
+    def _collection_ref(self):
+        _, collection = self.model._get_meta()
+        return self._client().collection(collection)
+
+    def _snapshots(self) -> Iterable:
+        raise NotImplementedError
+
+    def stream(self) -> Iterator[_BaseModel]:
+        """
+        :return: iterator of model instances, one per existing document
+        """
+        for snapshot in self._snapshots():
+            if snapshot.exists:
+                yield self.model._from_snapshot(snapshot)
+
+    def __iter__(self):
+        return self.stream()
+
+    def get(self) -> List[_BaseModel]:
+        """
+        :return: list of model instances, one per existing document
+        """
+        return list(self.stream())
+
+    def to_columns(self, fields: Optional[Sequence[str]] = None, flatten: bool = False, as_numpy: bool = False) \
+            -> dict:
+        """
+        Read the documents into one column per field, without creating a model instance or a dict per document.
+
+        :param fields: names of the fields to include. Defaults to every Field declared on the model, id first.
+        :param flatten: include the fields of ModelField children as dotted columns ("profile.first_name"); without
+                        it, ModelFields are left out.
+                        Children are stored in subcollections, so this costs one extra query per document and
+                        ModelField, each reading at most one child; the queries run CHILD_READ_WORKERS at a time.
+        :param as_numpy: return NumPy arrays instead of lists
+        :return: dict of column name to list (or NumPy array) of values; missing values are None
+
+        Example:
+
+        .. code-block:: python
+
+            User.objects.where('status', '==', 'active').to_columns(['id', 'username'])
+            # returns {'id': ['a1', 'b2'], 'username': ['bmayes', 'jdoe']}
+
+            User.retrieve_many(['a1', 'b2']).to_columns(flatten=True, as_numpy=True)
+            # returns {'id': array(['a1', 'b2']), ..., 'profile.first_name': array(['Billy', 'Jane']), ...}
+        """
+        if as_numpy and columnar.np is None:
+            raise ImportError('NumPy is required for to_columns(as_numpy=True).')
+        class_fields = self.model._class_fields()
+        if fields is None:
+            fields = ['id'] + sorted(name for name in class_fields if name != 'id')
+        for name in fields:
+            _check_field(self.model, name)
+        plain = [name for name in fields if not isinstance(class_fields[name], ModelField)]
+        related = [(name, class_fields[name].field_model) for name in fields
+                   if isinstance(class_fields[name], ModelField)] if flatten else []
+
+        # stored compressed; snapshots do not go through the field, so decode them here
+        compressed = {name for name in plain if name in self.model._compressed_fields}
+        columns = {name: [] for name in plain}
+        related_columns = []
+        for name, field_model in related:
+            _, child_collection = field_model._get_meta()
+            child_names = ['id'] + sorted(n for n in field_model._class_fields() if n != 'id')
+            paths = [(f'{name}.{child_name}', child_name) for child_name in child_names]
+            for column_name, _ in paths:
+                columns[column_name] = []
+            related_columns.append((field_model, child_collection, paths))
+
+        parent_paths = []
+        for snapshot in self._snapshots():
+            if not snapshot.exists:
+                continue
+            for name in plain:
+                value = snapshot.id if name == 'id' else _snapshot_value(snapshot, name)
+                columns[name].append(CompressedField.decode(value, f'{self.model.__name__} field {name}')
+                                     if name in compressed else value)
+            if related_columns:
+                parent_paths.append(snapshot.reference.path)
+
+        for field_model, child_collection, paths in related_columns:
+            children = self._children(child_collection, parent_paths)
+            for parent_path in parent_paths:
+                child = children.get(parent_path)
+                for column_name, child_name in paths:
+                    if child is None:
+                        value = None
+                    elif child_name == 'id':
+                        value = child.id
+                    else:
+                        value = _snapshot_value(child, child_name)
+                        if child_name in field_model._compressed_fields:
+                            value = CompressedField.decode(value, f'{field_model.__name__} field {child_name}')
+                    columns[column_name].append(value)
+
+        if as_numpy:
+            return {name: _as_array(column) for name, column in columns.items()}
+        return columns
+
+    def _children(self, child_collection: str, parent_paths: Sequence[str]) -> dict:
+        """
+        :return: dict of parent document path to the first child snapshot in its `child_collection` subcollection,
+                 for the parents in `parent_paths`. One query per parent, each reading at most one document, run
+                 CHILD_READ_WORKERS at a time.
+        """
+        client = self._client()
+
+        def first_child(parent_path):
+            return next(iter(client.document(parent_path).collection(child_collection).limit(1).stream()), None)
+
+        parent_paths = list(dict.fromkeys(parent_paths))
+        if not parent_paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(CHILD_READ_WORKERS, len(parent_paths))) as pool:
+            children = pool.map(first_child, parent_paths)
+            return {path: child for path, child in zip(parent_paths, children) if child is not None}
+
+
+def _snapshot_value(snapshot, field_path: str):
+    try:
+        return snapshot.get(field_path)
+    except KeyError:
+        return None
+
+
+def _as_array(column: list):
+    np = columnar.np
+    array = np.asarray(column) if column else np.asarray(column, dtype=object)
+    if array.ndim != 1:
+        # list or dict values; keep them as objects rather than letting numpy add dimensions
+        array = np.empty(len(column), dtype=object)
+        array[:] = column
+    return array
+
+
+class QuerySet(DocumentStream):
+    """
+    Lazy query over the collection of a Model class. Parallels google.cloud.firestore.Query, but field names are
+    checked against the fields declared on the model and results are model instances. Usually created with
+    `Model.objects`.
+
+    Example:
+
+    .. code-block:: python
+
+        active = User.objects.where('status', '==', 'active').order_by('created', 'DESCENDING').limit(10)
+        for user in active:
+            print(user.username)
+    """
+
+    def __init__(self, model, filters=(), orders=(), limit: Optional[int] = None, offset: int = 0):
+        super(QuerySet, self).__init__(model)
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+
+    def _copy(self, **kwargs) -> 'QuerySet':
+        options = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit, 'offset': self._offset}
+        options.update(kwargs)
+        return self.__class__(self.model, **options)
+
+    def where(self, field_path: str, op_string: str, value) -> 'QuerySet':
+        _check_field(self.model, field_path)
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'QuerySet':
+        _check_field(self.model, field_path)
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'QuerySet':
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int) -> 'QuerySet':
+        return self._copy(offset=num_to_skip)
+
+    def _check_numeric_field(self, field_path: str):
+        _check_field(self.model, field_path)
+        if isinstance(self.model._class_fields()[field_path.split('.')[0]], ModelField):
+            raise ValidationError(f'{self.model.__name__} field {field_path} is a ModelField and cannot be aggregated.')
+
+    def _aggregate(self, aggregation_query):
+        return aggregation_query.get()[0][0].value
+
+    def count(self) -> int:
+        """
+        Number of documents matching the query, counted by firestore with a single RPC.
+
+        Example:
+
+        .. code-block:: python
+
+            User.objects.where('status', '==', 'active').count() # 1204
+        """
+        return self._aggregate(self._firestore_query().count(alias='count'))
+
+    def sum(self, field_path: str):
+        """
+        Sum of `field_path` over the documents matching the query, computed by firestore with a single RPC. Values
+        that are not numbers are ignored.
+        """
+        self._check_numeric_field(field_path)
+        return self._aggregate(self._firestore_query().sum(field_path, alias='sum'))
+
+    def avg(self, field_path: str) -> Optional[float]:
+        """
+        Average of `field_path` over the documents matching the query, computed by firestore with a single RPC.
+        Values that are not numbers are ignored; None if there are none.
+        """
+        self._check_numeric_field(field_path)
+        return self._aggregate(self._firestore_query().avg(field_path, alias='avg'))
+
+    def group(self) -> 'GroupQuerySet':
+        """
+        Query every collection named after this model at any depth, i.e. the subcollections that Model.save writes
+        ModelField children to, instead of only the top level collection. One (indexed) query replaces retrieving
+        every parent.
+
+        Example:
+
+        .. code-block:: python
+
+            for profile in Profile.objects.group().where('last_name', '==', 'Mayes'):
+                profile.parent_reference # reference to the User document the profile was saved under
+
+            for profile, user in Profile.objects.group().where('last_name', '==', 'Mayes').with_parents(User):
+                print(user.username, profile.first_name)
+        """
+        return GroupQuerySet(self.model, filters=self._filters, orders=self._orders, limit=self._limit,
+                             offset=self._offset)
+
+    def _base_query(self):
+        return self._collection_ref()
+
+    def _firestore_query(self):
+        query = self._base_query()
+        for field_path, op_string, value in self._filters:
+            query = query.where(field_path, op_string, value)
+        for field_path, direction in self._orders:
+            query = query.order_by(field_path, direction=direction)
+        if self._offset:
+            query = query.offset(self._offset)
+        if self._limit is not None:
+            query = query.limit(self._limit)
+        return query
+
+    def _snapshots(self):
+        return self._firestore_query().stream()
+
+
+class GroupQuerySet(QuerySet):
+    """
+    QuerySet over a collection group: every collection named after the model, at any depth. Created with
+    `Model.objects.group()`. Model instances it yields have a `parent_reference` attribute: the reference to the
+    document whose subcollection holds them, or None for documents in the top level collection.
+
+    Filtering or ordering a collection group query in firestore needs a collection group index on those fields.
+    """
+
+    def _base_query(self):
+        _, collection = self.model._get_meta()
+        return self._client().collection_group(collection)
+
+    def stream(self) -> Iterator[_BaseModel]:
+        for snapshot in self._snapshots():
+            if snapshot.exists:
+                yield self._hydrate(snapshot)
+
+    def _hydrate(self, snapshot) -> _BaseModel:
+        instance = self.model._from_snapshot(snapshot)
+        instance.parent_reference = snapshot.reference.parent.parent
+        return instance
+
+    def with_parents(self, parent_model=None, chunk_size: int = 100) -> Iterator[tuple]:
+        """
+        Yield (child, parent) pairs. Parents are fetched with one get_all RPC per `chunk_size` children, and each
+        parent is fetched once per chunk however many of its children are in it.
+
+        :param parent_model: Model class to build the parents as; None yields the parent document dicts
+        :param chunk_size: children per get_all
+        :return: iterator of (child instance, parent instance, or parent data dict if no model is given, or None) pairs
+        """
+        chunk = []
+        for child in self.stream():
+            chunk.append(child)
+            if len(chunk) >= chunk_size:
+                yield from self._pair(chunk, parent_model)
+                chunk = []
+        if chunk:
+            yield from self._pair(chunk, parent_model)
+
+    def _pair(self, children, parent_model):
+        references = {}
+        for child in children:
+            if child.parent_reference is not None:
+                references.setdefault(child.parent_reference.path, child.parent_reference)
+        parents = {}
+        if references:
+            for snapshot in self._client().get_all(list(references.values())):
+                if not snapshot.exists:
+                    continue
+                if parent_model is None:
+                    parents[snapshot.reference.path] = snapshot.to_dict()
+                else:
+                    parents[snapshot.reference.path] = parent_model._from_snapshot(snapshot)
+        for child in children:
+            reference = child.parent_reference
+            yield child, parents.get(reference.path) if reference is not None else None
+
+
+class ChildList(QuerySet):
+    """
+    Children of one parent document, stored in its subcollection by a ModelListField. Created by accessing the
+    field on a model instance. Iterating reads the children a page at a time (`page_size` per query, continuing after
+    the last child of the previous page), so memory use does not grow with the number of children. Supports the
+    QuerySet methods (where, order_by, limit, count, sum, avg, to_columns, ...), and append/extend add children with
+    batched writes without touching the parent document.
+
+    Example:
+
+    .. code-block:: python
+
+        for order in customer.orders.where('status', '==', 'open').order_by('created').page_size(500):
+            process(order)
+
+        for page in customer.orders.pages():
+            print(len(page)) # up to page_size orders per page
+    """
+
+    def __init__(self, model, parent, collection: str, page_size: int = 100, filters=(), orders=(),
+                 limit: Optional[int] = None, offset: int = 0, default_order: bool = False):
+        """
+        :param model: Model class of the children
+        :param parent: Model instance the children belong to
+        :param collection: name of the subcollection of the parent that holds the children
+        :param page_size: children fetched per query while iterating
+        :param default_order: whether `orders` is the default order of the ModelListField, which order_by replaces
+        """
+        super(ChildList, self).__init__(model, filters=filters, orders=orders, limit=limit, offset=offset)
+        if page_size < 1:
+            raise ValueError('page_size must be at least 1.')
+        self.parent = parent
+        self.collection = collection
+        self._page_size = page_size
+        self._default_order = default_order
+
+    def _copy(self, **kwargs) -> 'ChildList':
+        options = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit, 'offset': self._offset,
+                   'page_size': self._page_size, 'default_order': self._default_order}
+        options.update(kwargs)
+        return ChildList(self.model, self.parent, self.collection, **options)
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'ChildList':
+        _check_field(self.model, field_path)
+        orders = () if self._default_order else self._orders
+        return self._copy(orders=orders + ((field_path, direction),), default_order=False)
+
+    def page_size(self, page_size: int) -> 'ChildList':
+        return self._copy(page_size=page_size)
+
+    def _client(self):
+        client = self.parent._get_client()
+        if client is None:
+            raise ValidationError(f'Cannot read {self.collection}; there is no firestore client. Set '
+                                  f'GOOGLE_APPLICATION_CREDENTIALS or call Model.use_client.')
+        return client
+
+    def _collection_path(self) -> str:
+        if not self.parent.id:
+            raise ValidationError(f'{self.parent.__class__.__name__} has no id; save it before using its '
+                                  f'{self.collection}.')
+        _, parent_collection = self.parent._get_meta()
+        return f'{parent_collection}/{self.parent.id}/{self.collection}'
+
+    def _base_query(self):
+        return self._client().collection(self._collection_path())
+
+    def _snapshot_pages(self) -> Iterator[list]:
+        # limit and offset apply to the whole iteration, not to each page
+        query = self._copy(limit=None, offset=0)._firestore_query()
+        remaining, offset, cursor = self._limit, self._offset, None
+        while remaining is None or remaining > 0:
+            size = self._page_size if remaining is None else min(self._page_size, remaining)
+            page_query = query.offset(offset) if offset else query
+            if cursor is not None:
+                page_query = page_query.start_after(cursor)
+            page = list(page_query.limit(size).stream())
+            if page:
+                yield page
+            if len(page) < size:
+                return
+            cursor, offset = page[-1], 0
+            if remaining is not None:
+                remaining -= len(page)
+
+    def _snapshots(self):
+        for page in self._snapshot_pages():
+            yield from page
+
+    def pages(self) -> Iterator[List[_BaseModel]]:
+        """
+        :return: iterator of lists of model instances, one list (of at most page_size children) per query
+        """
+        for page in self._snapshot_pages():
+            yield [self.model._from_snapshot(snapshot) for snapshot in page if snapshot.exists]
+
+    def append(self, child: _BaseModel) -> str:
+        """
+        Save `child` to the subcollection.
+
+        :return: id of the child
+        """
+        return self.extend([child])[0]
+
+    def extend(self, children: Iterable[_BaseModel], batch_size: int = graph.MAX_BATCH_WRITES) -> List[str]:
+        """
+        Save `children` to the subcollection (with their own ModelField children, see Model.save_graph) in batched
+        commits of up to `batch_size` writes. The parent document is not written. With a write-ahead log in use (see
+        Model.use_wal), the writes are appended to the log instead.
+
+        :return: ids of the children
+        """
+        children = list(children)
+        for child in children:
+            if not isinstance(child, self.model):
+                raise ValidationError(f'{child} is {child.__class__.__name__}, must be {self.model.__name__}.')
+        writes = graph.plan(children, patch=False, collection_path=self._collection_path())
+        if self.parent._wal is not None:
+            self.parent._wal.append(writes)
+        else:
+            graph.commit(self._client(), writes, batch_size)
+        return [child.id for child in children]
+
+
+class DocumentSet(DocumentStream):
+    """
+    Documents of a Model class fetched by id with a single get_all RPC. Created by `Model.retrieve_many`.
+    """
+
+    def __init__(self, model, ids: Iterable[str]):
+        super(DocumentSet, self).__init__(model)
+        self.ids = [str(id_) for id_ in ids]
+
+    def _snapshots(self):
+        if not self.ids:
+            return
+        collection = self._collection_ref()
+        references = [collection.document(id_) for id_ in self.ids]
+        # get_all does not return documents in the order they were requested
+        by_path = {snapshot.reference.path: snapshot for snapshot in self._client().get_all(references)}
+        for reference in references:
+            snapshot = by_path.get(reference.path)
+            if snapshot is not None:
+                yield snapshot
+
+
+class Manager:
+    """
+    Class attribute that creates a QuerySet over the collection of the Model class it is accessed from.
+    """
+
+    def __get__(self, instance, owner) -> QuerySet:
+        return QuerySet(owner)
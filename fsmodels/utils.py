@@ -1,9 +1,16 @@
 import re
+import random
+import string
 import logging
+import datetime
 import functools
 
 first_cap_re = re.compile('(.)([A-Z][a-z]+)')
 all_cap_re = re.compile('([a-z0-9])([A-Z])')
+id_alphabet = string.ascii_letters + string.digits
+
+# firestore limit on the size of a document, as computed by document_size
+MAX_DOCUMENT_BYTES = 1024 * 1024
 
 
 def snake_case(string):
@@ -18,6 +25,61 @@ def snake_case(string):
     return all_cap_re.sub(r'\1_\2', s1).lower()
 
 
+def auto_id() -> str:
+    """
+    Random document id of the same shape as the ones generated by the firestore client libraries (20 letters and
+    digits), for when a document id is needed before there is a client to ask.
+
+    :return: new id
+    """
+    return ''.join(random.choices(id_alphabet, k=20))
+
+
+def _value_size(value) -> int:
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime.datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_value_size(str(key)) + _value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_size(item) for item in value)
+    if hasattr(value, 'path'):
+        # DocumentReference
+        return document_name_size(value.path)
+    if hasattr(value, 'latitude'):
+        # GeoPoint
+        return 16
+    return len(str(value).encode('utf-8')) + 1
+
+
+def document_name_size(path: str) -> int:
+    """
+    :param path: document path, e.g. 'users/a1/profile/b2'
+    :return: storage size of the document name in bytes, the way firestore counts it
+    """
+    return sum(_value_size(segment) for segment in path.split('/')) + 16
+
+
+def document_size(data: dict, path: str = '') -> int:
+    """
+    Storage size of a document in bytes, the way firestore counts it against its 1 MiB limit (MAX_DOCUMENT_BYTES):
+    field names and strings count their UTF-8 bytes plus one, numbers and timestamps 8 bytes, bytes their length,
+    maps and arrays the sum of their contents, plus 32 bytes per document and the size of its name.
+
+    :param data: document data
+    :param path: document path; the name size is left out if it is empty
+    :return: size in bytes
+
+    Example: document_size({'type': 'Personal'}, 'tasks/task_id') == 14 + 32 + 30
+    """
+    return _value_size(data) + 32 + (document_name_size(path) if path else 0)
+
+
 def skip_if(condition, reason: str = ''):
     """
     Wrapper to prevent calling of a function if condition is True
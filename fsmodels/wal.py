@@ -0,0 +1,490 @@
+"""
+Local write-ahead log for Model.save and Model.delete.
+
+With a log in use (see Model.use_wal), save and delete append their writes to segment files on local disk and return
+without waiting for firestore. A Replayer drains the log to firestore in batched commits and records its progress
+in a checkpoint file, so a process that crashes (or loses its connection) picks up where it stopped.
+
+Every record is one line: the CRC32 of its JSON followed by the JSON. A torn line at the end of the last segment,
+left by a crash in the middle of an append, is detected by its checksum and cut off when the log is opened.
+
+Example:
+
+.. code-block:: python
+
+    log = WriteAheadLog('/var/lib/myapp/wal', fsync='interval')
+    User.use_wal(log)
+    replayer = Replayer(log, User._get_client()).start()
+
+    User(username='bmayes').save() # returns once the record is on disk
+
+    replayer.drain(timeout=10) # wait until everything is in firestore
+
+Inspect a log from the command line with ``python -m fsmodels.wal /var/lib/myapp/wal``.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+import logging
+import argparse
+import datetime
+import threading
+from typing import Optional, Iterator, List, Tuple
+
+SET = 'set'
+MERGE = 'merge'
+DELETE = 'delete'
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+# firestore limit on the number of writes in one commit
+MAX_BATCH_WRITES = 500
+
+_SEGMENT_PREFIX = 'segment-'
+_SEGMENT_SUFFIX = '.log'
+_CHECKPOINT = 'checkpoint.json'
+
+
+def _encode(value):
+    # json.dumps hook for the values firestore accepts that json does not
+    if isinstance(value, bytes):
+        return {'__fsmodels__': 'bytes', 'value': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, datetime.datetime):
+        return {'__fsmodels__': 'datetime', 'value': value.isoformat()}
+    raise TypeError(f'{value.__class__.__name__} values cannot be written to the write-ahead log.')
+
+
+def _decode(obj: dict):
+    kind = obj.get('__fsmodels__')
+    if kind == 'bytes':
+        return base64.b64decode(obj['value'])
+    if kind == 'datetime':
+        return datetime.datetime.fromisoformat(obj['value'])
+    return obj
+
+
+def _dumps(record: dict) -> bytes:
+    payload = json.dumps(record, default=_encode, separators=(',', ':')).encode('utf-8')
+    return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+
+def _loads(line: bytes) -> Optional[dict]:
+    """
+    :return: the record on `line`, or None if the line is incomplete or corrupt
+    """
+    if not line.endswith(b'\n') or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload.decode('utf-8'), object_hook=_decode)
+    except ValueError:
+        return None
+
+
+class WalRecord:
+    """
+    One logical operation (a save or a delete) in the log: its sequence number, the time it was appended and its
+    writes as (op, document path, data) tuples.
+    """
+    __slots__ = ('sequence', 'timestamp', 'writes')
+
+    def __init__(self, sequence: int, timestamp: float, writes: List[tuple]):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.writes = writes
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.sequence} writes:{len(self.writes)}>'
+
+
+class WriteAheadLog:
+    """
+    Append-only log of writes, split over segment files in `directory`.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, fsync: str = 'always',
+                 fsync_interval: float = 1.0):
+        """
+        :param directory: where segments and the checkpoint are stored; created if needed
+        :param segment_bytes: size after which a new segment is started
+        :param fsync: 'always' fsyncs every append (survives power loss); 'interval' fsyncs at most every
+                      `fsync_interval` seconds, and a background thread fsyncs appends left over once the log goes
+                      quiet; 'never' leaves it to the operating system (survives process crashes)
+        :param fsync_interval: seconds between fsyncs with fsync='interval'
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'fsync must be one of {FSYNC_POLICIES}, not {fsync}')
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._appended = threading.Condition(self._lock)
+        self._file = None
+        self._last_fsync = 0.0
+        self._unsynced = False
+        self._closed = threading.Event()
+        self._syncer = None
+        os.makedirs(directory, exist_ok=True)
+        self.last_sequence = self._recover()
+
+    # segments
+
+    def segments(self) -> List[str]:
+        """
+        :return: paths of the segment files, oldest first
+        """
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    @staticmethod
+    def _first_sequence(segment: str) -> int:
+        return int(os.path.basename(segment)[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+
+    def _recover(self) -> int:
+        """
+        Find the last sequence number and cut off a torn record at the end of the last segment.
+        """
+        segments = self.segments()
+        if not segments:
+            return self.checkpoint
+        last_sequence, valid_bytes = self._first_sequence(segments[-1]) - 1, 0
+        with open(segments[-1], 'rb') as f:
+            for line in f:
+                record = _loads(line)
+                if record is None:
+                    break
+                last_sequence, valid_bytes = record['s'], valid_bytes + len(line)
+        if valid_bytes != os.path.getsize(segments[-1]):
+            logging.warning(f'Truncating torn record at byte {valid_bytes} of {segments[-1]}.')
+            with open(segments[-1], 'r+b') as f:
+                f.truncate(valid_bytes)
+        return max(last_sequence, self.checkpoint)
+
+    def _open_segment(self, first_sequence: int):
+        if self._file is not None:
+            self._sync(force=True)
+            self._file.close()
+        path = os.path.join(self.directory, f'{_SEGMENT_PREFIX}{first_sequence:020d}{_SEGMENT_SUFFIX}')
+        self._file = open(path, 'ab')
+
+    def _sync(self, force: bool = False):
+        self._file.flush()
+        if self.fsync == 'never' and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync == 'always' or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+            self._unsynced = False
+            return
+        self._unsynced = True
+        if self._syncer is None or not self._syncer.is_alive():
+            self._closed.clear()
+            self._syncer = threading.Thread(target=self._run_syncer, name='fsmodels-wal-fsync', daemon=True)
+            self._syncer.start()
+
+    def _run_syncer(self):
+        # with fsync='interval', fsyncs the appends that came in after the last fsync, so they do not stay unsynced
+        # until the next append
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._file is not None and self._unsynced:
+                    self._sync(force=True)
+
+    # writing
+
+    def append(self, writes: List[tuple]) -> int:
+        """
+        Append one logical operation.
+
+        :param writes: (op, document path, data) tuples; op is 'set', 'merge' or 'delete' (see add_write)
+        :return: sequence number of the record
+        """
+        with self._lock:
+            sequence = self.last_sequence + 1
+            line = _dumps({'s': sequence, 't': time.time(), 'w': [list(write) for write in writes]})
+            if self._file is None:
+                segments = self.segments()
+                self._open_segment(self._first_sequence(segments[-1]) if segments else sequence)
+            elif self._file.tell() + len(line) > self.segment_bytes and self._file.tell():
+                self._open_segment(sequence)
+            self._file.write(line)
+            self._sync()
+            self.last_sequence = sequence
+            self._appended.notify_all()
+            return sequence
+
+    def wait_for_append(self, after: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a record with a sequence number greater than `after` exists.
+        """
+        with self._lock:
+            return self._appended.wait_for(lambda: self.last_sequence > after, timeout)
+
+    def flush(self):
+        """
+        Write and fsync every record appended so far, whatever the fsync policy.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._sync(force=True)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync(force=True)
+                self._file.close()
+                self._file = None
+            syncer, self._syncer = self._syncer, None
+        self._closed.set()
+        if syncer is not None:
+            syncer.join()
+
+    # reading
+
+    def records(self, after: int = 0) -> Iterator[WalRecord]:
+        """
+        :param after: only yield records with a greater sequence number
+        :return: iterator of the complete records in the log, oldest first
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            segments = self.segments()
+        starts = [self._first_sequence(segment) for segment in segments]
+        for i, segment in enumerate(segments):
+            if i + 1 < len(starts) and starts[i + 1] <= after + 1:
+                continue
+            with open(segment, 'rb') as f:
+                for line in f:
+                    record = _loads(line)
+                    if record is None:
+                        break
+                    if record['s'] > after:
+                        yield WalRecord(record['s'], record['t'], [tuple(write) for write in record['w']])
+
+    # checkpoints
+
+    @property
+    def checkpoint(self) -> int:
+        """
+        Sequence number of the last record known to be in firestore; 0 if none is
+        """
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT)) as f:
+                return json.load(f)['sequence']
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+
+    def set_checkpoint(self, sequence: int):
+        """
+        Atomically record that every record up to `sequence` is in firestore.
+        """
+        path = os.path.join(self.directory, _CHECKPOINT)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'sequence': sequence, 'time': time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of records not replayed yet
+        """
+        return self.last_sequence - self.checkpoint
+
+    def compact(self) -> List[str]:
+        """
+        Delete the segments whose records have all been replayed.
+
+        :return: paths of the deleted segments
+        """
+        checkpoint = self.checkpoint
+        with self._lock:
+            segments = self.segments()
+            deleted = []
+            for segment, next_segment in zip(segments, segments[1:]):
+                if self._first_sequence(next_segment) - 1 <= checkpoint:
+                    os.remove(segment)
+                    deleted.append(segment)
+            return deleted
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        return {
+            'directory': self.directory,
+            'segments': len(segments),
+            'bytes': sum(os.path.getsize(segment) for segment in segments),
+            'last_sequence': self.last_sequence,
+            'checkpoint': self.checkpoint,
+            'pending': self.pending,
+        }
+
+
+def add_write(batch, reference, op: str, data: Optional[dict]):
+    """
+    Add one logged write to a firestore batch. A 'merge' write replaces the top level fields in `data` and keeps the
+    other fields of the document, like the update that Model.save(patch=True) makes, but also creates the document
+    if it does not exist. Maps in `data` replace the maps stored in those fields rather than being merged into them.
+
+    :param batch: google.cloud.firestore.WriteBatch or fsmodels.memory.WriteBatch
+    :param reference: reference to the document at the path of the write
+    """
+    if op == DELETE:
+        batch.delete(reference)
+    elif op == MERGE:
+        batch.set(reference, data, merge=list(data))
+    else:
+        batch.set(reference, data)
+
+
+def coalesce(records: List[WalRecord]) -> List[Tuple[str, str, Optional[dict]]]:
+    """
+    Combine the writes of `records` into at most one write per document with the same end result, in the order
+    each document was first written.
+
+    :return: (op, document path, data) tuples
+    """
+    writes = {}
+    for record in records:
+        for op, path, data in record.writes:
+            previous = writes.get(path)
+            if op == MERGE and previous is not None and previous[0] != DELETE:
+                # merging into a known set or merge keeps that op; merges replace top level fields
+                writes[path] = (previous[0], path, {**previous[2], **data})
+            elif op == MERGE and previous is not None:
+                # merging into a deleted document creates it with just the merged fields
+                writes[path] = (SET, path, dict(data))
+            else:
+                writes[path] = (op, path, dict(data) if data is not None else None)
+    return list(writes.values())
+
+
+class Replayer:
+    """
+    Drains a WriteAheadLog to firestore from a background thread. Records are read in groups, coalesced to one
+    write per document and committed in batches of up to 500 writes; the checkpoint moves forward after each group
+    is committed. Replaying a group twice (after a crash between commit and checkpoint) gives the same result.
+    """
+
+    def __init__(self, log: WriteAheadLog, client, records_per_group: int = 1000, retry_delay: float = 1.0,
+                 max_retry_delay: float = 60.0):
+        """
+        :param log: log to drain
+        :param client: google.cloud.firestore.Client or fsmodels.memory.Client
+        :param records_per_group: records read and coalesced before committing
+        :param retry_delay: seconds to wait after a failed commit; doubles after each failure up to max_retry_delay
+        """
+        self.log = log
+        self.client = client
+        self.records_per_group = records_per_group
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.commits = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._progress = threading.Condition()
+
+    def replay_once(self) -> int:
+        """
+        Replay one group of records synchronously.
+
+        :return: number of records replayed
+        """
+        checkpoint = self.log.checkpoint
+        records = []
+        for record in self.log.records(after=checkpoint):
+            records.append(record)
+            if len(records) >= self.records_per_group:
+                break
+        if not records:
+            return 0
+        writes = coalesce(records)
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for op, path, data in writes[start:start + MAX_BATCH_WRITES]:
+                add_write(batch, self.client.document(path), op, data)
+            batch.commit()
+            self.commits += 1
+        self.log.set_checkpoint(records[-1].sequence)
+        with self._progress:
+            self._progress.notify_all()
+        return len(records)
+
+    def replay(self) -> int:
+        """
+        Replay every record in the log synchronously, e.g. after a crash.
+
+        :return: number of records replayed
+        """
+        total = 0
+        while True:
+            replayed = self.replay_once()
+            if not replayed:
+                return total
+            total += replayed
+
+    def _run(self):
+        delay = self.retry_delay
+        while not self._stop.is_set():
+            try:
+                replayed = self.replay_once()
+                delay = self.retry_delay
+            except Exception:
+                self.failures += 1
+                logging.exception(f'Write-ahead log replay failed; retrying in {delay:.1f}s.')
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            if not replayed:
+                self.log.wait_for_append(self.log.checkpoint, timeout=0.1)
+
+    def start(self) -> 'Replayer':
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='fsmodels-wal-replayer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every record appended so far is in firestore.
+
+        :return: whether the log was drained before the timeout
+        """
+        target = self.log.last_sequence
+        with self._progress:
+            return self._progress.wait_for(lambda: self.log.checkpoint >= target, timeout)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m fsmodels.wal', description='Inspect an fsmodels write-ahead log.')
+    parser.add_argument('directory', help='log directory')
+    parser.add_argument('--records', action='store_true', help='print the records that have not been replayed')
+    parser.add_argument('--all', action='store_true', help='with --records, also print replayed records')
+    args = parser.parse_args(argv)
+
+    log = WriteAheadLog(args.directory, fsync='never')
+    print(json.dumps(log.stats(), indent=2))
+    if args.records:
+        for record in log.records(after=0 if args.all else log.checkpoint):
+            print(json.dumps({'sequence': record.sequence, 'timestamp': record.timestamp, 'writes': record.writes},
+                             default=_encode))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -46,7 +46,7 @@ setup(
 
         # Indicate who your project is intended for
         'Intended Audience :: Developers',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3',
         'Operating System :: Microsoft :: Windows :: Windows 10',
         'Operating System :: POSIX :: Linux',
 
@@ -56,8 +56,11 @@ setup(
 
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
 
     # What does your project relate to?
@@ -73,9 +76,16 @@ setup(
     # your project is installed. For an analysis of "install_requires" vs pip's
     # requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=['google-cloud-firestore'],
+    install_requires=['google-cloud-firestore>=2.14.0'],
+    entry_points={
+        'console_scripts': [
+            'fsmodels-loadtest=fsmodels.loadtest:main',
+            'fsmodels-import=fsmodels.importer:main',
+        ],
+    },
     extras_require={
-        'dev': ['sphinx', 'sphinx_rtd_theme']
+        'dev': ['sphinx', 'sphinx_rtd_theme'],
+        'numpy': ['numpy'],
     },
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
\ No newline at end of file
@@ -0,0 +1,101 @@
+import lzma
+from unittest import TestCase, mock
+
+from fsmodels import memory
+from fsmodels.fields import CompressedField
+from fsmodels.models import Model, Field, ValidationError
+from fsmodels.utils import document_size, MAX_DOCUMENT_BYTES
+
+
+class TestCompressedField(TestCase):
+
+    def setUp(self):
+        class Report(Model):
+            title = Field(required=True)
+            body = CompressedField(threshold=100)
+            rows = CompressedField(codec='lzma', threshold=100)
+
+        self.client = memory.Client()
+        Report.use_client(self.client)
+        self.Report = Report
+
+    def test_encode_decode(self):
+        field = CompressedField(threshold=10)
+        for value in ['text ' * 100, b'\x00' * 1000, {'rows': [{'a': i} for i in range(100)]}, [1, 2, 3] * 100]:
+            stored = field.encode(value)
+            self.assertTrue(CompressedField.is_encoded(stored))
+            self.assertLess(len(stored), 1000)
+            self.assertEqual(CompressedField.decode(stored), value)
+        # small or incompressible values are stored as they are
+        self.assertEqual(field.encode('short'), 'short')
+        self.assertEqual(field.encode(None), None)
+        random_bytes = bytes(range(256)) * 2
+        incompressible = lzma.compress(random_bytes)
+        self.assertEqual(field.encode(incompressible), incompressible)
+        with self.assertRaises(ValidationError):
+            CompressedField(codec='gzip')
+
+    def test_magic_prefix(self):
+        field = CompressedField(threshold=10)
+        # plain bytes that start like an encoded value keep a header, small or incompressible, and come back unchanged
+        for value in [CompressedField.MAGIC, CompressedField.MAGIC + b'zj?', CompressedField.MAGIC + b'\x00' * 1000]:
+            stored = field.encode(value)
+            self.assertNotEqual(stored, value)
+            self.assertEqual(CompressedField.decode(stored), value)
+
+        report = self.Report(id='raw', title='raw', body=CompressedField.MAGIC + b'q?')
+        self.assertEqual(report.body, CompressedField.MAGIC + b'q?', 'assigned values are never decoded')
+        report.save()
+        self.assertEqual(self.Report.retrieve_many(['raw']).get()[0].body, CompressedField.MAGIC + b'q?')
+
+        self.client.collection('report').document('bad').set({'title': 'bad', 'body': CompressedField.MAGIC + b'qs..'})
+        with self.assertRaisesRegex(ValueError, 'Report field body value has an unknown codec'):
+            self.Report.retrieve_many(['bad']).get()[0].body
+        with self.assertRaisesRegex(ValueError, 'cannot be decompressed'):
+            CompressedField.decode(CompressedField.MAGIC + b'zs..')
+
+    def test_save_retrieve(self):
+        body = 'lorem ipsum dolor sit amet ' * 1000
+        rows = [{'id': i, 'value': 'x' * 10} for i in range(500)]
+        report = self.Report(id='q3', title='Q3', body=body, rows=rows)
+        stored = report.clean()
+        self.assertEqual(report.to_dict()['body'], body, 'to_dict returns the plain value')
+        self.assertTrue(CompressedField.is_encoded(stored['body']))
+        self.assertTrue(CompressedField.is_encoded(stored['rows']))
+        self.assertLess(len(stored['body']), len(body) / 10)
+        self.assertEqual(report.body, body, 'the instance keeps the plain value')
+        report.save()
+
+        document = self.client.collection('report').document('q3').get().to_dict()
+        self.assertEqual(document['body'], stored['body'])
+
+        copy = self.Report.retrieve_many(['q3']).get()[0]
+        with mock.patch.object(CompressedField, 'decode', wraps=CompressedField.decode) as decode:
+            self.assertEqual(copy.clean()['body'], stored['body'])
+            copy.title = 'Q3 (revised)'
+            copy.save()
+            self.assertEqual(decode.call_count, 0, 'untouched values should not be decompressed')
+            self.assertEqual(copy.rows, rows)
+            self.assertEqual(decode.call_count, 1)
+        self.assertEqual(copy.body, body)
+
+    def test_to_columns(self):
+        body = 'lorem ipsum dolor sit amet ' * 1000
+        self.Report(id='q3', title='Q3', body=body, rows=[1, 2]).save()
+        self.Report(id='q4', title='Q4').save()
+        columns = self.Report.objects.order_by('title').to_columns(['title', 'body', 'rows'])
+        self.assertEqual(columns, {'title': ['Q3', 'Q4'], 'body': [body, None], 'rows': [[1, 2], None]})
+
+    def test_document_size(self):
+        self.assertEqual(document_size({'type': 'Personal'}, 'tasks/task_id'), 76)
+
+        class Blob(Model):
+            data = Field()
+
+        Blob.use_client(self.client)
+        with self.assertLogs(level='WARNING'):
+            Blob(data='x' * int(MAX_DOCUMENT_BYTES * 0.95)).save()
+        with self.assertRaisesRegex(ValidationError, 'limited to'):
+            Blob(data='x' * MAX_DOCUMENT_BYTES).save()
+        # the same value fits when compressed
+        self.Report(title='big', body='x' * MAX_DOCUMENT_BYTES).save()
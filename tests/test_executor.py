@@ -0,0 +1,142 @@
+import threading
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.executor import ModelExecutor
+from fsmodels.models import Model, Field, ModelField, ValidationError
+
+
+class TestExecutor(TestCase):
+
+    def setUp(self):
+        class Profile(Model):
+            first_name = Field(required=True)
+
+        class User(Model):
+            username = Field(required=True)
+            profile = ModelField(Profile)
+
+        self.client = memory.Client()
+        User.use_client(self.client)
+        Profile.use_client(self.client)
+        self.User, self.Profile = User, Profile
+
+    def test_save_retrieve_delete_all(self):
+        users = [self.User(id=str(i), username=f'user{i}', profile=self.Profile(first_name=f'first{i}'))
+                 for i in range(50)]
+        with self.User.executor(max_workers=8) as executor:
+            results = executor.save_all(users)
+            self.assertEqual([result.index for result in results], list(range(50)), 'results should be in order')
+            self.assertTrue(all(result.ok for result in results))
+            self.assertEqual([result.value['id'] for result in results], [str(i) for i in range(50)])
+
+            copies = [self.User(id=str(i)) for i in range(50)]
+            executor.retrieve_all(copies, overwrite_local=True)
+            self.assertEqual([user.username for user in copies], [f'user{i}' for i in range(50)])
+            self.assertEqual(copies[7].profile.first_name, 'first7')
+
+            self.assertTrue(all(result.ok for result in executor.delete_all(users)))
+        self.assertEqual(self.User.objects.count(), 0)
+
+    def test_errors_are_per_item(self):
+        users = [self.User(id='1', username='a'), self.User(id='2'), self.User(id='3', username='c')]
+        with self.User.executor(max_workers=2) as executor:
+            results = executor.save_all(users)
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIsInstance(results[1].error, ValidationError)
+        self.assertIs(results[1].item, users[1])
+
+    def test_cancel(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def block(item):
+            if item == 0:
+                started.set()
+                release.wait(5)
+            return item
+
+        executor = ModelExecutor(max_workers=1, max_pending=4)
+        taken = []
+
+        def items():
+            for i in range(100):
+                taken.append(i)
+                yield i
+
+        def cancel():
+            # cancel while the first item runs and the next ones are queued behind it
+            started.wait(5)
+            executor.cancel()
+            release.set()
+
+        canceller = threading.Thread(target=cancel)
+        canceller.start()
+        results = list(executor.imap(block, items()))
+        canceller.join()
+        executor.shutdown()
+        self.assertTrue(results[0].ok, 'the running operation should finish')
+        self.assertEqual([result.cancelled for result in results[1:]], [True] * (len(results) - 1))
+        self.assertLess(len(taken), 100, 'items should not be taken after cancel')
+
+    def test_bounded(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def work(item):
+            with lock:
+                running.append(item)
+                peak.append(len(running))
+            with lock:
+                running.remove(item)
+            return item * 2
+
+        with ModelExecutor(max_workers=3) as executor:
+            self.assertEqual([result.value for result in executor.imap(work, range(200))], list(range(0, 400, 2)))
+        self.assertLessEqual(max(peak), 3)
+
+
+class TestConcurrentConstruction(TestCase):
+
+    def test_fields_are_not_mutated(self):
+        class Profile(Model):
+            first_name = Field(required=True)
+
+        class User(Model):
+            username = Field(required=True)
+            profile = ModelField(Profile)
+
+        class Admin(User):
+            level = Field(default=1)
+
+        Model.use_client(memory.Client())
+        try:
+            self.assertEqual(User.username.model_name, 'User')
+            self.assertEqual(Admin.username.model_name, 'Admin', 'inherited fields should be bound to the subclass')
+            self.assertIsNot(User.username, Admin.username)
+
+            errors = []
+
+            def construct(model, n):
+                for i in range(n):
+                    try:
+                        instance = model(username=f'user{i}', profile=Profile(first_name='Billy'))
+                        instance.validate()
+                        if instance.to_dict()['username'] != f'user{i}':
+                            errors.append(instance)
+                    except (Exception, ValidationError) as e:
+                        errors.append(e)
+
+            threads = [threading.Thread(target=construct, args=(model, 200)) for model in (User, Admin) * 4]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(User.username.model_name, 'User')
+            self.assertEqual(Admin.username.model_name, 'Admin')
+            with self.assertRaisesRegex(ValidationError, 'Admin field username'):
+                Admin().validate()
+        finally:
+            Model.use_client(None)
@@ -0,0 +1,98 @@
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.graph import plan, save_graph
+from fsmodels.models import Model, Field, ModelField, ValidationError
+
+
+class TestGraph(TestCase):
+
+    def setUp(self):
+        class Address(Model):
+            city = Field(required=True)
+
+        class Profile(Model):
+            first_name = Field(required=True)
+            address = ModelField(Address)
+
+        class User(Model):
+            username = Field(required=True)
+            profile = ModelField(Profile)
+
+        self.client = memory.Client()
+        Model.use_client(self.client)
+        self.Address, self.Profile, self.User = Address, Profile, User
+
+    def tearDown(self):
+        Model.use_client(None)
+
+    def test_save_graph(self):
+        user = self.User(username='bmayes', profile=self.Profile(first_name='Billy', address=self.Address(city='Boston')))
+        self.client.reset_rpc_counts()
+        result = user.save_graph()
+        self.assertEqual(result, {'id': user.id, 'writes': 3, 'commits': 1})
+        self.assertEqual(self.client.rpc_count, 1)
+
+        profile_path = f'user/{user.id}/profile/{user.profile.id}'
+        address = self.client.document(f'{profile_path}/address/{user.profile.address.id}').get().to_dict()
+        self.assertEqual(address, {'id': user.profile.address.id, 'city': 'Boston'})
+        profile = self.client.document(profile_path).get().to_dict()
+        self.assertNotIn('address', profile, 'grandchildren should not be saved inline')
+        self.assertEqual(user.retrieve()['profile']['first_name'], 'Billy')
+
+    def test_plan_order_and_dedup(self):
+        address = self.Address(id='a', city='Boston')
+        profile = self.Profile(id='p', first_name='Billy', address=address)
+        users = [self.User(id=str(i), username=f'user{i}', profile=profile) for i in range(3)]
+        writes = plan(users + [users[0]])
+        paths = [path for _, path, _ in writes]
+        self.assertEqual(len(paths), len(set(paths)), 'every document should be written once')
+        self.assertEqual(len(paths), 9)
+        depths = [path.count('/') for path in paths]
+        self.assertEqual(depths, sorted(depths, reverse=True), 'children should be written before their parents')
+        # the shared profile is serialized once
+        profile_data = [data for _, path, data in writes if path.endswith('/profile/p')]
+        self.assertTrue(all(data is profile_data[0] for data in profile_data))
+
+    def test_batches(self):
+        users = [self.User(username=f'user{i}', profile=self.Profile(first_name='Billy', address=self.Address(city='x')))
+                 for i in range(1000)]
+        self.client.reset_rpc_counts()
+        result = save_graph(users)
+        self.assertEqual(result['writes'], 3000)
+        self.assertEqual(result['commits'], 6)
+        self.assertEqual(self.client.rpc_count, 6, 'RPCs should grow with batches, not documents')
+        self.assertEqual(self.User.objects.count(), 1000)
+
+    def test_patch_matches_save(self):
+        class Account(Model):
+            settings = Field()
+
+        stored = []
+        for save in (lambda account: account.save(), lambda account: account.save_graph()):
+            account = Account(settings={'a': 1, 'b': 2})
+            save(account)
+            self.client.document(f'account/{account.id}').update({'kept': True})
+            account.settings = {'a': 1}
+            save(account)
+            data = self.client.document(f'account/{account.id}').get().to_dict()
+            stored.append({key: value for key, value in data.items() if key != 'id'})
+        self.assertEqual(stored[0], {'settings': {'a': 1}, 'kept': True})
+        self.assertEqual(stored[1], stored[0], 'save_graph should store what save stores')
+
+    def test_invalid(self):
+        profile = self.Profile(first_name='Billy', address=self.Address())
+        with self.assertRaises(ValidationError):
+            self.User(username='bmayes', profile=profile).save_graph()
+        self.assertEqual(self.User.objects.count(), 0, 'nothing should be written when any model is invalid')
+
+        class Node(Model):
+            name = Field()
+
+        # a model can only refer to itself once it exists
+        Node.child = ModelField(Node)
+
+        node = Node(name='a')
+        node.child = Node(name='b', child=node)
+        with self.assertRaisesRegex(ValidationError, 'refers back'):
+            node.save_graph()
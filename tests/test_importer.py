@@ -0,0 +1,133 @@
+import os
+import json
+import tempfile
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.importer import Importer, main
+from fsmodels.models import Model, Field, ModelField
+
+
+def is_int(value):
+    return isinstance(value, int), {'error': 'must be an int'}
+
+
+class ImportProfile(Model):
+    first_name = Field(required=True)
+
+
+class ImportUser(Model):
+    username = Field(required=True)
+    age = Field(default=0, validation=is_int)
+    active = Field(default=True)
+    profile = ModelField(ImportProfile)
+
+
+class TestImporter(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.client = memory.Client()
+        ImportUser.use_client(self.client)
+
+    def tearDown(self):
+        ImportUser.use_client(None)
+        self.directory.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_ndjson(self):
+        lines = [json.dumps({'id': f'u{i}', 'username': f'user{i}', 'age': i}) for i in range(1, 1201)]
+        lines[10] = json.dumps({'id': 'u11', 'age': 11})  # no username
+        lines[20] = '{"id": "u21", '  # not JSON
+        lines[30] = json.dumps({'username': 'no id', 'age': 31, 'profile': {'first_name': 'Billy'}})
+        path = self._write('users.ndjson', '\n'.join(lines) + '\n\n')
+
+        self.client.reset_rpc_counts()
+        result = Importer(ImportUser, path, workers=3, chunk_size=100, batch_size=250).run()
+        self.assertTrue(result['complete'])
+        self.assertEqual((result['imported'], result['rejected']), (1198, 2))
+        self.assertEqual(result['offset'], os.path.getsize(path))
+        # 1199 documents (one row has a child) over 1198 rows in batches of 250 rows
+        self.assertEqual(result['commits'], 5)
+        self.assertEqual(self.client.rpc_counts['commit'], 5)
+        self.assertEqual(ImportUser.objects.count(), 1198)
+        self.assertEqual(ImportUser.retrieve_many(['u5']).get()[0].age, 5)
+        with_child = ImportUser.objects.where('username', '==', 'no id').get()[0]
+        self.assertEqual(len(with_child.id), 20)
+        self.assertEqual(with_child.retrieve()['import_profile']['first_name'], 'Billy')
+
+        with open(result['rejects']) as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([json.loads(reject['row'])['id'] for reject in rejects[:1]], ['u11'])
+        self.assertIn('username', rejects[0]['errors'])
+        self.assertIn('JSONDecodeError', rejects[1]['errors']['error'])
+
+        # a finished import has nothing left to do
+        again = Importer(ImportUser, path).run()
+        self.assertEqual((again['imported'], again['commits']), (1198, 0))
+
+    def test_generated_ids(self):
+        paths = []
+        for day in ('d1', 'd2'):
+            os.mkdir(os.path.join(self.directory.name, day))
+            rows = [json.dumps({'username': f'{day}-user{i}', 'age': i}) for i in range(3)]
+            paths.append(self._write(os.path.join(day, 'events.ndjson'), '\n'.join(rows) + '\n'))
+        for path in paths:
+            Importer(ImportUser, path).run()
+        self.assertEqual(ImportUser.objects.count(), 6, 'files with the same name should not share ids')
+
+        # the same namespace writes a file onto the same documents again
+        for path in paths:
+            os.remove(path + '.checkpoint')
+            Importer(ImportUser, path, namespace='events').run()
+        self.assertEqual(ImportUser.objects.count(), 9)
+
+    def test_csv_and_resume(self):
+        rows = ['id,username,age,active,note']
+        rows += [f'u{i},user{i},{i},{"yes" if i % 2 else "no"},"line one\nline two"' for i in range(1, 101)]
+        rows[50] = 'u50,user50,fifty,yes,'
+        path = self._write('users.csv', '\n'.join(rows) + '\n')
+
+        class Failing(memory.Client):
+            commits = 0
+
+            def _rpc(self, name):
+                if name == 'commit':
+                    Failing.commits += 1
+                    if Failing.commits > 2:
+                        raise memory.ServiceUnavailable('down')
+                super(Failing, self)._rpc(name)
+
+        failing = Failing()
+        importer = Importer(ImportUser, path, client=failing, workers=1, writers=1, max_pending=1, chunk_size=10,
+                            batch_size=10, converters={'age': int, 'active': lambda value: value == 'yes'}, retries=0)
+        with self.assertRaises(memory.ServiceUnavailable):
+            importer.run()
+        checkpoint = importer.checkpoint()
+        self.assertEqual(checkpoint['imported'], 20)
+        self.assertLess(checkpoint['offset'], os.path.getsize(path))
+
+        # resume against another client: only the rows after the checkpoint end up in it
+        importer.client = self.client
+        result = importer.run()
+        self.assertTrue(result['complete'])
+        self.assertEqual((result['imported'], result['rejected']), (99, 1))
+        self.assertEqual(ImportUser.objects.count(), 79)
+        with open(result['rejects']) as f:
+            self.assertEqual(len(f.readlines()), 1, 'rejects should not be written twice')
+        user = ImportUser.retrieve_many(['u99']).get()[0]
+        self.assertEqual((user.age, user.active), (99, True))
+
+    def test_cli(self):
+        path = self._write('users.jsonl', json.dumps({'id': 'a', 'username': 'bmayes'}) + '\n')
+        Model.use_client(self.client)
+        try:
+            self.assertEqual(main(['tests.test_importer:ImportUser', path, '--workers', '1']), 0)
+        finally:
+            Model.use_client(None)
+        self.assertEqual(ImportUser.retrieve_many(['a']).get()[0].username, 'bmayes')
@@ -0,0 +1,203 @@
+import random
+import datetime
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.common import ValidationError
+from fsmodels.index import IndexSet, SortedIndex
+from fsmodels.models import Model, Field
+
+
+class TestIndex(TestCase):
+
+    def setUp(self):
+        class Event(Model):
+            tenant_id = Field(required=True)
+            status = Field()
+            created = Field()
+
+            class Meta:
+                indexes = ['tenant_id', ('status', 'created')]
+
+        self.client = memory.Client()
+        Event.use_client(self.client)
+        self.Event = Event
+        rng = random.Random(0)
+        batch = self.client.batch()
+        for i in range(300):
+            data = {'id': f'e{i:03}', 'tenant_id': f't{i % 7}', 'status': rng.choice(['open', 'closed', 'held']),
+                    'created': i * 10 + rng.random()}
+            batch.set(self.client.document(f'event/{data["id"]}'), data)
+        batch.commit()
+
+    def tearDown(self):
+        for mirror in list(self.Event._mirrors.values()):
+            mirror.close()
+
+    def _mirror(self):
+        mirror = self.Event.mirror()
+        self.assertTrue(mirror.wait(timeout=1))
+        return mirror
+
+    def _scanned(self, mirror, query):
+        """
+        Results of `query` without indexes
+        """
+        indexes, mirror._indexes = mirror._indexes, None
+        try:
+            return [event.id for event in query]
+        finally:
+            mirror._indexes = indexes
+
+    def test_queries(self):
+        mirror = self._mirror()
+        self.assertIsNotNone(mirror._indexes)
+        self.Event(id='flag', tenant_id='t1', status='open', created=True).save()
+        queries = [
+            mirror.where('status', '==', 'open').where('created', '<', 2),
+            mirror.where('status', '==', 'open').where('created', '==', 1),
+            mirror.where('tenant_id', '==', 't3'),
+            mirror.where('tenant_id', 'in', ['t1', 't2']).order_by('created'),
+            mirror.where('status', '==', 'open').order_by('created', 'DESCENDING').limit(5),
+            mirror.where('status', '==', 'held').where('created', '>=', 500).where('created', '<', 1500),
+            mirror.where('created', '>', 2900).order_by('created'),
+            mirror.order_by('created').limit(3),
+            mirror.where('tenant_id', '==', 't0').where('status', '==', 'closed').order_by('created'),
+            mirror.where('status', '==', 'open').where('created', '<', 'a string'),
+        ]
+        for query in queries:
+            expected = self._scanned(mirror, query)
+            actual = [event.id for event in query]
+            if query._orders:
+                self.assertEqual(actual, expected)
+            else:
+                self.assertEqual(sorted(actual), sorted(expected))
+        self.assertEqual(mirror.where('status', '==', 'open').where('created', '<', 'a string').count(), 0,
+                         'range filters only match values of the same type')
+        self.assertNotIn('flag', [event.id for event in mirror.where('status', '==', 'open').where('created', '<', 2)],
+                         'booleans are not numbers')
+        self.assertEqual(self._scanned(mirror, mirror.where('status', '==', 'open').where('created', '>=', False)),
+                         ['flag'])
+
+    def test_timestamps_and_maps(self):
+        class Run(Model):
+            kind = Field()
+            when = Field()
+            meta = Field()
+
+            class Meta:
+                indexes = ['when', 'meta', ('kind', 'when')]
+
+        Run.use_client(self.client)
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        plus_two = datetime.timezone(datetime.timedelta(hours=2))
+        rng = random.Random(1)
+        batch = self.client.batch()
+        for i in range(120):
+            when = start + datetime.timedelta(minutes=i * 7)
+            # a mix of naive (UTC), UTC and other timezones for the same timeline
+            when = [when.replace(tzinfo=None), when, when.astimezone(plus_two)][i % 3]
+            meta = {'tier': rng.choice(['a', 'b']), 'n': i % 40} if i % 10 else [i, 'x']
+            batch.set(self.client.document(f'run/r{i:03}'), {'id': f'r{i:03}', 'kind': rng.choice(['x', 'y']),
+                                                             'when': when, 'meta': meta})
+        batch.commit()
+        mirror = Run.mirror()
+        self.assertTrue(mirror.wait(timeout=1))
+        self.assertIsNotNone(mirror._indexes)
+        noon = start.replace(hour=12)
+        queries = [
+            mirror.where('when', '>=', noon).where('when', '<', noon.astimezone(plus_two) + datetime.timedelta(hours=3)),
+            mirror.where('when', '==', (start + datetime.timedelta(minutes=21)).replace(tzinfo=None)),
+            mirror.where('when', '>', start.replace(tzinfo=None)).order_by('when', 'DESCENDING').limit(7),
+            mirror.where('kind', '==', 'x').where('when', '<', noon).order_by('when'),
+            mirror.where('meta', '==', {'n': 5, 'tier': 'a'}),
+            mirror.where('meta', '==', {'n': 5, 'tier': 'b'}),
+            mirror.where('meta', '>', {'n': 30}).where('meta', '<=', {'n': 35, 'tier': 'b'}),
+            mirror.where('meta', 'in', [{'tier': 'a', 'n': 1}, {'tier': 'b', 'n': 1}, [10, 'x']]),
+            mirror.where('meta', '<', [50]),
+            mirror.order_by('when').limit(10),
+        ]
+        for query in queries:
+            expected = self._scanned(mirror, query)
+            actual = [run.id for run in query]
+            self.assertTrue(expected or query._limit, query._filters)
+            if query._orders:
+                self.assertEqual(actual, expected)
+            else:
+                self.assertEqual(sorted(actual), sorted(expected))
+        self.assertEqual(self._scanned(mirror, queries[1]), ['r003'], 'naive datetimes are UTC')
+        self.assertEqual(self._scanned(mirror, queries[8]), ['r000', 'r010', 'r020', 'r030', 'r040'],
+                         'arrays compare element by element')
+        self.assertEqual([run.id for run in mirror.order_by('when').limit(3)], ['r000', 'r001', 'r002'])
+        self.assertEqual(len(self._scanned(mirror, queries[0])), len(range(103, 120)))
+
+    def test_select(self):
+        mirror = self._mirror()
+        ids, ordered = mirror._indexes.select([('status', '==', 'open')], [('created', 'DESCENDING')], limit=5)
+        self.assertTrue(ordered)
+        self.assertIsNone(mirror._indexes.select([('created', '!=', 1)], []), 'no index applies to !=')
+        ids, ordered = mirror._indexes.select([('tenant_id', '==', 't1')], [('created', 'ASCENDING')])
+        self.assertFalse(ordered, 'hash index results need sorting')
+        self.assertEqual(len(ids), len([i for i in range(300) if i % 7 == 1]))
+
+    def test_write_through(self):
+        mirror = self._mirror()
+        event = self.Event(id='new', tenant_id='t9', status='open', created=-1)
+        event.save()
+        # no flush: the save is applied to the mirror (and its indexes) before the listener sees it
+        self.assertEqual([e.id for e in mirror.where('tenant_id', '==', 't9')], ['new'])
+        self.assertEqual(mirror.where('status', '==', 'open').order_by('created').limit(1).get()[0].id, 'new')
+
+        event.status = 'closed'
+        event.save()
+        self.assertEqual(mirror.where('status', '==', 'open').where('tenant_id', '==', 't9').count(), 0)
+        self.assertEqual(mirror.where('status', '==', 'closed').where('created', '<', 0).get()[0].id, 'new')
+
+        # saves replace maps rather than merging into them
+        event.save(additional_fields={'extra': {'a': 1, 'b': 2}})
+        event.save(additional_fields={'extra': {'a': 1}})
+        self.assertEqual(mirror.retrieve('new')['extra'], {'a': 1})
+        self.client.flush()
+        self.assertEqual(mirror.retrieve('new')['extra'], {'a': 1})
+
+        event.delete()
+        self.assertEqual(mirror.where('tenant_id', '==', 't9').count(), 0)
+        self.client.flush()
+        self.assertEqual(mirror.where('tenant_id', '==', 't9').count(), 0)
+        self.assertEqual(mirror.size, 300)
+
+        self.Event(id='graph', tenant_id='t8', status='held', created=5).save_graph()
+        self.assertEqual(mirror.where('tenant_id', '==', 't8').count(), 1)
+
+    def test_bulk_snapshot(self):
+        batch = self.client.batch()
+        for i in range(300, 1500):
+            batch.set(self.client.document(f'event/e{i}'), {'id': f'e{i}', 'tenant_id': 't1', 'status': 'open',
+                                                            'created': i * 10})
+        mirror = self._mirror()
+        batch.commit()
+        self.client.flush()
+        self.assertEqual(mirror.size, 1500)
+        query = mirror.where('status', '==', 'open').order_by('created', 'DESCENDING').limit(3)
+        self.assertEqual([event.id for event in query], ['e1499', 'e1498', 'e1497'])
+
+    def test_invalid_index(self):
+        class Broken(Model):
+            name = Field()
+
+            class Meta:
+                indexes = ['missing']
+
+        with self.assertRaises(ValidationError):
+            IndexSet.for_model(Broken)
+
+    def test_sorted_index(self):
+        index = SortedIndex(['n'])
+        for i, value in enumerate([3, 1, 'b', 2, None, 'a', 2.5]):
+            index.add(str(i), {'n': value})
+        start, stop = index.bounds([], [('>=', 2), ('<', 3)])
+        self.assertEqual(list(index.ids(start, stop)), ['3', '6'])
+        start, stop = index.bounds([], [('>', 'a')])
+        self.assertEqual(list(index.ids(start, stop)), ['2'])
+        index.remove('2', {'n': 'b'})
+        self.assertEqual(len(index), 6)
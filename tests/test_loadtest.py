@@ -0,0 +1,24 @@
+from unittest import TestCase
+
+from fsmodels import loadtest
+from fsmodels.models import Model
+
+
+class TestLoadTest(TestCase):
+
+    def test_run(self):
+        for mode in ('threads', 'asyncio'):
+            result = loadtest.run(loadtest._Config(operations=50, concurrency=4, mode=mode, latency=0.0, preload=5,
+                                                   seed=1))
+            self.assertEqual(result['total']['operations'], 50)
+            self.assertGreater(result['total']['rpcs_per_operation'], 0)
+            self.assertEqual(result['by_operation']['delete']['rpcs_per_operation'], 1)
+            self.assertIn('p99', loadtest.format_report(result))
+        # the model client is restored after the run
+        self.assertIsNone(Model._client)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([], 99), 0.0)
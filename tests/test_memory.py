@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.models import Model, Field, ModelField
+
+
+class TestMemoryClient(TestCase):
+
+    def test_documents(self):
+        client = memory.Client()
+        doc = client.collection('users').document('a')
+        self.assertFalse(doc.get().exists)
+
+        doc.set({'name': 'a', 'nested': {'x': 1}})
+        doc.update({'nested.y': 2})
+        self.assertEqual(doc.get().to_dict(), {'name': 'a', 'nested': {'x': 1, 'y': 2}})
+        self.assertEqual(doc.get().get('nested.y'), 2)
+
+        with self.assertRaises((memory.NotFound, )):
+            client.collection('users').document('missing').update({'name': 'b'})
+
+        doc.collection('profile').document('p').set({'first_name': 'Billy'})
+        self.assertEqual([c.id for c in doc.collections()], ['profile'])
+
+        doc.delete()
+        self.assertIsNone(doc.get().to_dict())
+
+    def test_query(self):
+        client = memory.Client()
+        users = client.collection('users')
+        for i in range(10):
+            users.document(str(i)).set({'n': i, 'even': i % 2 == 0})
+
+        result = [s.get('n') for s in users.where('even', '==', True).order_by('n', direction='DESCENDING').limit(3).stream()]
+        self.assertEqual(result, [8, 6, 4])
+
+    def test_start_after(self):
+        client = memory.Client()
+        orders = client.collection('orders')
+        for i in range(6):
+            orders.document(f'o{i}').set({'n': i // 2})
+
+        query = orders.order_by('n').limit(2)
+        page = query.get()
+        self.assertEqual([s.id for s in page], ['o0', 'o1'])
+        # the cursor document is gone; the next page still continues after it
+        orders.document('o1').delete()
+        page = query.start_after(page[-1]).get()
+        self.assertEqual([s.id for s in page], ['o2', 'o3'])
+        # ties are broken by path, in the direction of the last order_by
+        self.assertEqual([s.id for s in orders.order_by('n', direction='DESCENDING').start_after(page[0]).get()],
+                         ['o0'])
+        self.assertEqual([s.id for s in orders.order_by('n').start_after({'n': 1}).get()], ['o4', 'o5'])
+
+    def test_rpc_counts_and_errors(self):
+        client = memory.Client()
+        batch = client.batch()
+        for i in range(5):
+            batch.set(client.collection('users').document(str(i)), {'n': i})
+        batch.commit()
+        self.assertEqual(client.rpc_counts, {'commit': 1})
+        list(client.get_all([client.collection('users').document(str(i)) for i in range(5)]))
+        self.assertEqual(client.rpc_count, 2)
+
+        failing = memory.Client(error_rate=1.0)
+        with self.assertRaises((memory.ServiceUnavailable, )):
+            failing.collection('users').document('a').get()
+
+
+class TestModelWithMemoryClient(TestCase):
+
+    def setUp(self):
+        self.client = memory.Client()
+
+        class Profile(Model):
+            first_name = Field(required=True)
+
+        class User(Model):
+            username = Field(required=True)
+            profile = ModelField(Profile)
+
+        User.use_client(self.client)
+        Profile.use_client(self.client)
+        self.User, self.Profile = User, Profile
+
+    def test_save_retrieve_delete(self):
+        user = self.User(username='bmayes', profile=self.Profile(first_name='Billy'))
+        user.save()
+
+        remote = self.User(id=user.id)
+        remote.retrieve(overwrite_local=True)
+        self.assertEqual(remote.username, 'bmayes')
+        self.assertEqual(remote.profile.first_name, 'Billy')
+        self.assertEqual(remote.profile.id, user.profile.id)
+
+        user.delete()
+        self.assertEqual(user.retrieve(), {})
@@ -0,0 +1,106 @@
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.models import Model, Field
+
+
+class TestMirror(TestCase):
+
+    def setUp(self):
+        class Tier(Model):
+            name = Field(required=True)
+            price = Field()
+            active = Field(default=True)
+            perks = Field(default=list)
+
+        self.client = memory.Client()
+        Tier.use_client(self.client)
+        self.Tier = Tier
+        Tier(id='gold', name='gold', price=10).save()
+        Tier(id='silver', name='silver', price=5).save()
+
+    def tearDown(self):
+        for mirror in list(self.Tier._mirrors.values()):
+            mirror.close()
+
+    def test_mirror(self):
+        mirror = self.Tier.mirror()
+        self.assertTrue(mirror.wait(timeout=1))
+        self.assertIs(self.Tier.mirror(), mirror, 'mirrors of the same query should be shared')
+        self.assertEqual(mirror.size, 2)
+
+        # reads are served from memory
+        self.client.reset_rpc_counts()
+        self.assertEqual(mirror.retrieve('gold')['price'], 10)
+        self.assertEqual(mirror.get('silver').name, 'silver')
+        self.assertEqual([tier.name for tier in mirror.where('price', '>', 1).order_by('price')], ['silver', 'gold'])
+        self.assertEqual(mirror.retrieve('missing'), {})
+        self.assertEqual(self.client.rpc_count, 0)
+
+        # writes show up through the snapshot listener
+        self.Tier(id='bronze', name='bronze', price=1).save()
+        self.Tier(id='gold', name='gold', price=12).save()
+        self.Tier(id='silver').delete()
+        self.client.flush()
+        self.assertEqual(sorted(tier.name for tier in mirror.all()), ['bronze', 'gold'])
+        self.assertEqual(mirror.retrieve('gold')['price'], 12)
+
+        metrics = mirror.metrics()
+        self.assertTrue(metrics['ready'])
+        self.assertEqual(metrics['size'], 2)
+        self.assertGreaterEqual(metrics['lag'], 0)
+
+        mirror.close()
+        self.Tier(id='platinum', name='platinum').save()
+        self.client.flush()
+        self.assertEqual(mirror.size, 2, 'closed mirrors should not change')
+
+    def test_mirror_query(self):
+        mirror = self.Tier.mirror(self.Tier.objects.where('price', '>=', 10))
+        mirror.wait(timeout=1)
+        self.assertEqual(mirror.size, 1)
+
+        self.Tier(id='gold', name='gold', price=2).save()
+        self.client.flush()
+        self.assertEqual(mirror.size, 0, 'documents that stop matching the query should leave the mirror')
+
+    def test_mirror_aggregation(self):
+        mirror = self.Tier.mirror()
+        mirror.wait(timeout=1)
+        self.assertEqual(mirror.all().count(), 2)
+        self.assertEqual(mirror.all().sum('price'), 15)
+        self.assertEqual(mirror.where('price', '>', 6).avg('price'), 10)
+
+    def test_mirror_copies(self):
+        mirror = self.Tier.mirror(self.Tier.objects.where('price', '>=', 0))
+        mirror.wait(timeout=1)
+        self.Tier(id='gold', name='gold', price=10, perks=['support']).save()
+
+        mirror.retrieve('gold')['perks'].append('retrieve')
+        mirror.get('gold').perks.append('get')
+        next(iter(mirror.where('perks', 'array_contains', 'support'))).perks.append('stream')
+        self.assertEqual(mirror.retrieve('gold')['perks'], ['support'], 'results should not share data with the mirror')
+        self.assertEqual(mirror.where('perks', 'array_contains', 'get').count(), 0)
+
+    def test_stale_snapshot(self):
+        mirror = self.Tier.mirror()
+        mirror.wait(timeout=1)
+        reference = self.client.collection(self.Tier._get_meta()[1]).document('gold')
+        stale = reference.get()
+        self.Tier(id='gold', name='gold', price=20).save()
+        # a snapshot read before the save, delivered after it
+        mirror._on_snapshot([stale], [memory.DocumentChange(memory.ChangeType.MODIFIED, stale, 0, 0)],
+                            stale.read_time)
+        self.assertEqual(mirror.retrieve('gold')['price'], 20, 'reads should not go back in time')
+        self.client.flush()
+        self.assertEqual(mirror.retrieve('gold')['price'], 20)
+
+        stale = reference.get()
+        self.Tier(id='gold').delete()
+        mirror._on_snapshot([], [memory.DocumentChange(memory.ChangeType.ADDED, stale, -1, 0)], stale.read_time)
+        self.assertEqual(mirror.retrieve('gold'), {})
+
+        # writes that do not go through the model still reach the mirror
+        reference.set({'id': 'gold', 'name': 'gold', 'price': 30})
+        self.client.flush()
+        self.assertEqual(mirror.retrieve('gold')['price'], 30)
@@ -2,7 +2,7 @@ import os
 import time
 import uuid
 
-from fsmodels import models
+from fsmodels import models, columnar
 from unittest import TestCase, skipIf
 
 
@@ -47,6 +47,31 @@ class TestBaseModel(TestCase):
         # fields defined in the class scope are stored privately and can be listed by calling _get_fields
         self.assertTrue(all([field in test._model_field_names for field in ['test_model_field']]))
 
+    def test_late_fields(self):
+
+        class Node(models.BaseModel):
+            name = models.Field()
+
+        class Leaf(Node):
+            pass
+
+        # a model can only refer to itself once it exists
+        Node.child = models.ModelField(Node)
+        Node.label = models.Field(default='node')
+        for model in (Node, Leaf):
+            self.assertIn('child', model._model_field_names)
+            self.assertIn('label', model._field_names)
+        node = Node(name='a', child=Node(name='b'))
+        self.assertEqual(node.to_dict()['child'], {'id': None, 'name': 'b', 'label': 'node', 'child': None})
+        self.assertFalse(Node(child='not a node').is_valid)
+        self.assertEqual(Leaf().label, 'node')
+        Node.label = models.Field(default='changed')
+        self.assertEqual(Leaf().label, 'changed')
+
+        del Node.label
+        self.assertNotIn('label', Node._field_names)
+        self.assertNotIn('label', Leaf._field_names)
+
     def test_validate(self):
 
         class MyModel(models.BaseModel):
@@ -109,6 +134,57 @@ class TestBaseModel(TestCase):
         for i, key in enumerate(['one', 'two', 'three', 'four']):
             self.assertEqual(my_instance_dict[key], i + 1)
 
+    def test_validate_many(self):
+
+        class MyProfile(models.BaseModel):
+            first_name = models.Field(required=True)
+
+        class MyModel(models.BaseModel):
+            id = models.IDField()
+            test_field1 = models.Field(required=True)
+            test_field2 = models.Field(required=True, default=1)
+            test_field3 = models.Field(validation=lambda x: (x is None or isinstance(x, int), {}))
+            profile = models.ModelField(MyProfile)
+
+        records = [
+            {'id': '1', 'test_field1': 'a'},
+            {'id': 2, 'test_field1': 'b', 'test_field3': 'c'},
+            {'test_field1': None, 'test_field2': 0},
+            {'test_field1': 'd', 'profile': {'first_name': None}},
+            {'test_field1': 'e', 'profile': MyProfile(first_name='Billy')},
+        ]
+        is_valid, errors = MyModel.validate_many(records)
+        self.assertFalse(is_valid)
+        self.assertEqual(set(errors), {1, 2, 3})
+        self.assertEqual(set(errors[1]), {'id', 'test_field3'})
+        self.assertEqual(set(errors[2]), {'test_field1', 'test_field2'})
+        self.assertEqual(set(errors[3]['profile']), {'first_name'})
+
+        # the per-record errors match those of validating an instance
+        for i, record in enumerate(records[:3]):
+            self.assertEqual(errors.get(i, {}), MyModel(**record).validate(raise_error=False)[1])
+
+        # a dict of columns works the same way
+        is_valid, errors = MyModel.validate_many({'test_field1': ['a', '', 'c'], 'test_field3': [1, 2, 'x']})
+        self.assertEqual(errors, {1: {'test_field1': errors[1]['test_field1']}, 2: {'test_field3': {}}})
+
+        with self.assertRaises((models.ValidationError, )):
+            MyModel.validate_many(records, raise_error=True)
+
+    @skipIf(columnar.np is None, 'NumPy is not installed.')
+    def test_validate_many_numpy(self):
+        np = columnar.np
+
+        class MyModel(models.BaseModel):
+            id = models.IDField(required=True)
+            count = models.Field(required=True)
+
+        ids = np.array(['a', '', 'c'])
+        counts = np.array([1, 2, 0])
+        is_valid, errors = MyModel.validate_many({'id': ids, 'count': counts})
+        self.assertEqual(set(errors), {1, 2})
+        self.assertEqual(set(MyModel.validate_many({'id': np.arange(3), 'count': counts})[1]), {0, 1, 2})
+
 
 should_skip = not os.environ.get('GOOGLE_APPLICATION_CREDENTIALS', False)
 
@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.models import Model, Field, ModelField, ModelListField, ValidationError
+
+
+class TestModelListField(TestCase):
+
+    def setUp(self):
+        class Item(Model):
+            sku = Field(required=True)
+
+        class Order(Model):
+            total = Field(required=True)
+            status = Field(default='open')
+            item = ModelField(Item)
+
+        class Customer(Model):
+            name = Field(required=True)
+            orders = ModelListField(Order, page_size=10, order_by='total')
+
+        self.client = memory.Client()
+        Model.use_client(self.client)
+        self.Item, self.Order, self.Customer = Item, Order, Customer
+        self.customer = Customer(id='c1', name='Billy')
+        self.customer.save()
+
+    def tearDown(self):
+        Model.use_client(None)
+
+    def test_extend_and_iterate(self):
+        orders = [self.Order(total=100 + i, status='open' if i % 2 else 'closed') for i in range(95)]
+        self.client.reset_rpc_counts()
+        ids = self.customer.orders.extend(orders)
+        self.assertEqual(ids, [order.id for order in orders])
+        self.assertEqual(self.client.rpc_count, 1, 'children should be added in one batched commit')
+        self.assertIsNone(self.client.document('customer/c1').get().to_dict().get('orders'),
+                          'the parent document should not be rewritten')
+
+        self.client.reset_rpc_counts()
+        self.assertEqual([order.total for order in self.customer.orders], list(range(100, 195)))
+        self.assertEqual(self.client.rpc_count, 10, 'children should be read a page at a time')
+        self.assertEqual([len(page) for page in self.customer.orders.page_size(50).pages()], [50, 45])
+
+        open_orders = self.customer.orders.where('status', '==', 'open').order_by('total', 'DESCENDING')
+        self.assertEqual(open_orders.count(), 47)
+        self.assertEqual([order.total for order in open_orders.limit(3)], [193, 191, 189])
+        self.assertEqual([order.total for order in self.customer.orders.offset(90).page_size(3)],
+                         [190, 191, 192, 193, 194])
+        self.assertEqual(self.customer.orders.sum('total'), sum(range(100, 195)))
+
+    def test_delete_while_iterating(self):
+        self.customer.orders.extend([self.Order(id=f'o{i}', total=100 + i) for i in range(6)])
+        seen = []
+        for order in self.customer.orders.page_size(2):
+            seen.append(order.id)
+            if order.id == 'o0':
+                self.client.document('customer/c1/order/o1').delete()
+        self.assertEqual(seen, ['o0', 'o1', 'o2', 'o3', 'o4', 'o5'], 'the first page was read before the delete')
+        seen = []
+        for order in self.customer.orders.page_size(2):
+            seen.append(order.id)
+            if order.id == 'o3':
+                self.client.document('customer/c1/order/o3').delete()
+        self.assertEqual(seen, ['o0', 'o2', 'o3', 'o4', 'o5'])
+
+    def test_save_retrieve_skip_children(self):
+        order = self.Order(total=5, item=self.Item(sku='abc'))
+        self.customer.orders.append(order)
+        self.assertEqual(self.client.document(f'customer/c1/order/{order.id}/item/{order.item.id}').get()
+                         .to_dict()['sku'], 'abc')
+
+        self.customer.name = 'William'
+        self.customer.save()
+        copy = self.Customer(id='c1')
+        record = copy.retrieve(overwrite_local=True)
+        self.assertNotIn('order', record)
+        self.assertEqual(copy.name, 'William')
+        self.assertEqual([o.id for o in copy.orders], [order.id])
+        self.assertNotIn('orders', copy.to_dict())
+
+    def test_errors(self):
+        with self.assertRaises(ValidationError):
+            self.customer.orders = []
+        with self.assertRaises(ValidationError):
+            self.customer.orders.append(self.Item(sku='abc'))
+        with self.assertRaises(ValidationError):
+            list(self.Customer(name='unsaved').orders)
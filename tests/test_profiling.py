@@ -0,0 +1,60 @@
+import time
+from unittest import TestCase
+
+from fsmodels import profiling
+from fsmodels.models import BaseModel, Field
+from fsmodels.profiling import FieldProfiler
+
+
+def slow_validator(x):
+    time.sleep(0.002)
+    return True, {}
+
+
+class TestFieldProfiler(TestCase):
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(profiling.active, 'profiling should be opt-in')
+
+    def test_records_validation_and_default(self):
+
+        class MyModel(BaseModel):
+            slow = Field(validation=slow_validator)
+            created = Field(default=time.time)
+
+        with FieldProfiler() as profiler:
+            for _ in range(3):
+                MyModel(_validate_on_init=True)
+        self.assertIsNone(profiling.active, 'profiler should be disabled on exit')
+
+        stats = {(s.field_name, s.kind): s for s in profiler.stats('MyModel')}
+        self.assertEqual(stats[('slow', 'validation')].calls, 3)
+        self.assertEqual(stats[('created', 'default')].calls, 3)
+        self.assertGreaterEqual(stats[('slow', 'validation')].max, 0.002)
+
+        # the slow validator is the slowest entry
+        slowest = profiler.slowest(1)[0]
+        self.assertEqual((slowest.field_name, slowest.kind), ('slow', 'validation'))
+        self.assertIn('slow', profiler.report())
+
+    def test_results_unchanged(self):
+        f = Field(default=1, validation=lambda x: (x == 1, {}))
+        with FieldProfiler():
+            self.assertEqual(f.default(), 1)
+            self.assertEqual(f.validate(1), (True, {}))
+            self.assertFalse(f.validate(2, raise_error=False)[0])
+
+    def test_model_profile_and_budget(self):
+
+        class MyModel(BaseModel):
+            slow = Field(validation=slow_validator)
+
+        class OtherModel(BaseModel):
+            slow = Field(validation=slow_validator)
+
+        with self.assertLogs(level='WARNING') as logs:
+            with MyModel.profile(budget=0.0001) as profiler:
+                MyModel().validate()
+                OtherModel().validate()
+        self.assertTrue(any('over the budget' in line for line in logs.output))
+        self.assertEqual({s.model_name for s in profiler.stats()}, {'MyModel'})
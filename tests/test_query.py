@@ -0,0 +1,112 @@
+from unittest import TestCase, skipIf
+
+from fsmodels import memory, columnar
+from fsmodels.models import Model, Field, ModelField, ValidationError
+
+
+class TestQuerySet(TestCase):
+
+    def setUp(self):
+        class Profile(Model):
+            first_name = Field(required=True)
+
+        class User(Model):
+            username = Field(required=True)
+            rank = Field()
+            profile = ModelField(Profile)
+
+        self.client = memory.Client()
+        Profile.use_client(self.client)
+        User.use_client(self.client)
+        self.User = User
+        self.users = []
+        for i in range(5):
+            user = User(username=f'user{i}', rank=i, profile=Profile(first_name=f'Billy{i}'))
+            user.save()
+            self.users.append(user)
+
+    def test_where(self):
+        users = self.User.objects.where('rank', '>=', 2).order_by('rank', 'DESCENDING').limit(2)
+        self.assertEqual([user.username for user in users], ['user4', 'user3'])
+        self.assertEqual([user.id for user in users], [self.users[4].id, self.users[3].id])
+
+        with self.assertRaises((ValidationError, )):
+            self.User.objects.where('not_a_field', '==', 1)
+
+    def test_to_columns(self):
+        self.client.reset_rpc_counts()
+        columns = self.User.objects.where('rank', '<', 3).order_by('rank').to_columns()
+        self.assertEqual(self.client.rpc_count, 1)
+        self.assertEqual(columns, {
+            'id': [user.id for user in self.users[:3]],
+            'rank': [0, 1, 2],
+            'username': ['user0', 'user1', 'user2'],
+        })
+
+        self.User(username='no profile', rank=5).save()
+        self.client.reset_rpc_counts()
+        columns = self.User.objects.order_by('rank').to_columns(['rank', 'profile'], flatten=True)
+        self.assertEqual(self.client.rpc_counts, {'query': 7}, 'one query for users and one per user')
+        self.assertEqual(self.client.documents_read, 11)
+        self.assertEqual(columns['profile.first_name'], [f'Billy{i}' for i in range(5)] + [None])
+        self.assertEqual(columns['profile.id'], [user.profile.id for user in self.users] + [None])
+
+    def test_to_columns_reads(self):
+        # only the children of the documents read are read
+        self.client.reset_rpc_counts()
+        columns = self.User.objects.order_by('rank').limit(2).to_columns(['profile'], flatten=True)
+        self.assertEqual(columns['profile.first_name'], ['Billy0', 'Billy1'])
+        self.assertEqual(self.client.documents_read, 4)
+        self.client.reset_rpc_counts()
+        columns = self.User.retrieve_many([self.users[3].id]).to_columns(['profile'], flatten=True)
+        self.assertEqual(columns['profile.first_name'], ['Billy3'])
+        self.assertEqual(self.client.documents_read, 2)
+
+    def test_retrieve_many(self):
+        ids = [self.users[3].id, 'missing', self.users[1].id]
+        self.client.reset_rpc_counts()
+        self.assertEqual([user.username for user in self.User.retrieve_many(ids)], ['user3', 'user1'])
+        self.assertEqual(self.client.rpc_counts, {'get_all': 1})
+        self.assertEqual(self.User.retrieve_many(ids).to_columns(['id', 'rank']),
+                         {'id': [self.users[3].id, self.users[1].id], 'rank': [3, 1]})
+
+    @skipIf(columnar.np is None, 'NumPy is not installed.')
+    def test_to_columns_numpy(self):
+        columns = self.User.objects.order_by('rank').to_columns(['rank'], as_numpy=True)
+        self.assertEqual(columns['rank'].tolist(), [0, 1, 2, 3, 4])
+
+    def test_aggregation(self):
+        self.User(username='no rank').save()
+        self.client.reset_rpc_counts()
+        self.assertEqual(self.User.objects.count(), 6)
+        self.assertEqual(self.User.objects.where('rank', '>=', 3).count(), 2)
+        self.assertEqual(self.User.objects.sum('rank'), 10)
+        self.assertEqual(self.User.objects.avg('rank'), 2.0)
+        self.assertIsNone(self.User.objects.where('rank', '>', 10).avg('rank'))
+        self.assertEqual(self.client.rpc_counts, {'aggregation': 5})
+
+        with self.assertRaises((ValidationError, )):
+            self.User.objects.sum('not_a_field')
+        with self.assertRaises((ValidationError, )):
+            self.User.objects.avg('profile')
+
+    def test_group(self):
+        Profile = self.User._class_fields()['profile'].field_model
+        Profile(first_name='top level').save()
+
+        self.client.reset_rpc_counts()
+        profiles = Profile.objects.group().where('first_name', 'in', ['Billy1', 'Billy3', 'top level']).get()
+        self.assertEqual(self.client.rpc_count, 1)
+        by_name = {profile.first_name: profile for profile in profiles}
+        self.assertEqual(set(by_name), {'Billy1', 'Billy3', 'top level'})
+        self.assertEqual(by_name['Billy1'].parent_reference.id, self.users[1].id)
+        self.assertIsNone(by_name['top level'].parent_reference)
+        self.assertEqual(Profile.objects.count(), 1, 'the top level query should not include subcollections')
+
+        self.client.reset_rpc_counts()
+        pairs = list(Profile.objects.group().where('first_name', '<', 'C').with_parents(self.User, chunk_size=3))
+        self.assertEqual(len(pairs), 5)
+        for profile, user in pairs:
+            self.assertEqual(profile.first_name, f'Billy{user.rank}')
+        # one query, and one get_all per chunk of three children
+        self.assertEqual(self.client.rpc_counts, {'query': 1, 'get_all': 2})
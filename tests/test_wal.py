@@ -0,0 +1,142 @@
+import os
+import time
+import tempfile
+from unittest import TestCase
+
+from fsmodels import memory
+from fsmodels.models import Model, Field, ModelField
+from fsmodels.wal import WriteAheadLog, Replayer, WalRecord, coalesce
+
+
+class TestWriteAheadLog(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_and_recover(self):
+        log = WriteAheadLog(self.path, segment_bytes=200, fsync='never')
+        for i in range(10):
+            self.assertEqual(log.append([('set', f'users/{i}', {'n': i, 'data': b'\x00'})]), i + 1)
+        self.assertGreater(len(log.segments()), 1, 'segments should rotate')
+        log.close()
+
+        # simulate a crash in the middle of an append
+        with open(log.segments()[-1], 'ab') as f:
+            f.write(b'0000abcd {"s": 11')
+
+        log = WriteAheadLog(self.path, segment_bytes=200, fsync='always')
+        self.assertEqual(log.last_sequence, 10)
+        self.assertEqual(log.append([('delete', 'users/0', None)]), 11)
+        records = list(log.records())
+        self.assertEqual([record.sequence for record in records], list(range(1, 12)))
+        self.assertEqual(records[0].writes, [('set', 'users/0', {'n': 0, 'data': b'\x00'})])
+        self.assertEqual([record.sequence for record in log.records(after=9)], [10, 11])
+        log.close()
+
+    def test_interval_fsync(self):
+        log = WriteAheadLog(self.path, fsync='interval', fsync_interval=0.05)
+        log.append([('set', 'users/0', {'n': 0})])
+        log.append([('set', 'users/1', {'n': 1})])
+        self.assertTrue(log._unsynced, 'the second append falls within the interval')
+        deadline = time.monotonic() + 2
+        while log._unsynced and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(log._unsynced, 'the last append should be fsynced once the log goes quiet')
+
+        log.append([('set', 'users/2', {'n': 2})])
+        log.flush()
+        self.assertFalse(log._unsynced)
+        log.close()
+        self.assertIsNone(log._syncer)
+
+    def test_coalesce(self):
+        records = [
+            WalRecord(1, 0, [('set', 'users/a', {'x': 1}), ('merge', 'users/b', {'x': 1, 'm': {'p': 1}})]),
+            WalRecord(2, 0, [('merge', 'users/a', {'y': 2}), ('merge', 'users/b', {'y': 2, 'm': {'q': 2}})]),
+            WalRecord(3, 0, [('delete', 'users/c', None), ('merge', 'users/c', {'z': 3})]),
+        ]
+        self.assertEqual(coalesce(records), [
+            ('set', 'users/a', {'x': 1, 'y': 2}),
+            ('merge', 'users/b', {'x': 1, 'y': 2, 'm': {'q': 2}}),
+            ('set', 'users/c', {'z': 3}),
+        ])
+
+    def test_model_save_and_replay(self):
+        client = memory.Client()
+
+        class Profile(Model):
+            first_name = Field(required=True)
+
+        class User(Model):
+            username = Field(required=True)
+            profile = ModelField(Profile)
+
+        User.use_client(client)
+        log = WriteAheadLog(self.path, fsync='never')
+        User.use_wal(log)
+
+        users = [User(username=f'user{i}', profile=Profile(first_name='Billy')) for i in range(20)]
+        for user in users:
+            self.assertIsNotNone(user.save()['sequence'])
+        users[0].username = 'renamed'
+        users[0].save()
+        users[1].delete()
+        self.assertEqual(client.rpc_count, 0, 'saving to the log should not make any RPC')
+        self.assertEqual(log.pending, 22)
+
+        # a new process replays what the crashed one left behind
+        log.close()
+        log = WriteAheadLog(self.path, fsync='never')
+        replayer = Replayer(log, client, records_per_group=1000)
+        self.assertEqual(replayer.replay(), 22)
+        self.assertEqual(log.pending, 0)
+        self.assertEqual(client.rpc_counts, {'commit': 1})
+        self.assertEqual(replayer.replay(), 0)
+
+        User.use_wal(None)
+        self.assertEqual(User(id=users[0].id).retrieve()['username'], 'renamed')
+        self.assertEqual(User(id=users[1].id).retrieve(), {})
+        self.assertEqual(User(id=users[2].id).retrieve()['profile']['first_name'], 'Billy')
+
+    def test_patch_matches_direct_save(self):
+        class Account(Model):
+            name = Field()
+            settings = Field()
+
+        stored = []
+        for use_wal in (False, True):
+            client = memory.Client()
+            Account.use_client(client)
+            log = WriteAheadLog(os.path.join(self.path, str(use_wal)), fsync='never')
+            Account.use_wal(log if use_wal else None)
+            account = Account(id='a', name='first', settings={'a': 1, 'b': 2})
+            account.save()
+            account.settings = {'a': 1}
+            account.save(additional_fields={'extra': {'c': 3}})
+            account.save(additional_fields={'extra': {'d': 4}})
+            Account.use_wal(None)
+            Replayer(log, client).replay()
+            log.close()
+            stored.append(client.document('account/a').get().to_dict())
+        self.assertEqual(stored[0], {'id': 'a', 'name': 'first', 'settings': {'a': 1}, 'extra': {'d': 4}})
+        self.assertEqual(stored[1], stored[0], 'saving through the log should store what saving directly stores')
+
+    def test_background_replayer(self):
+        client = memory.Client()
+        log = WriteAheadLog(self.path, segment_bytes=300, fsync='interval')
+        replayer = Replayer(log, client, records_per_group=7).start()
+        try:
+            for i in range(30):
+                log.append([('set', f'users/{i}', {'n': i})])
+            self.assertTrue(replayer.drain(timeout=5))
+        finally:
+            replayer.stop()
+        self.assertEqual(len(client.collection('users').get()), 30)
+        self.assertTrue(log.compact())
+        self.assertEqual(list(log.records(after=log.checkpoint)), [])
+        self.assertTrue(all(os.path.exists(segment) for segment in log.segments()))
+        log.close()